@@ -0,0 +1,150 @@
+import heapq
+import json
+import math
+import os
+import time
+
+
+class ActivityTracker:
+    """
+    Per-guild channel activity with exponentially decaying message counts.
+
+    Scores are stored scaled to `epoch` (forward decay): a message at time t adds
+    e^(decay * (t - epoch)) instead of decaying every other channel. Only the channel
+    that received a message changes, so each guild's top-k list stays exact with an
+    O(k) update and "most active" is a lookup. The real decayed count of a channel
+    is its stored score * e^(-decay * (now - epoch)).
+    """
+
+    # Past this exponent all scores are rescaled to a new epoch to keep the floats small
+    REBASE_EXPONENT = 50.0
+    # Channels whose decayed count falls below this are dropped when rescaling
+    COLD_SCORE = 0.01
+
+    def __init__(self, half_life: float = 3600.0, max_channels: int = 100, top_k: int = 5):
+        self.decay = math.log(2) / half_life
+        self.max_channels = max_channels  # Per guild, the coldest channels beyond this are evicted
+        self.top_k = top_k
+        self.epoch = time.time()
+        self.guilds = {}  # guild id -> {channel id: score scaled to epoch}
+        self.top = {}  # guild id -> up to top_k channel ids, most active first
+
+    def _weight(self, now: float) -> float:
+        exponent = self.decay * (now - self.epoch)
+        if exponent > self.REBASE_EXPONENT:
+            self._rebase(now)
+            exponent = 0.0
+        return math.exp(exponent)
+
+    def _rebase(self, now: float):
+        factor = math.exp(-self.decay * (now - self.epoch))
+        self.epoch = now
+        for guild_id, channels in list(self.guilds.items()):
+            for channel_id, score in list(channels.items()):
+                score *= factor
+                if score < self.COLD_SCORE:
+                    del channels[channel_id]
+                else:
+                    channels[channel_id] = score
+            if channels:
+                self._rebuild_top(guild_id)
+            else:
+                del self.guilds[guild_id]
+                del self.top[guild_id]
+
+    def _rebuild_top(self, guild_id: int):
+        channels = self.guilds[guild_id]
+        self.top[guild_id] = heapq.nlargest(self.top_k, channels, key=channels.__getitem__)
+
+    def record(self, guild_id: int, channel_id: int, now: float = None):
+        """Counts one message in a channel."""
+        weight = self._weight(time.time() if now is None else now)
+
+        channels = self.guilds.get(guild_id)
+        if channels is None:
+            channels = self.guilds[guild_id] = {}
+            self.top[guild_id] = []
+        score = channels.get(channel_id, 0.0) + weight
+        channels[channel_id] = score
+
+        # Scores only ever grow between rebases, so the channel can only move up the list
+        top = self.top[guild_id]
+        if channel_id in top:
+            index = top.index(channel_id)
+        elif len(top) < self.top_k:
+            top.append(channel_id)
+            index = len(top) - 1
+        elif score > channels[top[-1]]:
+            top[-1] = channel_id
+            index = len(top) - 1
+        else:
+            index = 0
+        while index > 0 and channels[top[index - 1]] < score:
+            top[index - 1], top[index] = top[index], top[index - 1]
+            index -= 1
+
+        if len(channels) > self.max_channels:
+            self._evict(guild_id)
+
+    def _evict(self, guild_id: int):
+        # Trim to 90% so eviction runs once per batch of new channels, not on every message
+        channels = self.guilds[guild_id]
+        keep = set(self.top[guild_id])
+        coldest = sorted((channel_id for channel_id in channels if channel_id not in keep), key=channels.__getitem__)
+        for channel_id in coldest[:len(channels) - int(self.max_channels * 0.9)]:
+            del channels[channel_id]
+
+    def most_active(self, guild_id: int):
+        """The most active channel ID of a guild, or None if nothing was recorded."""
+        top = self.top.get(guild_id)
+        return top[0] if top else None
+
+    def ranked(self, guild_id: int) -> list:
+        """The top-k channel IDs of a guild, most active first."""
+        return list(self.top.get(guild_id, ()))
+
+    def score(self, guild_id: int, channel_id: int, now: float = None) -> float:
+        """Decayed message count of a channel."""
+        now = time.time() if now is None else now
+        score = self.guilds.get(guild_id, {}).get(channel_id, 0.0)
+        return score * math.exp(-self.decay * (now - self.epoch))
+
+    def forget(self, guild_id: int, channel_id: int):
+        """Drops a channel, e.g. after it was deleted."""
+        channels = self.guilds.get(guild_id)
+        if channels and channels.pop(channel_id, None) is not None:
+            self._rebuild_top(guild_id)
+
+    def snapshot(self) -> dict:
+        """JSON-ready copy of the tracker state."""
+        return {
+            'epoch': self.epoch,
+            'guilds': {
+                str(guild_id): {str(channel_id): score for channel_id, score in channels.items()}
+                for guild_id, channels in self.guilds.items()
+            },
+        }
+
+    def restore(self, snapshot: dict):
+        self.epoch = snapshot['epoch']
+        self.guilds = {
+            int(guild_id): {int(channel_id): score for channel_id, score in channels.items()}
+            for guild_id, channels in snapshot['guilds'].items()
+        }
+        self.top = {}
+        for guild_id in self.guilds:
+            self._rebuild_top(guild_id)
+
+    def save(self, path: str):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(self.snapshot(), file)
+        os.replace(tmp_path, path)
+
+    def load(self, path: str):
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as file:
+                self.restore(json.load(file))
+
+
+tracker = ActivityTracker()
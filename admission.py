@@ -0,0 +1,160 @@
+import time
+from collections import OrderedDict, defaultdict
+
+# What each cog's commands count as, anything else is 'general'. Keyword responses are 'fun'
+# unless their rule in responses.json says otherwise (the poem rule is 'poem').
+COG_CLASSES = {
+    'ModerationCog': 'moderation',
+    'AdminCog': 'admin',
+    'MusicCog': 'music',
+    'PollCog': 'polls',
+    'TicTacToe': 'games',
+}
+
+# Shed first when the bot is overloaded: lower sheds earlier, None is never shed
+PRIORITIES = {'poem': 0, 'fun': 0, 'general': 1, 'games': 1, 'polls': 1, 'music': 1,
+              'moderation': None, 'admin': None}
+
+# (burst, seconds to refill it) per user, for each class on top of the user's overall bucket
+CLASS_LIMITS = {
+    'poem': (2, 30.0),
+    'fun': (5, 10.0),
+    'music': (3, 10.0),
+    'polls': (2, 30.0),
+    'moderation': (10, 10.0),
+}
+USER_LIMIT = (8, 10.0)
+GUILD_LIMIT = (40, 10.0)  # Moderation and admin commands skip this one, a raid can't lock moderators out
+
+# Load levels: at SHED_LOW, priority 0 work is dropped, at SHED_NORMAL priority 1 as well
+SHED_LOW = (0.1, 200)  # (event loop lag in seconds, outbound queue depth)
+SHED_NORMAL = (0.5, 1000)
+LOAD_CHECK_INTERVAL = 0.1
+
+
+class BucketTable:
+    """
+    Token buckets keyed by anything, refilled lazily on use so each check is O(1).
+
+    A bucket idle long enough to have refilled is the same as no bucket, so those are
+    dropped from the least recently used end as new keys come in, and the table never
+    holds more than `max_keys` buckets (evicting an active one only forgives its debt).
+    """
+
+    def __init__(self, burst: int, per: float, max_keys: int = 50000):
+        self.burst = burst
+        self.rate = burst / per  # Tokens per second
+        self.per = per
+        self.max_keys = max_keys
+        self.buckets = OrderedDict()  # key -> [tokens, last update], least recently used first
+
+    def __len__(self):
+        return len(self.buckets)
+
+    def take(self, key, now: float) -> float:
+        """Takes a token, returning 0 if there was one or else how many seconds until there is."""
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            self._expire(now)
+            bucket = self.buckets[key] = [float(self.burst), now]
+        else:
+            self.buckets.move_to_end(key)
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+        if bucket[0] >= 1.0:
+            bucket[0] -= 1.0
+            return 0.0
+        return (1.0 - bucket[0]) / self.rate
+
+    def _expire(self, now: float):
+        buckets = self.buckets
+        cutoff = now - self.per
+        for _ in range(2):  # A couple per insert keeps up with the insert rate without a full sweep
+            if not buckets:
+                return
+            key, (tokens, updated) = next(iter(buckets.items()))
+            if updated > cutoff and len(buckets) < self.max_keys:
+                return
+            del buckets[key]
+
+
+class AdmissionControl:
+    """
+    Decides whether a command or keyword response runs, before any parsing or REST work:
+    per-user, per-guild and per-user-per-class token buckets, and load shedding of low
+    priority work while the event loop lags or the outbound queue backs up.
+    """
+
+    def __init__(self, lag=lambda: 0.0, queue_depth=lambda: 0):
+        self.lag = lag  # Functions reporting the current load
+        self.queue_depth = queue_depth
+        self.users = BucketTable(*USER_LIMIT)
+        self.guilds = BucketTable(*GUILD_LIMIT)
+        self.classes = {name: BucketTable(*limit) for name, limit in CLASS_LIMITS.items()}
+        self.notices = BucketTable(1, 30.0)  # One "slow down" per user per 30 s, spam doesn't earn replies
+        self.admitted = 0
+        self.rejected = defaultdict(int)  # reason -> count
+        self._level = 0
+        self._level_checked = float('-inf')
+
+    @staticmethod
+    def command_class(command) -> str:
+        return COG_CLASSES.get(command.cog_name, 'general')
+
+    def load_level(self, now: float = None) -> int:
+        """0 normally, 1 when low priority work should be shed, 2 when everything sheddable should."""
+        now = time.monotonic() if now is None else now
+        # Re-read at most every LOAD_CHECK_INTERVAL, the queue depth is a sum over every channel
+        if now - self._level_checked >= LOAD_CHECK_INTERVAL:
+            self._level_checked = now
+            lag, depth = self.lag(), self.queue_depth()
+            if lag >= SHED_NORMAL[0] or depth >= SHED_NORMAL[1]:
+                self._level = 2
+            elif lag >= SHED_LOW[0] or depth >= SHED_LOW[1]:
+                self._level = 1
+            else:
+                self._level = 0
+        return self._level
+
+    def admit(self, user_id: int, guild_id, kind: str, now: float = None):
+        """
+        Returns None if the work may run, otherwise (reason, seconds to wait). Reasons are
+        'overloaded', 'user', 'guild' and the class name whose bucket ran out.
+        """
+        now = time.monotonic() if now is None else now
+        priority = PRIORITIES.get(kind, 1)
+        if priority is not None and priority < self.load_level(now):
+            return self._reject('overloaded', 0.0)
+
+        # Class first, it's the narrowest: running out there shouldn't spend the broader buckets
+        table = self.classes.get(kind)
+        if table is not None:
+            wait = table.take((kind, user_id), now)
+            if wait:
+                return self._reject(kind, wait)
+        wait = self.users.take(user_id, now)
+        if wait:
+            return self._reject('user', wait)
+        if guild_id is not None and priority is not None:
+            wait = self.guilds.take(guild_id, now)
+            if wait:
+                return self._reject('guild', wait)
+        self.admitted += 1
+        return None
+
+    def _reject(self, reason: str, wait: float):
+        self.rejected[reason] += 1
+        return reason, wait
+
+    def should_notify(self, user_id: int, now: float = None) -> bool:
+        """Whether a rejected user should be told, at most once per notice window."""
+        return not self.notices.take(user_id, time.monotonic() if now is None else now)
+
+    def stats(self) -> dict:
+        return {
+            'admitted': self.admitted,
+            'rejected': dict(self.rejected),
+            'buckets': len(self.users) + len(self.guilds) + sum(map(len, self.classes.values())),
+            'load_level': self.load_level(),
+        }
+
@@ -0,0 +1,121 @@
+import asyncio
+import logging
+import os
+import re
+
+import discord
+
+log = logging.getLogger(__name__)
+
+# Options used for remote streams, signed URLs occasionally drop mid-track
+STREAM_BEFORE_OPTIONS = '-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5'
+
+
+def _cache_name(track_id: str) -> str:
+    # Video IDs are already filename safe, but don't trust that for other extractors
+    return re.sub(r'[^A-Za-z0-9_-]', '_', track_id) + '.opus'
+
+
+class OpusDiskCache:
+    """
+    Keeps recently played tracks on disk as Ogg/Opus so replays can be sent
+    to Discord with a codec copy, without touching the network or re-encoding.
+
+    Files are written in the background by ffmpeg and the directory is trimmed
+    to max_bytes, least recently played first.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 2 * 1024 ** 3, max_track_seconds: int = 20 * 60,
+                 max_concurrent_writes: int = 2, executable: str = 'ffmpeg'):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_track_seconds = max_track_seconds  # Long mixes/streams are not worth the disk space
+        self.executable = executable
+        self._write_slots = asyncio.Semaphore(max_concurrent_writes)
+        self._pending = set()  # Track IDs currently being written
+        os.makedirs(directory, exist_ok=True)
+
+    def path_for(self, track_id: str):
+        """Returns the cached file for a track, or None if it isn't cached."""
+        if not track_id:
+            return None
+        path = os.path.join(self.directory, _cache_name(track_id))
+        if not os.path.exists(path):
+            return None
+        # Touch it so eviction keeps recently played tracks
+        os.utime(path)
+        return path
+
+    def should_store(self, info: dict) -> bool:
+        duration = info.get('duration')
+        return bool(info.get('id')) and duration is not None and duration <= self.max_track_seconds
+
+    def store(self, info: dict):
+        """Schedules a background copy of the track into the cache, if it belongs there."""
+        track_id = info.get('id')
+        if not self.should_store(info) or track_id in self._pending or self.path_for(track_id):
+            return
+        self._pending.add(track_id)
+        task = asyncio.ensure_future(self._write(info))
+        task.add_done_callback(lambda _: self._pending.discard(track_id))
+
+    async def _write(self, info: dict):
+        path = os.path.join(self.directory, _cache_name(info['id']))
+        tmp_path = path + '.part'
+        # Opus sources only need remuxing into Ogg pages, anything else is encoded once here
+        codec = 'copy' if info.get('acodec') == 'opus' else 'libopus'
+
+        async with self._write_slots:
+            process = await asyncio.create_subprocess_exec(
+                self.executable, '-nostdin', '-loglevel', 'error', '-y',
+                *STREAM_BEFORE_OPTIONS.split(), '-i', info['url'],
+                '-vn', '-map_metadata', '-1', '-c:a', codec, '-b:a', '128k',
+                '-ar', '48000', '-ac', '2', '-f', 'opus', tmp_path,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.PIPE,
+            )
+            _, stderr = await process.communicate()
+
+        if process.returncode != 0:
+            log.warning("Could not cache %s: %s", info['id'], stderr.decode(errors='replace').strip())
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+
+        os.replace(tmp_path, path)
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        total = 0
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith('.opus'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+        entries.sort()
+        while total > self.max_bytes and entries:
+            _, size, path = entries.pop(0)
+            os.remove(path)
+            total -= size
+
+
+async def create_source(info: dict, cache: OpusDiskCache = None) -> discord.AudioSource:
+    """
+    Builds an Opus-native source for a resolved track.
+
+    Cached tracks and Opus streams are sent with a codec copy, other codecs are
+    encoded to Opus by ffmpeg so discord.py doesn't re-encode PCM frame by frame.
+    """
+    if cache is not None:
+        path = cache.path_for(info.get('id'))
+        if path:
+            return discord.FFmpegOpusAudio(path, codec='opus')
+        cache.store(info)
+
+    kwargs = {'before_options': STREAM_BEFORE_OPTIONS, 'options': '-vn'}
+    if info.get('acodec') == 'opus':
+        # Known from extraction already, no need to spend an ffprobe round trip
+        return discord.FFmpegOpusAudio(info['url'], codec='opus', bitrate=min(int(info.get('abr') or 128), 512), **kwargs)
+    return await discord.FFmpegOpusAudio.from_probe(info['url'], **kwargs)
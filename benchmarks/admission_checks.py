@@ -0,0 +1,39 @@
+"""
+Cost of an admission check, what every command and keyword response pays before
+any other work, with many users spread over many guilds.
+
+    python -m benchmarks.admission_checks --checks 200000 --users 5000
+"""
+import argparse
+import json
+import time
+
+from admission import AdmissionControl
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--checks', type=int, default=200000, help='Admission checks to time')
+    parser.add_argument('--users', type=int, default=5000, help='Distinct users the checks are spread over')
+    parser.add_argument('--guilds', type=int, default=50, help='Distinct guilds the checks are spread over')
+    parser.add_argument('--output', help='Also write the results to this JSON file')
+    args = parser.parse_args()
+
+    control = AdmissionControl()
+    started = time.perf_counter()
+    for i in range(args.checks):
+        control.admit(i % args.users, i % args.guilds, 'fun', now=i * 0.0001)
+    elapsed = time.perf_counter() - started
+
+    stats = control.stats()
+    result = {'us_per_check': elapsed / args.checks * 1e6, 'buckets': stats['buckets'],
+              'admitted': stats['admitted'], 'rejected': stats['rejected']}
+    print(f"{result['us_per_check']:.2f} µs per admission check, {result['buckets']} buckets held, "
+          f"{result['admitted']} admitted, {sum(result['rejected'].values())} rejected")
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(result, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
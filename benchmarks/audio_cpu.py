@@ -0,0 +1,115 @@
+"""
+CPU cost per concurrent voice stream for the old and new MusicCog audio paths.
+
+    python -m benchmarks.audio_cpu song.webm [song2.mp3 ...] --streams 8 --seconds 60
+
+pcm    FFmpegPCMAudio + discord.py's per-frame Opus encode (the old path)
+opus   FFmpegOpusAudio, codec copy for Opus inputs, libopus in ffmpeg otherwise
+cached FFmpegOpusAudio reading a pre-transcoded .opus file with a codec copy
+
+Frames are pulled as fast as possible instead of in real time, so the numbers are
+CPU seconds per stream per minute of audio. Needs ffmpeg and libopus installed.
+"""
+import argparse
+import os
+import resource
+import subprocess
+import tempfile
+import threading
+import time
+
+import discord
+from discord import opus
+
+FRAMES_PER_SECOND = 50  # 20 ms frames
+
+
+def _read_pcm(path, frames):
+    source = discord.FFmpegPCMAudio(path, options='-vn')
+    encoder = opus.Encoder()
+    try:
+        for _ in range(frames):
+            data = source.read()
+            if not data:
+                break
+            # Same work the voice client does for every non-Opus frame
+            encoder.encode(data, encoder.SAMPLES_PER_FRAME)
+    finally:
+        source.cleanup()
+
+
+def _read_opus(path, frames, codec=None):
+    source = discord.FFmpegOpusAudio(path, codec=codec, options='-vn')
+    try:
+        for _ in range(frames):
+            if not source.read():
+                break
+    finally:
+        source.cleanup()
+
+
+def _probe_codec(path):
+    codec, _ = discord.FFmpegOpusAudio._probe_codec_fallback(path)
+    return codec
+
+
+def _transcode(path, directory):
+    out = os.path.join(directory, os.path.basename(path) + '.opus')
+    subprocess.run(
+        ['ffmpeg', '-nostdin', '-loglevel', 'error', '-y', '-i', path, '-vn', '-c:a', 'libopus',
+         '-b:a', '128k', '-ar', '48000', '-ac', '2', '-f', 'opus', out],
+        check=True,
+    )
+    return out
+
+
+def run_path(name, target, files, streams, frames):
+    threads = [
+        threading.Thread(target=target, args=(files[i % len(files)], frames))
+        for i in range(streams)
+    ]
+    self_before = time.process_time()
+    children_before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    started = time.perf_counter()
+
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    wall = time.perf_counter() - started
+    children_after = resource.getrusage(resource.RUSAGE_CHILDREN)
+    bot_cpu = time.process_time() - self_before
+    ffmpeg_cpu = (children_after.ru_utime - children_before.ru_utime) + (children_after.ru_stime - children_before.ru_stime)
+
+    audio_minutes = frames / FRAMES_PER_SECOND / 60
+    per_stream = (bot_cpu + ffmpeg_cpu) / streams / audio_minutes
+    print(f"{name:<7} streams={streams:<3} wall={wall:6.2f}s bot_cpu={bot_cpu:6.2f}s "
+          f"ffmpeg_cpu={ffmpeg_cpu:6.2f}s cpu/stream/audio-min={per_stream:6.3f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('files', nargs='+', help='Local audio files to stream')
+    parser.add_argument('--streams', type=int, default=8, help='Concurrent streams per path')
+    parser.add_argument('--seconds', type=int, default=60, help='Audio seconds pulled per stream')
+    args = parser.parse_args()
+
+    if not opus.is_loaded():
+        opus._load_default()
+    frames = args.seconds * FRAMES_PER_SECOND
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cached = [_transcode(path, cache_dir) for path in args.files]
+        codecs = {path: _probe_codec(path) for path in args.files}
+
+        def new_path(path, n):
+            _read_opus(path, n, codec=codecs[path])
+
+        run_path('pcm', _read_pcm, args.files, args.streams, frames)
+        run_path('opus', new_path, args.files, args.streams, frames)
+        run_path('cached', lambda path, n: _read_opus(path, n, codec='opus'), cached, args.streams, frames)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Banning a raid's worth of accounts, against the local fake Discord with the ban
+route limited per guild (10 per second by default).
+
+    python -m benchmarks.bulk_moderation --users 200 --latency 0.15
+
+Compares one ban after another (what running !ban per user amounts to), firing
+every ban at once, and modengine's BulkAction worker pool paced to the bucket.
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import discord
+from discord.ext import commands
+
+from benchmarks.fakediscord import FakeDiscord, guild_payload
+from modengine import BulkAction
+
+BAN_ROUTE = 'PUT /guilds/{id}/bans/{id}'
+
+
+async def sequential(guild, user_ids, args):
+    for user_id in user_ids:
+        await guild.ban(discord.Object(user_id))
+
+
+async def unbounded(guild, user_ids, args):
+    await asyncio.gather(*(guild.ban(discord.Object(user_id)) for user_id in user_ids))
+
+
+async def pool(guild, user_ids, args):
+    async def ban(user_id):
+        await guild.ban(discord.Object(user_id))
+    await BulkAction(ban, user_ids, concurrency=args.concurrency, rate=args.limit, per=1.0).run()
+
+
+STRATEGIES = {'sequential': sequential, 'unbounded': unbounded, 'BulkAction': pool}
+
+
+async def run(args):
+    guild_ids = [(1 << 22) * (i + 1) for i in range(len(STRATEGIES))]
+    fake = await FakeDiscord([guild_payload(guild_id, 10) for guild_id in guild_ids], latency=args.latency,
+                             route_limits={BAN_ROUTE: (args.limit, 1.0)}).start()
+    FakeDiscord.point_client_at(fake.base_url)
+
+    bot = commands.Bot(command_prefix="!", intents=discord.Intents.default())
+    ready = asyncio.Event()
+
+    @bot.event
+    async def on_ready():
+        ready.set()
+
+    runner = asyncio.ensure_future(bot.start('fake-token'))
+    await asyncio.wait_for(ready.wait(), timeout=60)
+    user_ids = [300000000000000000 + i for i in range(args.users)]
+
+    print(f"users={args.users} ban limit={args.limit}/s latency={args.latency * 1000:.0f} ms")
+    print(f"{'strategy':<12}{'time (s)':>10}{'bans/s':>8}{'requests':>10}{'429s':>6}")
+    results = []
+    for (name, strategy), guild_id in zip(STRATEGIES.items(), guild_ids):
+        fake.calls.clear()
+        rate_limited = fake.rate_limited
+        started = time.perf_counter()
+        await strategy(bot.get_guild(guild_id), user_ids, args)
+        elapsed = time.perf_counter() - started
+        result = {
+            'strategy': name,
+            'time_s': round(elapsed, 2),
+            'bans_per_s': round(args.users / elapsed, 1),
+            'requests': fake.calls[BAN_ROUTE],
+            'rate_limited': fake.rate_limited - rate_limited,
+        }
+        results.append(result)
+        print(f"{name:<12}{result['time_s']:>10}{result['bans_per_s']:>8}{result['requests']:>10}"
+              f"{result['rate_limited']:>6}")
+
+    await bot.close()
+    await runner
+    await fake.stop()
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=200, help='Accounts to ban')
+    parser.add_argument('--limit', type=int, default=10, help='Bans per second the fake allows per guild')
+    parser.add_argument('--concurrency', type=int, default=4, help='BulkAction workers')
+    parser.add_argument('--latency', type=float, default=0.15, help='Seconds the fake server takes to respond')
+    parser.add_argument('--output', help='Also write the results to this JSON file')
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,433 @@
+"""
+A local stand-in for Discord's REST API and gateway, good enough to run the real bot against.
+
+The gateway speaks the JSON protocol discord.py expects (HELLO, IDENTIFY -> READY,
+GUILD_CREATE, heartbeats, member chunk requests), and the REST side answers the
+routes the cogs use, counting every call. Payload builders create synthetic guilds
+of any size.
+"""
+import asyncio
+import bisect
+import itertools
+import json
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+import aiohttp
+import yarl
+from aiohttp import web
+from discord.gateway import DiscordWebSocket
+from discord.http import Route
+
+BOT_USER_ID = 100000000000000001
+APPLICATION_ID = 100000000000000002
+CHUNK_SIZE = 1000
+EVERYONE_PERMISSIONS = '1071698660929'
+ADMINISTRATOR = str(1 << 3)
+
+DISCORD_EPOCH = 1420070400000
+BULK_DELETE_MAX_AGE = 14 * 24 * 3600
+
+_snowflakes = itertools.count(200000000000000000)
+_increments = itertools.count()
+
+
+def json_response(data, status: int = 200, headers=None) -> web.Response:
+    # discord.py only parses bodies whose content type is exactly application/json, without a charset
+    headers = dict(headers or {}, **{'Content-Type': 'application/json'})
+    return web.Response(body=json.dumps(data).encode(), status=status, headers=headers)
+
+
+def snowflake() -> int:
+    return next(_snowflakes)
+
+
+def time_snowflake(unix_time: float = None) -> int:
+    """A unique ID whose creation time is `unix_time` (now by default), like message IDs."""
+    unix_time = time.time() if unix_time is None else unix_time
+    return (int(unix_time * 1000) - DISCORD_EPOCH) << 22 | next(_increments) & 0x3FFFFF
+
+
+def snowflake_time(snowflake_id: int) -> float:
+    return ((snowflake_id >> 22) + DISCORD_EPOCH) / 1000
+
+
+def timestamp() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def user_payload(user_id: int, bot: bool = False) -> dict:
+    return {
+        'id': str(user_id),
+        'username': f"user{user_id % 1000000}",
+        'global_name': None,
+        'discriminator': '0',
+        'avatar': None,
+        'bot': bot,
+    }
+
+
+def member_payload(user_id: int, bot: bool = False, roles=()) -> dict:
+    return {
+        'user': user_payload(user_id, bot),
+        'roles': [str(role) for role in roles],
+        'joined_at': timestamp(),
+        'deaf': False,
+        'mute': False,
+        'flags': 0,
+    }
+
+
+def guild_payload(guild_id: int, member_count: int, text_channels: int = 5, voice_channels: int = 1,
+                  include_members: bool = False) -> dict:
+    """
+    A GUILD_CREATE payload. Like the real gateway, members beyond the bot itself are only
+    included when include_members is set, the rest arrive through chunk requests.
+    """
+    admin_role = guild_id + 1
+    channels = [
+        {'id': str(guild_id + 10 + i), 'type': 0, 'name': 'general' if i == 0 else f"text-{i}", 'position': i,
+         'permission_overwrites': [], 'nsfw': False, 'parent_id': None, 'topic': None, 'rate_limit_per_user': 0}
+        for i in range(text_channels)
+    ] + [
+        {'id': str(guild_id + 100 + i), 'type': 2, 'name': f"voice-{i}", 'position': i,
+         'permission_overwrites': [], 'bitrate': 64000, 'user_limit': 0, 'parent_id': None}
+        for i in range(voice_channels)
+    ]
+    members = [member_payload(BOT_USER_ID, bot=True, roles=[admin_role])]
+    if include_members:
+        members += [member_payload(user_id) for user_id in guild_member_ids(guild_id, member_count - 1)]
+    return {
+        'id': str(guild_id),
+        'name': f"guild-{guild_id}",
+        'owner_id': str(guild_id + 2),
+        'member_count': member_count,
+        'large': member_count > 250,
+        'unavailable': False,
+        'members': members,
+        'channels': channels,
+        'threads': [],
+        'roles': [
+            {'id': str(guild_id), 'name': '@everyone', 'permissions': EVERYONE_PERMISSIONS, 'position': 0,
+             'color': 0, 'hoist': False, 'managed': False, 'mentionable': False},
+            {'id': str(admin_role), 'name': 'bot', 'permissions': ADMINISTRATOR, 'position': 1,
+             'color': 0, 'hoist': False, 'managed': True, 'mentionable': False},
+        ],
+        'emojis': [],
+        'stickers': [],
+        'features': [],
+        'voice_states': [],
+        'presences': [],
+        'stage_instances': [],
+        'guild_scheduled_events': [],
+        'system_channel_id': channels[0]['id'],
+        'system_channel_flags': 0,
+        'premium_tier': 0,
+        'preferred_locale': 'en-US',
+        'verification_level': 0,
+        'default_message_notifications': 0,
+        'explicit_content_filter': 0,
+        'mfa_level': 0,
+        'nsfw_level': 0,
+        'afk_timeout': 300,
+    }
+
+
+def guild_member_ids(guild_id: int, count: int):
+    # Deterministic so chunk responses and replayed events agree on who is in a guild
+    base = guild_id * 1000
+    return range(base + 1, base + 1 + count)
+
+
+def message_payload(channel_id: int, content: str, author_id: int = BOT_USER_ID, guild_id: int = None,
+                    message_id: int = None, embeds=()) -> dict:
+    payload = {
+        'id': str(message_id or snowflake()),
+        'channel_id': str(channel_id),
+        'author': user_payload(author_id, bot=author_id == BOT_USER_ID),
+        'content': content,
+        'timestamp': timestamp(),
+        'edited_timestamp': None,
+        'tts': False,
+        'mention_everyone': False,
+        'mentions': [],
+        'mention_roles': [],
+        'attachments': [],
+        'embeds': list(embeds),
+        'pinned': False,
+        'type': 0,
+    }
+    if guild_id is not None:
+        payload['guild_id'] = str(guild_id)
+        payload['member'] = {'roles': [], 'joined_at': timestamp(), 'deaf': False, 'mute': False, 'flags': 0}
+    return payload
+
+
+class FakeDiscord:
+    """
+    Serves REST on /api/v10 and the gateway on /gateway from one local aiohttp server.
+
+    `calls` counts REST requests by route, `latency` adds a delay to every REST
+    response, and `rate_limit` (requests per second per route) answers with 429s
+    when a route is hit faster than that, like Discord's buckets. `route_limits`
+    sets (limit, seconds) for individual routes, e.g. reactions at 1 per 0.25s.
+    Like Discord, limits apply per channel/guild and limited routes send the
+    X-RateLimit headers.
+
+    Messages sent to a channel, and any added with add_history(), make up its
+    history: it can be paged with `before`, and single or bulk deletes remove
+    from it. Bulk deletes refuse messages older than 14 days, like Discord.
+    """
+
+    def __init__(self, guilds=(), latency: float = 0.0, rate_limit: int = None, route_limits=None):
+        self.guilds = {int(guild['id']): guild for guild in guilds}
+        self.channel_guilds = {int(channel['id']): int(guild['id']) for guild in guilds for channel in guild['channels']}
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.route_limits = dict(route_limits or {})  # route -> (limit, per seconds)
+        self.calls = Counter()
+        self.rate_limited = 0
+        self.sockets = []
+        self.identified = asyncio.Event()
+        self.sequence = 0
+        self._windows = {}  # (route, major id) -> (window start, requests in window)
+        self.messages = {}  # channel id -> {message id: payload}
+        self._message_ids = {}  # channel id -> sorted message ids, oldest first
+        self._runner = None
+        self.port = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    @property
+    def gateway_url(self) -> str:
+        return f"ws://127.0.0.1:{self.port}/gateway"
+
+    async def start(self, port: int = 0):
+        app = web.Application()
+        app.router.add_get('/gateway', self._gateway)
+        app.router.add_route('*', '/api/v10/{path:.*}', self._rest)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, '127.0.0.1', port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        for socket in list(self.sockets):
+            await socket.close()
+        await self._runner.cleanup()
+
+    @staticmethod
+    def point_client_at(base_url: str):
+        """Makes discord.py in this process talk to a fake server instead of discord.com."""
+        Route.BASE = f"{base_url}/api/v10"
+        DiscordWebSocket.DEFAULT_GATEWAY = yarl.URL(f"{base_url.replace('http', 'ws', 1)}/gateway")
+
+    # Gateway
+
+    async def _gateway(self, request: web.Request):
+        socket = web.WebSocketResponse(max_msg_size=0)
+        await socket.prepare(request)
+        self.sockets.append(socket)
+        await socket.send_str(json.dumps({'op': 10, 'd': {'heartbeat_interval': 41250}}))
+        try:
+            async for message in socket:
+                if message.type != aiohttp.WSMsgType.TEXT:
+                    continue
+                payload = json.loads(message.data)
+                await self._handle_op(socket, payload)
+        finally:
+            self.sockets.remove(socket)
+        return socket
+
+    async def _handle_op(self, socket, payload: dict):
+        op = payload['op']
+        if op == 1:
+            await socket.send_str(json.dumps({'op': 11}))
+        elif op == 2:
+            shard = payload['d'].get('shard', [0, 1])
+            guilds = [guild for guild_id, guild in self.guilds.items() if (guild_id >> 22) % shard[1] == shard[0]]
+            await self._send_dispatch(socket, 'READY', {
+                'v': 10,
+                'user': user_payload(BOT_USER_ID, bot=True),
+                'guilds': [{'id': guild['id'], 'unavailable': True} for guild in guilds],
+                'session_id': 'fake-session',
+                'resume_gateway_url': self.gateway_url,
+                'shard': shard,
+                'application': {'id': str(APPLICATION_ID), 'flags': 0},
+            })
+            for guild in guilds:
+                await self._send_dispatch(socket, 'GUILD_CREATE', guild)
+            self.identified.set()
+        elif op == 8:
+            await self._send_member_chunks(socket, payload['d'])
+
+    async def _send_member_chunks(self, socket, request: dict):
+        guild_id = int(request['guild_id'])
+        guild = self.guilds[guild_id]
+        member_ids = list(guild_member_ids(guild_id, guild['member_count'] - 1))
+        chunks = [member_ids[i:i + CHUNK_SIZE] for i in range(0, len(member_ids), CHUNK_SIZE)] or [[]]
+        for index, chunk in enumerate(chunks):
+            await self._send_dispatch(socket, 'GUILD_MEMBERS_CHUNK', {
+                'guild_id': str(guild_id),
+                'members': [member_payload(user_id) for user_id in chunk],
+                'chunk_index': index,
+                'chunk_count': len(chunks),
+                'nonce': request.get('nonce'),
+            })
+
+    async def _send_dispatch(self, socket, event: str, data: dict):
+        self.sequence += 1
+        await socket.send_str(json.dumps({'op': 0, 't': event, 's': self.sequence, 'd': data}))
+
+    async def dispatch(self, event: str, data: dict):
+        """Sends a gateway event to every connected client."""
+        for socket in list(self.sockets):
+            await self._send_dispatch(socket, event, data)
+
+    # REST
+
+    def add_history(self, channel_id: int, payloads):
+        """Adds messages (see message_payload, with time_snowflake IDs) to a channel's history."""
+        messages = self.messages.setdefault(channel_id, {})
+        ids = self._message_ids.setdefault(channel_id, [])
+        for payload in payloads:
+            message_id = int(payload['id'])
+            messages[message_id] = payload
+            bisect.insort(ids, message_id)
+
+    def _history(self, channel_id: int, before: int = None, limit: int = 50) -> list:
+        ids = self._message_ids.get(channel_id, [])
+        end = len(ids) if before is None else bisect.bisect_left(ids, before)
+        return [self.messages[channel_id][message_id] for message_id in reversed(ids[max(end - limit, 0):end])]
+
+    def _delete_message(self, channel_id: int, message_id: int) -> bool:
+        if self.messages.get(channel_id, {}).pop(message_id, None) is None:
+            return False
+        ids = self._message_ids[channel_id]
+        del ids[bisect.bisect_left(ids, message_id)]
+        return True
+
+    def _take(self, route: str, major: str):
+        """Counts a request against its bucket, returns (allowed, rate limit headers) or None if unlimited."""
+        limit = self.route_limits.get(route) or ((self.rate_limit, 1.0) if self.rate_limit is not None else None)
+        if limit is None:
+            return None
+        allowed, per = limit
+        now = time.monotonic()
+        key = (route, major)
+        started, count = self._windows.get(key, (now, 0))
+        if now - started >= per:
+            started, count = now, 0
+        count += 1
+        self._windows[key] = (started, count)
+        reset_after = max(per - (now - started), 0.001)
+        headers = {
+            'X-RateLimit-Limit': str(allowed),
+            'X-RateLimit-Remaining': str(max(allowed - count, 0)),
+            'X-RateLimit-Reset': str(time.time() + reset_after),
+            'X-RateLimit-Reset-After': f"{reset_after:.3f}",
+            'X-RateLimit-Bucket': route,
+        }
+        return count <= allowed, headers
+
+    async def _rest(self, request: web.Request):
+        path = '/' + request.match_info['path']
+        route = self._route_name(request.method, path)
+        self.calls[route] += 1
+
+        # Buckets are per channel or guild, the first ID in the path
+        parts = path.strip('/').split('/')
+        limited = self._take(route, parts[1] if len(parts) > 1 else '')
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if limited is not None and not limited[0]:
+            self.rate_limited += 1
+            headers = dict(limited[1], **{'X-RateLimit-Scope': 'user'})
+            return json_response({'message': 'You are being rate limited.',
+                                  'retry_after': float(headers['X-RateLimit-Reset-After']), 'global': False},
+                                 status=429, headers=headers)
+
+        body = await request.read()
+        data = None
+        if body and request.content_type == 'application/json':
+            data = json.loads(body)
+        elif body and request.content_type.startswith('multipart/'):
+            # Files and embeds sent as multipart, only the JSON part matters here
+            form = await request.post()
+            data = json.loads(form.get('payload_json', '{}'))
+        response = self._respond(request.method, parts, data or {}, request.query)
+        if limited is not None:
+            response.headers.update(limited[1])
+        return response
+
+    @staticmethod
+    def _route_name(method: str, path: str) -> str:
+        # Collapse IDs so calls group by route, like rate limit buckets
+        parts = ['{id}' if part.isdigit() else part for part in path.strip('/').split('/')]
+        if len(parts) >= 6 and parts[4] == 'reactions':
+            parts[5] = '{emoji}'
+        return f"{method} /{'/'.join(parts)}"
+
+    def _respond(self, method: str, parts: list, data: dict, query=None):
+        if parts == ['users', '@me']:
+            return json_response(user_payload(BOT_USER_ID, bot=True))
+        if parts == ['oauth2', 'applications', '@me']:
+            return json_response({'id': str(APPLICATION_ID), 'name': 'NehmanBot', 'icon': None,
+                                      'description': '', 'bot_public': True, 'bot_require_code_grant': False,
+                                      'verify_key': '', 'flags': 0, 'owner': user_payload(1)})
+        if parts == ['gateway', 'bot']:
+            return json_response({'url': self.gateway_url, 'shards': 1,
+                                      'session_start_limit': {'total': 1000, 'remaining': 1000,
+                                                              'reset_after': 0, 'max_concurrency': 1}})
+        if parts[0] == 'channels' and len(parts) == 3 and parts[2] == 'messages':
+            channel_id = int(parts[1])
+            if method == 'POST':
+                guild_id = self._guild_of_channel(channel_id)
+                payload = message_payload(channel_id, data.get('content') or '', guild_id=guild_id,
+                                          message_id=time_snowflake(), embeds=data.get('embeds') or ())
+                self.add_history(channel_id, [payload])
+                return json_response(payload)
+            before = query.get('before') if query else None
+            limit = min(int(query.get('limit', 50)) if query else 50, 100)
+            return json_response(self._history(channel_id, int(before) if before else None, limit))
+        if parts[0] == 'channels' and parts[2:] == ['messages', 'bulk-delete'] and method == 'POST':
+            channel_id = int(parts[1])
+            message_ids = [int(message_id) for message_id in data.get('messages', [])]
+            if not 2 <= len(message_ids) <= 100:
+                return json_response({'code': 50016, 'message': 'Provide 2 to 100 messages to delete.'}, status=400)
+            if any(time.time() - snowflake_time(message_id) > BULK_DELETE_MAX_AGE for message_id in message_ids):
+                return json_response({'code': 50034, 'message': 'You can only bulk delete messages that are under '
+                                                                '14 days old.'}, status=400)
+            for message_id in message_ids:
+                self._delete_message(channel_id, message_id)
+            return web.Response(status=204)
+        if parts[0] == 'channels' and len(parts) == 4 and parts[2] == 'messages' and method == 'DELETE':
+            if not self._delete_message(int(parts[1]), int(parts[3])):
+                return json_response({'code': 10008, 'message': 'Unknown Message'}, status=404)
+            return web.Response(status=204)
+        if parts[0] == 'channels' and len(parts) == 4 and parts[2] == 'messages' and method == 'PATCH':
+            channel_id = int(parts[1])
+            payload = message_payload(channel_id, data.get('content') or '', message_id=int(parts[3]),
+                                      guild_id=self._guild_of_channel(channel_id), embeds=data.get('embeds') or ())
+            if int(parts[3]) in self.messages.get(channel_id, {}):
+                self.messages[channel_id][int(parts[3])] = payload
+            return json_response(payload)
+        if parts[0] == 'guilds' and len(parts) == 2 and method == 'GET':
+            guild = dict(self.guilds[int(parts[1])])
+            guild['approximate_member_count'] = guild['member_count']
+            guild['approximate_presence_count'] = guild['member_count'] // 3
+            return json_response(guild)
+        if parts[0] == 'guilds' and len(parts) == 4 and parts[2] == 'members' and method == 'GET':
+            return json_response(member_payload(int(parts[3])))
+        if parts[0] == 'guilds' and len(parts) == 4 and parts[2] == 'members' and method == 'PATCH':
+            return json_response(member_payload(int(parts[3])))
+        # Deletes, kicks, bans, reactions...
+        return web.Response(status=204)
+
+    def _guild_of_channel(self, channel_id: int):
+        return self.channel_guilds.get(channel_id)
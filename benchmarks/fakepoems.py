@@ -0,0 +1,119 @@
+"""
+A local stand-in for an OpenAI-compatible text generation API, /v1/completions and
+/v1/chat/completions, for running the poem generator (and the bot) without a model.
+
+It behaves like a model server with `slots` generations running at a time, each
+taking `latency` seconds plus `per_prompt` for every extra prompt batched into it,
+so batching pays off the way it does on a real GPU server. Every request is counted.
+
+    python -m benchmarks.fakepoems --port 8089
+    POEM_API_URL=http://127.0.0.1:8089/v1 python mainfile.py
+"""
+import argparse
+import asyncio
+import itertools
+import random
+import re
+from collections import Counter
+
+from aiohttp import web
+
+TOPIC = re.compile(r'about (.*?)\. Reply')
+
+LINES = [
+    "Upon the {topic} the morning lingers,",
+    "{topic} slipping gently through my fingers,",
+    "I sing of {topic}, loud and long,",
+    "And {topic} hums its quiet song,",
+    "Who knew that {topic} could be so grand,",
+    "The {topic} drifts across the land,",
+]
+
+
+def fake_poem(prompt: str) -> str:
+    match = TOPIC.search(prompt)
+    topic = match.group(1) if match else "something"
+    return "\n".join(line.format(topic=topic) for line in random.sample(LINES, 4))
+
+
+class FakePoemAPI:
+    def __init__(self, latency: float = 0.3, per_prompt: float = 0.01, slots: int = 4, failure_rate: float = 0.0):
+        self.latency = latency
+        self.per_prompt = per_prompt
+        self.failure_rate = failure_rate
+        self.calls = Counter()  # route -> requests
+        self.prompts = 0
+        self._slots = asyncio.Semaphore(slots)
+        self._ids = itertools.count(1)
+        self._runner = None
+        self.port = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/v1"
+
+    async def start(self, port: int = 0):
+        app = web.Application()
+        app.router.add_post('/v1/completions', self._completions)
+        app.router.add_post('/v1/chat/completions', self._chat)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, '127.0.0.1', port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        await self._runner.cleanup()
+
+    async def _generate(self, prompts: list) -> list:
+        self.prompts += len(prompts)
+        async with self._slots:
+            await asyncio.sleep(self.latency + self.per_prompt * (len(prompts) - 1))
+        if random.random() < self.failure_rate:
+            raise web.HTTPServiceUnavailable(text='{"error": {"message": "overloaded"}}',
+                                             content_type='application/json')
+        return [fake_poem(prompt) for prompt in prompts]
+
+    async def _completions(self, request: web.Request):
+        self.calls['completions'] += 1
+        body = await request.json()
+        prompts = body['prompt'] if isinstance(body['prompt'], list) else [body['prompt']]
+        texts = await self._generate(prompts)
+        return web.json_response({
+            'id': f"cmpl-{next(self._ids)}", 'object': 'text_completion', 'model': body.get('model'),
+            'choices': [{'index': index, 'text': "\n" + text, 'finish_reason': 'stop'}
+                        for index, text in enumerate(texts)],
+        })
+
+    async def _chat(self, request: web.Request):
+        self.calls['chat'] += 1
+        body = await request.json()
+        text, = await self._generate([body['messages'][-1]['content']])
+        return web.json_response({
+            'id': f"chatcmpl-{next(self._ids)}", 'object': 'chat.completion', 'model': body.get('model'),
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': text}, 'finish_reason': 'stop'}],
+        })
+
+
+async def serve(args):
+    api = await FakePoemAPI(args.latency, args.per_prompt, args.slots, args.failure_rate).start(args.port)
+    print(f"Serving a fake poem API on {api.base_url}")
+    await asyncio.Event().wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency', type=float, default=0.3, help='Seconds one generation takes')
+    parser.add_argument('--per-prompt', type=float, default=0.01, help='Seconds each extra prompt in a batch adds')
+    parser.add_argument('--slots', type=int, default=4, help='Generations running at the same time')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='Share of requests answered with a 503')
+    try:
+        asyncio.run(serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
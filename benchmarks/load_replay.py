@@ -0,0 +1,419 @@
+"""
+Load replay: boots mainfile's bot with every cog against the local fake Discord and
+replays synthetic event streams, one scenario at a time.
+
+    python -m benchmarks.load_replay --output before.json
+    python -m benchmarks.load_replay --output after.json --baseline before.json
+
+Scenarios are message floods nobody answers (chatter), keyword responses, each
+command on its own (cmd:<name>), member join bursts, reaction storms on a poll, and
+one user spamming commands (the only scenario run with admission limits, the others
+lift them to measure the work itself). For each one it reports events per second
+(from the first event sent until the bot has read them all and every command
+finished), p50/p99 command latency (event sent to on_command_completion), REST calls
+per command or event, how many messages admission control turned away, and RSS.
+
+The fake runs in a child process so RSS is the bot's alone. Event times are taken
+with time.monotonic(), which is the same clock in both processes.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import resource
+import statistics
+import sys
+import tempfile
+import time
+
+from benchmarks.fakediscord import FakeDiscord, guild_member_ids, guild_payload, message_payload, member_payload, \
+    time_snowflake
+from admission import AdmissionControl
+from benchmarks.purge import history
+from metrics import metrics
+from outbound import dispatcher
+
+GUILD_ID = 1 << 22
+OWNER_ID = GUILD_ID + 2  # guild_payload's owner, allowed to run moderation commands
+EMOJIS = ["1️⃣", "2️⃣", "3️⃣", "4️⃣"]
+
+
+def current_rss_kib() -> int:
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def percentile(values: list, share: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * share), len(ordered) - 1)]
+
+
+# The fake, in its own process
+
+def serve_fake(conn, guilds, latency: float):
+    async def serve():
+        fake = await FakeDiscord(guilds, latency=latency).start()
+        conn.send(fake.base_url)
+        loop = asyncio.get_running_loop()
+        while True:
+            request = await loop.run_in_executor(None, conn.recv)
+            if request[0] == 'dispatch':
+                _, events, rate = request
+                started = time.monotonic()
+                sent = []
+                for i, (name, data) in enumerate(events):
+                    if rate:
+                        await asyncio.sleep(max(started + i / rate - time.monotonic(), 0))
+                    await fake.dispatch(name, data)
+                    sent.append(time.monotonic())
+                conn.send((sent, fake.sequence))
+            elif request[0] == 'calls':
+                conn.send(dict(fake.calls))
+            elif request[0] == 'history':
+                fake.add_history(request[1], request[2])
+                conn.send(None)
+            elif request[0] == 'stop':
+                await fake.stop()
+                conn.send(None)
+                return
+
+    asyncio.run(serve())
+
+
+class Driver:
+    """Sends events through the fake and measures how the bot in this process handles them."""
+
+    def __init__(self, bot, conn, rate: float):
+        self.bot = bot
+        self.conn = conn
+        self.rate = rate
+        self.loop = asyncio.get_running_loop()
+        self.completed = {}  # command message id -> when on_command_completion/on_command_error ran
+        self.latencies = []
+        bot.add_listener(self.on_command_completion)
+        bot.add_listener(self.on_command_error)
+
+    async def request(self, *request):
+        self.conn.send(request)
+        return await self.loop.run_in_executor(None, self.conn.recv)
+
+    async def on_command_completion(self, ctx):
+        self.completed[ctx.message.id] = time.monotonic()
+
+    async def on_command_error(self, ctx, error):
+        self.completed[ctx.message.id] = time.monotonic()
+
+    async def replay(self, events: list, timeout: float = 120.0):
+        """
+        Sends (event, payload, is_command) tuples and waits until the bot has read every one
+        and every command finished. Returns (first send, when processing finished).
+        """
+        sent, sequence = await self.request('dispatch', [(name, data) for name, data, _ in events], self.rate)
+        # Fast commands can finish before the fake reports when it sent them, so completions are
+        # recorded by message ID and matched up here
+        commands = {int(data['id']): when for (name, data, is_command), when in zip(events, sent) if is_command}
+        deadline = time.monotonic() + timeout
+        while (self.bot.ws.sequence or 0) < sequence or not commands.keys() <= self.completed.keys():
+            if time.monotonic() > deadline:
+                print(f"Timed out with {len(commands.keys() - self.completed.keys())} commands unfinished",
+                      file=sys.stderr)
+                break
+            await asyncio.sleep(0.005)
+        finished = time.monotonic() - 0.005
+        done = [(self.completed.pop(message_id), when) for message_id, when in commands.items()
+                if message_id in self.completed]
+        self.latencies += [completed - when for completed, when in done]
+        if done:
+            finished = max(completed for completed, _ in done)
+        return sent[0] if sent else time.monotonic(), finished
+
+
+# Scenarios, each an async function returning (events sent, commands sent, seconds spent processing)
+
+def channels(bot) -> list:
+    return [channel.id for channel in bot.get_guild(GUILD_ID).text_channels]
+
+
+def members(count: int) -> list:
+    return list(guild_member_ids(GUILD_ID, count))
+
+
+def message(channel_id: int, content: str, author_id: int) -> dict:
+    # The high increment bit keeps these IDs apart from the ones the fake hands out for the bot's messages
+    return message_payload(channel_id, content, author_id=author_id, guild_id=GUILD_ID,
+                           message_id=time_snowflake() | 1 << 21)
+
+
+async def replay_messages(driver, contents: list, is_command: bool, author_id=None):
+    rng = random.Random(1)
+    channel_ids = channels(driver.bot)
+    authors = members(200)
+    events = [('MESSAGE_CREATE', message(channel_ids[i % len(channel_ids)], content,
+                                         author_id or rng.choice(authors)), is_command)
+              for i, content in enumerate(contents)]
+    started, finished = await driver.replay(events)
+    return len(events), len(events) if is_command else 0, finished - started
+
+
+def chatter(count: int):
+    async def run(driver):
+        rng = random.Random(2)
+        words = "the a raid poll song game lol ok nice when is it what why".split()
+        contents = [" ".join(rng.choice(words) for _ in range(rng.randint(3, 20))) for _ in range(count)]
+        return await replay_messages(driver, contents, is_command=False)
+    return run
+
+
+def keywords(count: int):
+    async def run(driver):
+        phrases = ["!hello there", "!how are you", "!bye all", "!roll dice", "!generate a poem about cats"]
+        return await replay_messages(driver, [phrases[i % len(phrases)] for i in range(count)], is_command=False)
+    return run
+
+
+def command(text: str, count: int, author_id: int = None):
+    async def run(driver):
+        return await replay_messages(driver, [text] * count, is_command=True, author_id=author_id)
+    return run
+
+
+def tictactoe(games: int):
+    async def run(driver):
+        # Games against the bot, one per player, each move picked from the board the cog holds
+        cog = driver.bot.get_cog('TicTacToe')
+        channel_ids = channels(driver.bot)
+        players = [(channel_ids[i % len(channel_ids)], author) for i, author in enumerate(members(games))]
+        events = [('MESSAGE_CREATE', message(channel_id, "!tictactoe ai", author), True)
+                  for channel_id, author in players]
+        started, finished = await driver.replay(events)
+        sent, commands, busy = len(events), len(events), finished - started
+        rng = random.Random(3)
+        while True:
+            events = []
+            for channel_id, author in players:
+                game = cog.sessions.get(channel_id, author)
+                if game is not None and game.message_id is not None:
+                    position = rng.choice([p for p in range(9) if game.is_free(p)])
+                    events.append(('MESSAGE_CREATE', message(channel_id, f"!move {position + 1}", author), True))
+            if not events:
+                return sent, commands, busy
+            started, finished = await driver.replay(events)
+            sent, commands, busy = sent + len(events), commands + len(events), busy + finished - started
+    return run
+
+
+def purge(messages_per_channel: int):
+    async def run(driver):
+        channel_ids = channels(driver.bot)
+        for channel_id in channel_ids:
+            await driver.request('history', channel_id,
+                                 history(channel_id, GUILD_ID, messages_per_channel, 3, 0.1, random.Random(4)))
+        events = [('MESSAGE_CREATE', message(channel_id, f"!purge {messages_per_channel // 2}", OWNER_ID), True)
+                  for channel_id in channel_ids]
+        started, finished = await driver.replay(events)
+        return len(events), len(events), finished - started
+    return run
+
+
+def join_burst(count: int):
+    async def run(driver):
+        events = [('GUILD_MEMBER_ADD', dict(member_payload(500000000000000000 + i), guild_id=str(GUILD_ID)), False)
+                  for i in range(count)]
+        started, finished = await driver.replay(events)
+        return len(events), 0, finished - started
+    return run
+
+
+def reaction_storm(count: int):
+    async def run(driver):
+        channel_id = channels(driver.bot)[0]
+        poll_command = message(channel_id, "!poll Best option? | A, B, C, D", OWNER_ID)
+        await driver.replay([('MESSAGE_CREATE', poll_command, True)])
+        driver.latencies = []  # Only the reactions count
+        store = driver.bot.get_cog('PollCog').store
+        poll = next(poll for poll in store.polls.values() if poll.channel_id == channel_id)
+        rng = random.Random(5)
+        voters = members(1000)
+        events = [('MESSAGE_REACTION_ADD', {
+            'user_id': str(rng.choice(voters)),
+            'channel_id': str(channel_id),
+            'message_id': str(poll.message_id),
+            'guild_id': str(GUILD_ID),
+            'emoji': {'id': None, 'name': rng.choice(EMOJIS)},
+            'burst': False,
+            'type': 0,
+        }, False) for _ in range(count)]
+        started, finished = await driver.replay(events)
+        return len(events), 0, finished - started
+    return run
+
+
+def spam(count: int):
+    async def run(driver):
+        # One user flooding a channel with commands and responses, most of it should be turned away
+        # quietly. Sent as plain events: rejected commands never reach on_command_completion.
+        channel_id = channels(driver.bot)[0]
+        texts = ["!poll Spam? | Yes, No", "!generate a poem about spam", "!hello", "!members", "!tictactoe ai"]
+        author = members(1)[0]
+        events = [('MESSAGE_CREATE', message(channel_id, texts[i % len(texts)], author), False) for i in range(count)]
+        started, finished = await driver.replay(events)
+        return len(events), 0, finished - started
+    return run
+
+
+def admission(limited: bool) -> AdmissionControl:
+    control = AdmissionControl(lag=metrics.loop_lag.current, queue_depth=dispatcher.queue_depth)
+    if not limited:
+        # The synthetic guild stands in for many and the owner runs every purge, so apart from the spam
+        # scenario the limits are lifted to measure the work itself
+        for table in (control.users, control.guilds, *control.classes.values()):
+            table.burst, table.rate = 10 ** 9, 10 ** 9
+    return control
+
+
+def scenarios(scale: float) -> list:
+    """
+    (name, run, seconds to wait afterwards for background flushes like welcome messages and poll edits,
+    whether admission limits apply)
+    """
+    n = lambda count: max(int(count * scale), 1)
+    scenarios = [
+        ('chatter', chatter(n(5000)), 0.5),
+        ('keywords', keywords(n(500)), 1.0),
+        ('cmd:help', command("!help", n(40)), 1.0),
+        ('cmd:members', command("!members", n(40)), 1.0),
+        ('cmd:activemembers', command("!activemembers", n(40)), 1.0),
+        ('cmd:globalstats', command("!globalstats", n(40)), 1.0),
+        ('cmd:queue', command("!queue", n(40)), 1.0),
+        ('cmd:poll', command("!poll Lunch? | Pizza, Sushi, Tacos", n(40)), 2.5),
+        ('cmd:tictactoe', tictactoe(n(20)), 1.0),
+        ('cmd:purge', purge(n(200)), 1.0),
+        ('join_burst', join_burst(n(500)), 3.5),
+        ('reaction_storm', reaction_storm(n(2000)), 2.5),
+    ]
+    return [(name, run, settle, False) for name, run, settle in scenarios] + [('spam', spam(n(500)), 1.0, True)]
+
+
+async def run(args):
+    os.environ.setdefault('POLL_STATE_FILE', os.path.join(tempfile.mkdtemp(), 'polls.json'))
+    for name in ('AUTOSHARD', 'SHARD_COUNT', 'SHARD_IDS', 'CLUSTER_PROCESSES', 'STARTUP_PROFILE'):
+        os.environ.pop(name, None)
+
+    guild = guild_payload(GUILD_ID, args.members, text_channels=args.channels)
+    parent_conn, child_conn = multiprocessing.Pipe()
+    server = multiprocessing.Process(target=serve_fake, args=(child_conn, [guild], args.latency), daemon=True)
+    server.start()
+    base_url = parent_conn.recv()
+    FakeDiscord.point_client_at(base_url)
+
+    rss_before_import = current_rss_kib()
+    import mainfile
+    bot = mainfile.bot
+    results = []
+    async with bot:
+        for extension in mainfile.EXTENSIONS:
+            await bot.load_extension(extension)
+        bot.shard_metrics.start()
+        runner = asyncio.ensure_future(bot.start('fake-token'))
+        await asyncio.wait_for(bot.wait_until_ready(), timeout=60)
+        driver = Driver(bot, parent_conn, args.rate)
+
+        print(f"members={args.members} channels={args.channels} scale={args.scale} latency={args.latency * 1000:.0f} ms")
+        print(f"{'scenario':<20}{'events':>8}{'events/s':>10}{'p50 (ms)':>10}{'p99 (ms)':>10}{'calls/cmd':>11}"
+              f"{'calls/event':>13}{'rejected':>10}{'RSS (MiB)':>11}")
+        metrics.loop_lag.start()
+        for name, scenario, settle, limited in scenarios(args.scale):
+            if args.only and not any(name.startswith(prefix) for prefix in args.only):
+                continue
+            mainfile.router.admission = admission(limited)
+            calls_before = await driver.request('calls')
+            driver.latencies = []
+            events, commands, busy = await scenario(driver)
+            await asyncio.sleep(settle)
+            calls_after = await driver.request('calls')
+            calls = sum(calls_after.values()) - sum(calls_before.values())
+            result = {
+                'scenario': name,
+                'events': events,
+                'events_per_s': round(events / busy, 1) if busy > 0 else None,
+                'p50_ms': round(percentile(driver.latencies, 0.50) * 1000, 2),
+                'p99_ms': round(percentile(driver.latencies, 0.99) * 1000, 2),
+                'mean_ms': round(statistics.mean(driver.latencies) * 1000, 2) if driver.latencies else 0.0,
+                'api_calls': calls,
+                'calls_per_command': round(calls / commands, 2) if commands else None,
+                'calls_per_event': round(calls / events, 3),
+                'rejected': sum(mainfile.router.admission.rejected.values()),
+                'rss_mib': round(current_rss_kib() / 1024, 1),
+            }
+            results.append(result)
+            print(f"{name:<20}{events:>8}{result['events_per_s'] or 0:>10}{result['p50_ms']:>10}{result['p99_ms']:>10}"
+                  f"{result['calls_per_command'] if commands else '-':>11}{result['calls_per_event']:>13}"
+                  f"{result['rejected']:>10}{result['rss_mib']:>11}")
+
+        metrics.loop_lag.stop()
+        await bot.close()
+        await runner
+        await dispatcher.close()
+        if mainfile.router.poems is not None:  # POEM_API_URL set, poems come from a generation API
+            await mainfile.router.poems.close()
+    await driver.request('stop')
+    server.join(timeout=5)
+
+    report = {
+        'config': {key: value for key, value in vars(args).items() if key not in ('output', 'baseline')},
+        'python': sys.version.split()[0],
+        'rss_before_import_mib': round(rss_before_import / 1024, 1),
+        'peak_rss_mib': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'scenarios': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+    if args.baseline:
+        compare(report, args.baseline)
+
+
+def compare(report: dict, baseline_path: str):
+    """Prints each metric's change against an earlier run's JSON."""
+    with open(baseline_path) as file:
+        baseline = {result['scenario']: result for result in json.load(file)['scenarios']}
+    print(f"\nChange against {baseline_path}:")
+    print(f"{'scenario':<20}{'events/s':>10}{'p50':>9}{'p99':>9}{'calls/event':>13}{'RSS':>8}")
+
+    def change(new, old):
+        if not old or new is None:
+            return "-"
+        return f"{(new - old) / old:+.0%}"
+
+    for result in report['scenarios']:
+        old = baseline.get(result['scenario'])
+        if old is None:
+            continue
+        print(f"{result['scenario']:<20}{change(result['events_per_s'], old['events_per_s']):>10}"
+              f"{change(result['p50_ms'], old['p50_ms']):>9}{change(result['p99_ms'], old['p99_ms']):>9}"
+              f"{change(result['calls_per_event'], old['calls_per_event']):>13}"
+              f"{change(result['rss_mib'], old['rss_mib']):>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', type=float, default=1.0, help='Multiplies the number of events in every scenario')
+    parser.add_argument('--members', type=int, default=1000, help='Members in the synthetic guild')
+    parser.add_argument('--channels', type=int, default=20, help='Text channels commands are spread over')
+    parser.add_argument('--rate', type=float, default=0, help='Events per second to send at, 0 for as fast as possible')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds the fake server takes to respond')
+    parser.add_argument('--only', nargs='*', help='Only run scenarios whose names start with these')
+    parser.add_argument('--output', help='Write the results to this JSON file')
+    parser.add_argument('--baseline', help='Compare against the JSON output of an earlier run')
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""
+RSS and time-to-READY for each member cache policy, against a fake gateway
+replaying large GUILD_CREATE payloads (and answering member chunk requests).
+
+    python -m benchmarks.member_cache --guilds 20 --members 20000
+
+Every policy runs in a fresh child process so RSS isn't shared between runs,
+while the fake gateway runs in this process.
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import sys
+import time
+
+import discord
+from discord.ext import commands
+
+from benchmarks.fakediscord import FakeDiscord, guild_payload
+
+# (MEMBER_CACHE, CHUNK_GUILDS_AT_STARTUP)
+POLICIES = [
+    ('all', True),
+    ('all', False),
+    ('voice', False),
+    ('none', False),
+]
+
+
+def current_rss_kib() -> int:
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+async def run_child(base_url: str, policy: str, chunk: bool):
+    from membercache import member_cache_flags
+
+    FakeDiscord.point_client_at(base_url)
+    intents = discord.Intents.default()
+    intents.members = True
+    intents.message_content = True
+    bot = commands.Bot(
+        command_prefix="!",
+        intents=intents,
+        member_cache_flags=member_cache_flags(policy),
+        chunk_guilds_at_startup=chunk,
+        guild_ready_timeout=0.2,  # Default is 2s of waiting after the last GUILD_CREATE
+    )
+    rss_before = current_rss_kib()
+    ready = asyncio.Event()
+
+    @bot.event
+    async def on_ready():
+        ready.set()
+
+    started = time.perf_counter()
+    runner = asyncio.ensure_future(bot.start('fake-token'))
+    await asyncio.wait_for(ready.wait(), timeout=600)
+    time_to_ready = time.perf_counter() - started
+
+    result = {
+        'policy': policy,
+        'chunk_at_startup': chunk,
+        'time_to_ready_s': round(time_to_ready, 3),
+        'rss_mib': round(current_rss_kib() / 1024, 1),
+        'rss_growth_mib': round((current_rss_kib() - rss_before) / 1024, 1),
+        'cached_members': sum(len(guild.members) for guild in bot.guilds),
+    }
+    await bot.close()
+    await runner
+    print(json.dumps(result))
+
+
+async def run_parent(args):
+    guilds = [guild_payload((i + 1) << 22, args.members) for i in range(args.guilds)]
+    fake = await FakeDiscord(guilds).start()
+    print(f"guilds={args.guilds} members/guild={args.members}")
+    print(f"{'MEMBER_CACHE':<13}{'chunk':<7}{'ready (s)':>10}{'RSS (MiB)':>11}{'growth':>9}{'cached':>10}")
+    results = []
+    try:
+        for policy, chunk in POLICIES:
+            process = await asyncio.create_subprocess_exec(
+                sys.executable, '-m', 'benchmarks.member_cache', '--child', fake.base_url, policy, str(int(chunk)),
+                stdout=asyncio.subprocess.PIPE,
+            )
+            stdout, _ = await process.communicate()
+            result = json.loads(stdout.decode().strip().splitlines()[-1])
+            results.append(result)
+            print(f"{policy:<13}{str(chunk):<7}{result['time_to_ready_s']:>10}{result['rss_mib']:>11}"
+                  f"{result['rss_growth_mib']:>9}{result['cached_members']:>10}")
+    finally:
+        await fake.stop()
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == '--child':
+        base_url, policy, chunk = sys.argv[2:5]
+        asyncio.run(run_child(base_url, policy, chunk == '1'))
+        return
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--guilds', type=int, default=20)
+    parser.add_argument('--members', type=int, default=20000, help='Members per guild')
+    parser.add_argument('--output', help='Also write the results to this JSON file')
+    asyncio.run(run_parent(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+!activemembers against a synthetic guild: the old full scan of guild.members
+versus StatsCog's incrementally maintained counters.
+
+    python -m benchmarks.member_counts --members 200000 --queries 200 --updates 100000
+"""
+import argparse
+import asyncio
+import random
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+import discord
+
+from cogs.stats import StatsCog
+
+STATUSES = [discord.Status.online, discord.Status.idle, discord.Status.dnd] + [discord.Status.offline] * 3
+
+
+def build_guild(rng, member_count):
+    members = [
+        SimpleNamespace(bot=rng.random() < 0.02, status=rng.choice(STATUSES))
+        for _ in range(member_count)
+    ]
+    return SimpleNamespace(id=1, members=members, chunked=True, member_count=member_count)
+
+
+def old_activemembers(guild):
+    active_members = [member for member in guild.members if
+                      member.status != discord.Status.offline and not member.bot]
+    return len(active_members)
+
+
+async def apply_presence_updates(cog, guild, rng, updates):
+    for _ in range(updates):
+        member = rng.choice(guild.members)
+        before = SimpleNamespace(bot=member.bot, status=member.status, guild=guild)
+        member.status = rng.choice(STATUSES)
+        after = SimpleNamespace(bot=member.bot, status=member.status, guild=guild)
+        await cog.on_presence_update(before, after)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--members', type=int, default=200000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--updates', type=int, default=100000, help='Presence updates applied between the runs')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    guild = build_guild(rng, args.members)
+    cog = StatsCog(bot=None)
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    for _ in range(args.queries):
+        old_count = old_activemembers(guild)
+    scan_time = (time.perf_counter() - started) / args.queries
+    _, scan_peak = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+
+    started = time.perf_counter()
+    cog.get_counts(guild)
+    seed_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for _ in range(args.queries):
+        new_count = cog.get_counts(guild).online_humans
+    lookup_time = (time.perf_counter() - started) / args.queries
+    _, lookup_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert old_count == new_count, (old_count, new_count)
+
+    started = time.perf_counter()
+    asyncio.run(apply_presence_updates(cog, guild, rng, args.updates))
+    update_time = (time.perf_counter() - started) / args.updates
+    assert old_activemembers(guild) == cog.get_counts(guild).online_humans
+
+    print(f"members={args.members} active={new_count}")
+    print(f"full scan:        {scan_time * 1000:9.3f} ms/query  peak alloc {scan_peak / 1024:9.1f} KiB")
+    print(f"counter lookup:   {lookup_time * 1000:9.5f} ms/query  peak alloc {lookup_peak / 1024:9.1f} KiB")
+    print(f"one-time seed:    {seed_time * 1000:9.3f} ms")
+    print(f"presence update:  {update_time * 1e6:9.3f} us/event (counters still match a full scan)")
+
+
+if __name__ == '__main__':
+    main()
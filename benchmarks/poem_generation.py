@@ -0,0 +1,154 @@
+"""
+Poem generation under concurrent requests: throughput and tail latency of each way of
+asking an OpenAI-compatible API for poems, against the local fake in fakepoems.py.
+
+    python -m benchmarks.poem_generation --output poems.json
+
+Requests arrive at a steady --rate with topics drawn Zipf-like from --topics (popular
+topics come up again and again, spelled with different case and punctuation), which is
+what "generate a poem about ..." traffic looks like. Strategies:
+
+  session-per-request  a new HTTP client per poem, waiting as long as it takes
+  pooled               one pooled client, one chat request per poem, still no limit
+  generator:chat       PoemGenerator over /chat/completions: cache, one request per
+                       topic in flight, template after --timeout or under load
+  generator:batched    the same over /completions, each micro-batch one request
+
+Latency is from a request arriving until the caller has a poem, generated or not;
+"templated" counts the ones the fallback answered.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import aiohttp
+
+from benchmarks.fakepoems import FakePoemAPI
+from poems import PROMPT, ChatBackend, CompletionsBackend, PoemGenerator
+
+TEMPLATE = "Roses are red, violets are blue..."
+SPELLINGS = [str.lower, str.title, lambda topic: topic + "!", lambda topic: f"  {topic}."]
+
+
+def percentile(values: list, share: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * share), len(ordered) - 1)]
+
+
+def workload(requests: int, topics: int, seed: int = 1) -> list:
+    rng = random.Random(seed)
+    weights = [1 / rank for rank in range(1, topics + 1)]
+    names = [f"topic number {rank}" for rank in range(topics)]
+    return [rng.choice(SPELLINGS)(name) for name in rng.choices(names, weights, k=requests)]
+
+
+def session_per_request(api: FakePoemAPI):
+    backend = ChatBackend(api.base_url, 'fake')
+
+    async def poem(topic: str) -> str:
+        async with aiohttp.ClientSession() as session:
+            text, = await backend.generate(session, [PROMPT.format(topic=topic)])
+        return text or TEMPLATE
+    return poem, None
+
+
+def pooled(api: FakePoemAPI):
+    backend = ChatBackend(api.base_url, 'fake')
+    session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=8))
+
+    async def poem(topic: str) -> str:
+        text, = await backend.generate(session, [PROMPT.format(topic=topic)])
+        return text or TEMPLATE
+    return poem, session.close
+
+
+def generator(backend_class, timeout: float):
+    def build(api: FakePoemAPI):
+        poems = PoemGenerator(backend_class(api.base_url, 'fake'), timeout=timeout)
+        return (lambda topic: poems.poem(topic, lambda: TEMPLATE)), poems.close
+    return build
+
+
+async def run_strategy(name: str, build, args, topics: list) -> dict:
+    api = await FakePoemAPI(args.latency, args.per_prompt, args.slots).start()
+    poem, close = build(api)
+    latencies = []
+    templated = 0
+
+    async def one(topic: str):
+        nonlocal templated
+        started = time.perf_counter()
+        text = await poem(topic)
+        latencies.append(time.perf_counter() - started)
+        templated += text == TEMPLATE
+
+    tasks = []
+    started = time.perf_counter()
+    for index, topic in enumerate(topics):
+        delay = started + index / args.rate - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.ensure_future(one(topic)))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+
+    if close is not None:
+        await close()
+    await api.stop()
+    return {
+        'strategy': name,
+        'requests': len(topics),
+        'poems_per_s': len(topics) / elapsed,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'max_ms': max(latencies) * 1000,
+        'templated': templated,
+        'api_requests': sum(api.calls.values()),
+        'prompts': api.prompts,
+    }
+
+
+async def run(args):
+    strategies = {
+        'session-per-request': session_per_request,
+        'pooled': pooled,
+        'generator:chat': generator(ChatBackend, args.timeout),
+        'generator:batched': generator(CompletionsBackend, args.timeout),
+    }
+    topics = workload(args.requests, args.topics)
+    results = []
+    print(f"{'strategy':<22}{'poems/s':>9}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}{'templated':>11}"
+          f"{'API reqs':>10}{'prompts':>9}")
+    for name, build in strategies.items():
+        if args.only and not any(name.startswith(prefix) for prefix in args.only):
+            continue
+        result = await run_strategy(name, build, args, topics)
+        results.append(result)
+        print(f"{name:<22}{result['poems_per_s']:>9.1f}{result['p50_ms']:>9.1f}{result['p99_ms']:>9.1f}"
+              f"{result['max_ms']:>9.1f}{result['templated']:>11}{result['api_requests']:>10}{result['prompts']:>9}")
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump({'args': vars(args), 'strategies': results}, file, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=400, help='Poem requests per strategy')
+    parser.add_argument('--rate', type=float, default=50.0, help='Requests arriving per second')
+    parser.add_argument('--topics', type=int, default=100, help='Distinct topics requests are drawn from')
+    parser.add_argument('--latency', type=float, default=0.3, help='Seconds the fake API takes per generation')
+    parser.add_argument('--per-prompt', type=float, default=0.01, help='Seconds each extra batched prompt adds')
+    parser.add_argument('--slots', type=int, default=4, help='Generations the fake API runs at the same time')
+    parser.add_argument('--timeout', type=float, default=4.0, help="PoemGenerator's timeout before the template")
+    parser.add_argument('--only', nargs='*', help='Only run strategies whose names start with these')
+    parser.add_argument('--output', help='Write the results to this JSON file')
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
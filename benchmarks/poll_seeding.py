@@ -0,0 +1,105 @@
+"""
+Time until a poll is fully seeded, against the local fake Discord with the
+reaction route limited like the real one (1 request per 0.25s per channel).
+
+    python -m benchmarks.poll_seeding --options 10 --polls 5 --latency 0.05
+
+Compares seeding a reaction poll, one add_reaction after another as the
+dispatcher does, with a button poll, which needs no seeding requests at all.
+Reactions can't go faster: discord.py waits out the route's reset between them.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from types import SimpleNamespace
+
+import discord
+from discord.ext import commands
+
+from benchmarks.fakediscord import FakeDiscord, guild_payload
+from cogs.polls import PollButtons
+from outbound import OutboundDispatcher
+from pollengine import EMOJIS
+
+REACTION_ROUTE = 'PUT /channels/{id}/messages/{id}/reactions/{emoji}/@me'
+
+
+async def reactions(channel, emojis, dispatcher):
+    message = await channel.send("Poll")
+    await dispatcher.add_reactions(message, emojis)
+
+
+async def buttons(channel, emojis, dispatcher):
+    options = [f"Option {i + 1}" for i in range(len(emojis))]
+    await channel.send("Poll", view=PollButtons(SimpleNamespace(on_vote_button=lambda *args: None), options))
+
+
+STRATEGIES = {'reactions': reactions, 'buttons': buttons}
+
+
+async def timed(strategy, channel, emojis, dispatcher) -> float:
+    started = time.perf_counter()
+    await strategy(channel, emojis, dispatcher)
+    return time.perf_counter() - started
+
+
+async def run(args):
+    guild_id = 1 << 22
+    fake = await FakeDiscord([guild_payload(guild_id, 10, text_channels=args.polls)], latency=args.latency,
+                             route_limits={REACTION_ROUTE: (1, 0.25)}).start()
+    FakeDiscord.point_client_at(fake.base_url)
+
+    bot = commands.Bot(command_prefix="!", intents=discord.Intents.default())
+    ready = asyncio.Event()
+
+    @bot.event
+    async def on_ready():
+        ready.set()
+
+    runner = asyncio.ensure_future(bot.start('fake-token'))
+    await asyncio.wait_for(ready.wait(), timeout=60)
+    channels = bot.get_guild(guild_id).text_channels[:args.polls]
+    emojis = EMOJIS[:args.options]
+
+    print(f"options={args.options} concurrent polls={args.polls} latency={args.latency * 1000:.0f} ms")
+    print(f"{'strategy':<12}{'mean (s)':>10}{'max (s)':>10}{'requests/poll':>15}{'429s':>6}")
+    results = []
+    for name, strategy in STRATEGIES.items():
+        dispatcher = OutboundDispatcher()
+        fake.calls.clear()
+        rate_limited = fake.rate_limited
+        await asyncio.sleep(0.5)  # Let the previous run's reaction windows expire
+        times = await asyncio.gather(*(timed(strategy, channel, emojis, dispatcher) for channel in channels))
+        await dispatcher.close()
+        result = {
+            'strategy': name,
+            'mean_s': round(statistics.mean(times), 3),
+            'max_s': round(max(times), 3),
+            'requests_per_poll': sum(fake.calls.values()) / len(channels),
+            'rate_limited': fake.rate_limited - rate_limited,
+        }
+        results.append(result)
+        print(f"{name:<12}{result['mean_s']:>10}{result['max_s']:>10}{result['requests_per_poll']:>15}"
+              f"{result['rate_limited']:>6}")
+
+    await bot.close()
+    await runner
+    await fake.stop()
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--options', type=int, default=10, help='Options (reactions) per poll, up to 10')
+    parser.add_argument('--polls', type=int, default=5, help='Polls created at once, each in its own channel')
+    parser.add_argument('--latency', type=float, default=0.05, help='Seconds the fake server takes to respond')
+    parser.add_argument('--output', help='Also write the results to this JSON file')
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
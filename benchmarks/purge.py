@@ -0,0 +1,116 @@
+"""
+Purging one member's messages from a busy channel, against the local fake Discord
+with single message deletes limited to 5 per second per channel.
+
+    python -m benchmarks.purge --messages 5000 --days 20 --share 0.1 --amount 200
+
+Each strategy gets its own channel with the same history: `messages` messages spread
+over the last `days` days, `share` of them from the member being purged. Compares
+discord.py's channel.purge(limit=amount, check=...), where the limit counts messages
+scanned, with purgeengine's PurgeJob, which scans until `amount` messages matched.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import discord
+from discord.ext import commands
+
+from benchmarks.fakediscord import FakeDiscord, guild_payload, message_payload, time_snowflake
+from purgeengine import PurgeFilter, PurgeJob
+
+SINGLE_DELETE_ROUTE = 'DELETE /channels/{id}/messages/{id}'
+TARGET = 300000000000000001
+
+
+def history(channel_id: int, guild_id: int, count: int, days: float, share: float, rng) -> list:
+    now = time.time()
+    payloads = []
+    for i in range(count):
+        sent = now - days * 86400 * (count - i) / count
+        author = TARGET if rng.random() < share else 300000000000000002 + rng.randrange(50)
+        payloads.append(message_payload(channel_id, f"message {i}", author_id=author, guild_id=guild_id,
+                                        message_id=time_snowflake(sent)))
+    return payloads
+
+
+async def old_purge(channel, amount: int):
+    deleted = await channel.purge(limit=amount, check=lambda message: message.author.id == TARGET)
+    return len(deleted), None
+
+
+async def engine_purge(channel, amount: int):
+    job = PurgeJob(channel, amount, PurgeFilter(author_id=TARGET), scan_limit=100000)
+    await job.collect()
+    bulk_done = time.perf_counter()
+    await job.delete_old()
+    return job.deleted, bulk_done
+
+
+STRATEGIES = {'channel.purge': old_purge, 'PurgeJob': engine_purge}
+
+
+async def run(args):
+    guild_id = 1 << 22
+    fake = await FakeDiscord([guild_payload(guild_id, 10, text_channels=len(STRATEGIES))], latency=args.latency,
+                             route_limits={SINGLE_DELETE_ROUTE: (5, 1.0)}).start()
+    FakeDiscord.point_client_at(fake.base_url)
+
+    bot = commands.Bot(command_prefix="!", intents=discord.Intents.default())
+    ready = asyncio.Event()
+
+    @bot.event
+    async def on_ready():
+        ready.set()
+
+    runner = asyncio.ensure_future(bot.start('fake-token'))
+    await asyncio.wait_for(ready.wait(), timeout=60)
+    channels = bot.get_guild(guild_id).text_channels[:len(STRATEGIES)]
+
+    print(f"messages={args.messages} over {args.days} days, {args.share:.0%} from the member, amount={args.amount}")
+    print(f"{'strategy':<15}{'deleted':>9}{'requests':>10}{'bulk phase (s)':>16}{'total (s)':>11}{'429s':>6}")
+    results = []
+    for (name, strategy), channel in zip(STRATEGIES.items(), channels):
+        fake.add_history(channel.id, history(channel.id, guild_id, args.messages, args.days, args.share,
+                                             random.Random(args.seed)))
+        fake.calls.clear()
+        rate_limited = fake.rate_limited
+        started = time.perf_counter()
+        deleted, bulk_done = await strategy(channel, args.amount)
+        elapsed = time.perf_counter() - started
+        result = {
+            'strategy': name,
+            'deleted': deleted,
+            'requests': sum(fake.calls.values()),
+            'bulk_phase_s': round((bulk_done or time.perf_counter()) - started, 2),
+            'total_s': round(elapsed, 2),
+            'rate_limited': fake.rate_limited - rate_limited,
+        }
+        results.append(result)
+        print(f"{name:<15}{deleted:>9}{result['requests']:>10}{result['bulk_phase_s']:>16}{result['total_s']:>11}"
+              f"{result['rate_limited']:>6}")
+
+    await bot.close()
+    await runner
+    await fake.stop()
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=5000, help='Messages in the channel')
+    parser.add_argument('--days', type=float, default=20, help='Days the history is spread over')
+    parser.add_argument('--share', type=float, default=0.1, help="Share of the messages from the purged member")
+    parser.add_argument('--amount', type=int, default=200, help='Messages to purge')
+    parser.add_argument('--latency', type=float, default=0.05, help='Seconds the fake server takes to respond')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='Also write the results to this JSON file')
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
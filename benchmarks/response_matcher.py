@@ -0,0 +1,79 @@
+"""
+Messages/sec through the compiled response matcher with hundreds of rules,
+compared with the chain of `in` checks get_response used to run.
+
+    python -m benchmarks.response_matcher --rules 500 --messages 20000
+"""
+import argparse
+import random
+import string
+import time
+
+from responses import ResponseMatcher
+
+
+def _word(rng):
+    return ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 9)))
+
+
+def build_table(rng, rule_count):
+    rules = []
+    for i in range(rule_count):
+        if i % 10 == 9:
+            rules.append({'pattern': f"{_word(rng)} (?P<thing>\\w+)", 'response': "Thing: {thing}"})
+        else:
+            rules.append({'keyword': f"{_word(rng)} {_word(rng)}", 'response': f"Response {i}"})
+    return {'rules': rules}
+
+
+def build_messages(rng, table, count, hit_ratio):
+    keywords = [rule['keyword'] for rule in table['rules'] if 'keyword' in rule]
+    messages = []
+    for _ in range(count):
+        words = [_word(rng) for _ in range(rng.randint(3, 12))]
+        if rng.random() < hit_ratio:
+            words.insert(rng.randrange(len(words)), rng.choice(keywords))
+        messages.append(' '.join(words))
+    return messages
+
+
+def naive_match(keywords, lowered):
+    for index, keyword in enumerate(keywords):
+        if keyword in lowered:
+            return index
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rules', type=int, default=500)
+    parser.add_argument('--messages', type=int, default=20000)
+    parser.add_argument('--hit-ratio', type=float, default=0.2, help='Share of messages that match a rule')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    table = build_table(rng, args.rules)
+    messages = build_messages(rng, table, args.messages, args.hit_ratio)
+
+    started = time.perf_counter()
+    matcher = ResponseMatcher(table)
+    compile_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    hits = sum(1 for message in messages if matcher.match(message) is not None)
+    compiled_time = time.perf_counter() - started
+
+    # Keyword rules only, the old code had no regex rules
+    keywords = [rule['keyword'] for rule in table['rules'] if 'keyword' in rule]
+    started = time.perf_counter()
+    naive_hits = sum(1 for message in messages if naive_match(keywords, message) is not None)
+    naive_time = time.perf_counter() - started
+
+    print(f"rules={args.rules} messages={args.messages} compile={compile_time * 1000:.1f}ms")
+    print(f"compiled matcher: {args.messages / compiled_time:12,.0f} msgs/sec  hits={hits}")
+    print(f"chained `in`:     {args.messages / naive_time:12,.0f} msgs/sec  hits={naive_hits}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+"""
+REST calls per Tic-Tac-Toe game, against the local fake Discord with message
+edits limited like the real bucket (5 per 5s per channel).
+
+    python -m benchmarks.tictactoe_messages --games 5 --interval 0.3
+
+Replays the same games, each in its own channel, through the cog with moves
+arriving every `interval` seconds:
+
+- posts: the old behaviour, a new board message and a turn message per move
+- edits: one board message edited in place, edits collapsed when moves outpace the bucket
+- buttons: one board message with a button grid, each click answered with the new board
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import discord
+from discord.ext import commands
+
+from benchmarks.fakediscord import (APPLICATION_ID, FakeDiscord, guild_payload, member_payload, message_payload,
+                                    user_payload)
+import cogs.tictactoe
+from cogs.tictactoe import TicTacToe
+from outbound import OutboundDispatcher
+
+EDIT_ROUTE = 'PATCH /channels/{id}/messages/{id}'
+# Snowflake-sized so mentions of them parse, two per game
+PLAYERS = [(2 * 10 ** 17 + i * 2, 2 * 10 ** 17 + i * 2 + 1) for i in range(1000)]
+
+
+class PostEveryMove(TicTacToe):
+    """The cog before boards were edited: every move posts the board, then whose turn it is."""
+
+    def update_board(self, game, board: dict):
+        channel = self.bot.get_partial_messageable(game.channel_id)
+        content, _, board_text = board['content'].partition("\n```")
+        asyncio.ensure_future(self._post(channel, "```" + board_text, content))
+
+    @staticmethod
+    async def _post(channel, board: str, status: str):
+        await channel.send(board)
+        await channel.send(status)
+
+
+def interaction_payload(guild_id: int, channel_id: int, user_id: int, message_id: int, custom_id: str) -> dict:
+    return {
+        'id': str(random.getrandbits(60)),
+        'application_id': str(APPLICATION_ID),
+        'type': 3,
+        'token': 'fake-interaction-token',
+        'version': 1,
+        'guild_id': str(guild_id),
+        'channel_id': str(channel_id),
+        'channel': {'id': str(channel_id), 'type': 0},
+        'member': {'user': user_payload(user_id), 'roles': [], 'joined_at': None, 'deaf': False, 'mute': False,
+                   'flags': 0, 'permissions': '0'},
+        'message': message_payload(channel_id, '', guild_id=guild_id, message_id=message_id),
+        'data': {'custom_id': custom_id, 'component_type': 2},
+        'app_permissions': '0',
+        'locale': 'en-US',
+        'guild_locale': 'en-US',
+    }
+
+
+async def play(fake, cog, guild_id: int, channel_id: int, players: tuple, order: list, mode: str, interval: float):
+    x_player, o_player = players
+    start = message_payload(channel_id, f"!tictactoe <@{o_player}>" + (" buttons" if mode == 'buttons' else ""),
+                            author_id=x_player, guild_id=guild_id)
+    start['mentions'] = [dict(user_payload(o_player), member=member_payload(o_player))]
+    await fake.dispatch('MESSAGE_CREATE', start)
+    game = None
+    while game is None or game.message_id is None:
+        await asyncio.sleep(0.01)
+        game = cog.sessions.get(channel_id, x_player)
+
+    for turn, position in enumerate(order):
+        await asyncio.sleep(interval)
+        if cog.sessions.get(channel_id, x_player) is not game:
+            break  # Someone won
+        player = players[turn % 2]
+        if mode == 'buttons':
+            await fake.dispatch('INTERACTION_CREATE', interaction_payload(guild_id, channel_id, player,
+                                                                          game.message_id, f"ttt:{position}"))
+        else:
+            await fake.dispatch('MESSAGE_CREATE', message_payload(channel_id, f"!move {position + 1}",
+                                                                  author_id=player, guild_id=guild_id))
+
+
+async def run(args):
+    guild_id = 1 << 22
+    fake = await FakeDiscord([guild_payload(guild_id, 10, text_channels=args.games)], latency=args.latency,
+                             route_limits={EDIT_ROUTE: (5, 5.0)}).start()
+    FakeDiscord.point_client_at(fake.base_url)
+
+    intents = discord.Intents.default()
+    intents.message_content = True
+    bot = commands.Bot(command_prefix="!", intents=intents)
+    ready = asyncio.Event()
+
+    @bot.event
+    async def on_ready():
+        ready.set()
+
+    runner = asyncio.ensure_future(bot.start('fake-token'))
+    await asyncio.wait_for(ready.wait(), timeout=60)
+    channels = [channel.id for channel in bot.get_guild(guild_id).text_channels[:args.games]]
+    rng = random.Random(args.seed)
+    orders = [rng.sample(range(9), 9) for _ in channels]
+
+    print(f"games={args.games} move interval={args.interval * 1000:.0f} ms latency={args.latency * 1000:.0f} ms")
+    print(f"{'mode':<10}{'calls/game':>12}{'channel calls':>15}{'edits/game':>12}{'429s':>6}{'time (s)':>10}")
+    results = []
+    for mode, cog_class in (('posts', PostEveryMove), ('edits', TicTacToe), ('buttons', TicTacToe)):
+        cogs.tictactoe.dispatcher = OutboundDispatcher()
+        cog = cog_class(bot)
+        await bot.add_cog(cog)
+        await asyncio.sleep(5.5)  # Let the previous run's edit windows expire
+        fake.calls.clear()
+        rate_limited = fake.rate_limited
+
+        started = time.perf_counter()
+        await asyncio.gather(*(play(fake, cog, guild_id, channel_id, PLAYERS[i], order, mode,
+                                    args.interval)
+                               for i, (channel_id, order) in enumerate(zip(channels, orders))))
+        while cogs.tictactoe.dispatcher._edit_workers:  # Let the last edits go out
+            await asyncio.sleep(0.05)
+        elapsed = time.perf_counter() - started
+        await bot.remove_cog(cog.qualified_name)
+
+        calls = sum(count for route, count in fake.calls.items() if not route.startswith('GET /guilds'))
+        # Interaction responses don't count against the bot's channel buckets
+        callbacks = sum(count for route, count in fake.calls.items() if route.startswith('POST /interactions'))
+        result = {
+            'mode': mode,
+            'calls_per_game': calls / len(channels),
+            'channel_calls_per_game': (calls - callbacks) / len(channels),
+            'edits_per_game': fake.calls[EDIT_ROUTE] / len(channels),
+            'rate_limited': fake.rate_limited - rate_limited,
+            'time_s': round(elapsed, 2),
+        }
+        results.append(result)
+        print(f"{mode:<10}{result['calls_per_game']:>12.1f}{result['channel_calls_per_game']:>15.1f}"
+              f"{result['edits_per_game']:>12.1f}"
+              f"{result['rate_limited']:>6}{result['time_s']:>10}")
+
+    await bot.close()
+    await runner
+    await fake.stop()
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--games', type=int, default=5, help='Games played at once, each in its own channel')
+    parser.add_argument('--interval', type=float, default=0.3, help='Seconds between moves in a game')
+    parser.add_argument('--latency', type=float, default=0.05, help='Seconds the fake server takes to respond')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='Also write the results to this JSON file')
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
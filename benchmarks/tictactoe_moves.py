@@ -0,0 +1,130 @@
+"""
+Moves per second and memory per game with many concurrent Tic-Tac-Toe sessions:
+the old list board with its winning_combinations loop versus tttengine's
+bitboards, win lookup table and per-channel session manager.
+
+    python -m benchmarks.tictactoe_moves --sessions 10000 --moves 1000000
+
+Both engines replay the same random games and must agree on every outcome.
+"""
+import argparse
+import random
+import time
+import tracemalloc
+
+from tttengine import CONTINUE, DRAW, WIN, Game, SessionManager
+
+
+class OldGame:
+    """The cog's original state and rules, one instance per session."""
+
+    def __init__(self, x_player, o_player):
+        self.game_board = [" " for _ in range(9)]
+        self.players = {x_player: "X", o_player: "O"}
+        self.current_player = x_player
+
+    def check_winner(self):
+        winning_combinations = [
+            [0, 1, 2], [3, 4, 5], [6, 7, 8],
+            [0, 3, 6], [1, 4, 7], [2, 5, 8],
+            [0, 4, 8], [2, 4, 6],
+        ]
+        for combo in winning_combinations:
+            if self.game_board[combo[0]] == self.game_board[combo[1]] == self.game_board[combo[2]] != " ":
+                return True
+        return False
+
+    def move(self, user, position):
+        if user != self.current_player or self.game_board[position] != " ":
+            raise ValueError("Illegal move in the replay")
+        self.game_board[position] = self.players[user]
+        if self.check_winner():
+            return WIN
+        if " " not in self.game_board:
+            return DRAW
+        self.current_player = next(player for player in self.players if player != user)
+        return CONTINUE
+
+
+def run_old(sessions, orders, moves):
+    games = {}  # (channel, player) -> game, the lookup a multi-game cog would need
+    cursors = [0] * sessions
+    outcomes = [0, 0]
+    for channel in range(sessions):
+        game = OldGame(channel * 2, channel * 2 + 1)
+        games[(channel, channel * 2)] = games[(channel, channel * 2 + 1)] = game
+
+    started = time.perf_counter()
+    for step in range(moves):
+        channel = step % sessions
+        game = games[(channel, channel * 2)]
+        order = orders[channel]
+        result = game.move(game.current_player, order[cursors[channel]])
+        cursors[channel] += 1
+        if result != CONTINUE:
+            outcomes[result == DRAW] += 1
+            game = OldGame(channel * 2, channel * 2 + 1)
+            games[(channel, channel * 2)] = games[(channel, channel * 2 + 1)] = game
+            cursors[channel] = 0
+    return time.perf_counter() - started, outcomes
+
+
+def run_new(sessions, orders, moves):
+    manager = SessionManager()
+    cursors = [0] * sessions
+    outcomes = [0, 0]
+    for channel in range(sessions):
+        manager.start(channel, channel * 2, channel * 2 + 1)
+
+    started = time.perf_counter()
+    for step in range(moves):
+        channel = step % sessions
+        game = manager.get(channel, channel * 2)
+        order = orders[channel]
+        result = game.move(game.current_player, order[cursors[channel]])
+        cursors[channel] += 1
+        if result != CONTINUE:
+            outcomes[result == DRAW] += 1
+            manager.end(game)
+            manager.start(channel, channel * 2, channel * 2 + 1)
+            cursors[channel] = 0
+        else:
+            manager.touch(game)
+    return time.perf_counter() - started, outcomes
+
+
+def memory_per_game(factory, sessions):
+    tracemalloc.start()
+    games = [factory(channel) for channel in range(sessions)]
+    used, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del games
+    return used / sessions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', type=int, default=10000, help='Concurrent games')
+    parser.add_argument('--moves', type=int, default=1000000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    # Each session replays one random move order, the same one for both engines
+    orders = [rng.sample(range(9), 9) for _ in range(args.sessions)]
+
+    old_time, old_outcomes = run_old(args.sessions, orders, args.moves)
+    new_time, new_outcomes = run_new(args.sessions, orders, args.moves)
+    assert old_outcomes == new_outcomes, (old_outcomes, new_outcomes)
+
+    old_memory = memory_per_game(lambda channel: OldGame(channel * 2, channel * 2 + 1), args.sessions)
+    new_memory = memory_per_game(lambda channel: Game(channel, channel * 2, channel * 2 + 1), args.sessions)
+
+    print(f"sessions={args.sessions} moves={args.moves} games finished={sum(new_outcomes)} "
+          f"(wins {new_outcomes[0]}, draws {new_outcomes[1]})")
+    print(f"list board:  {args.moves / old_time:12,.0f} moves/s  {old_memory:7.0f} bytes/game")
+    print(f"bitboard:    {args.moves / new_time:12,.0f} moves/s  {new_memory:7.0f} bytes/game")
+
+
+if __name__ == '__main__':
+    main()
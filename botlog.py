@@ -0,0 +1,50 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+
+FORMAT = '%(asctime)s %(levelname)-8s %(name)s: %(message)s'
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Puts records on a bounded queue and drops them when it's full, logging never waits on the writer."""
+
+    def __init__(self, records: queue.Queue):
+        super().__init__(records)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+handler = None  # The installed DroppingQueueHandler, for its drop count
+
+
+def setup_logging(level: str = None, max_queued: int = 10000) -> logging.handlers.QueueListener:
+    """
+    Sends every logger (ours and discord.py's) through a queue to a background thread that does
+    the writing, so a slow terminal or log pipe never blocks the event loop. The level comes from
+    LOG_LEVEL (default INFO).
+    """
+    global handler
+    records = queue.Queue(max_queued)
+    level = logging.getLevelName((level or os.getenv('LOG_LEVEL', 'INFO')).upper())
+    stream = logging.StreamHandler()
+    stream.setLevel(level)
+    stream.setFormatter(logging.Formatter(FORMAT))
+    listener = logging.handlers.QueueListener(records, stream, respect_handler_level=True)
+
+    handler = DroppingQueueHandler(records)
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    # discord.http's rate limit warnings feed the outbound dispatcher's 429 count, let them through
+    # even when only errors are written out
+    root.setLevel(min(level, logging.WARNING))
+
+    listener.start()
+    atexit.register(listener.stop)  # Writes out whatever is still queued
+    return listener
@@ -0,0 +1,343 @@
+import asyncio
+import itertools
+import json
+import logging
+import os
+import secrets
+import signal
+import sys
+import time
+
+import aiohttp
+from discord.ext import commands
+
+log = logging.getLogger(__name__)
+
+# Discord only lets one shard identify every 5 seconds (max_concurrency 1)
+IDENTIFY_INTERVAL = 5.0
+# How long a cross-cluster query waits for the other workers
+QUERY_TIMEOUT = 3.0
+# Each worker runs the normal entry point with its shard range in the environment
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mainfile.py')
+
+
+def sharding_options():
+    """
+    Picks the bot class and sharding arguments from the environment.
+
+    SHARD_COUNT / SHARD_IDS run a fixed set of shards (set by the cluster launcher),
+    AUTOSHARD=1 lets Discord recommend a shard count for a single process.
+    """
+    shard_count = os.getenv('SHARD_COUNT')
+    shard_ids = os.getenv('SHARD_IDS')
+    if shard_count:
+        kwargs = {'shard_count': int(shard_count)}
+        if shard_ids:
+            kwargs['shard_ids'] = [int(shard_id) for shard_id in shard_ids.split(',')]
+        return commands.AutoShardedBot, kwargs
+    if os.getenv('AUTOSHARD') == '1':
+        return commands.AutoShardedBot, {}
+    return commands.Bot, {}
+
+
+def cluster_path(path: str) -> str:
+    """
+    This process's copy of a state file: polls.json is polls.2.json in cluster worker 2, and
+    unchanged outside a cluster. Workers share the environment, and one file written by all of
+    them would hold whichever saved last.
+    """
+    if not path or not os.getenv('CLUSTER_WORKER'):
+        return path
+    root, extension = os.path.splitext(path)
+    return f"{root}.{os.getenv('CLUSTER_ID', '0')}{extension}"
+
+
+def _shard_websockets(bot):
+    # discord.py doesn't expose per-shard sockets publicly, ShardInfo keeps them on its parent
+    if isinstance(bot, commands.AutoShardedBot):
+        return {shard_id: getattr(getattr(info, '_parent', None), 'ws', None) for shard_id, info in bot.shards.items()}
+    return {0: bot.ws}
+
+
+class ShardMetrics:
+    """Samples each shard's latency and gateway event rate from the websocket sequence numbers."""
+
+    def __init__(self, bot, interval: float = 10.0):
+        self.bot = bot
+        self.interval = interval
+        self.rates = {}  # shard id -> events/sec over the last interval
+        self._last = {}  # shard id -> (sampled at, sequence)
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.ensure_future(self._run())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+
+    async def _run(self):
+        while True:
+            self.sample()
+            await asyncio.sleep(self.interval)
+
+    def sample(self):
+        now = time.monotonic()
+        for shard_id, ws in _shard_websockets(self.bot).items():
+            sequence = getattr(ws, 'sequence', None) or 0
+            last = self._last.get(shard_id)
+            # Sequence numbers restart on a new session, don't report a negative rate
+            if last and sequence >= last[1] and now > last[0]:
+                self.rates[shard_id] = (sequence - last[1]) / (now - last[0])
+            self._last[shard_id] = (now, sequence)
+
+    def snapshot(self) -> dict:
+        latencies = dict(self.bot.latencies) if isinstance(self.bot, commands.AutoShardedBot) else {0: self.bot.latency}
+        return {
+            shard_id: {
+                'latency_ms': round(latency * 1000, 1) if latency == latency else None,  # NaN before the first heartbeat
+                'events_per_sec': round(self.rates.get(shard_id, 0.0), 2),
+            }
+            for shard_id, latency in latencies.items()
+        }
+
+
+def local_stats(bot, metrics: ShardMetrics) -> dict:
+    """This process's share of the global stats."""
+    return {
+        'cluster': os.getenv('CLUSTER_ID', '0'),
+        'guilds': len(bot.guilds),
+        'members': sum(guild.member_count or 0 for guild in bot.guilds),
+        'shards': metrics.snapshot(),
+    }
+
+
+async def _send(writer: asyncio.StreamWriter, message: dict):
+    writer.write(json.dumps(message).encode() + b'\n')
+    await writer.drain()
+
+
+class ClusterHub:
+    """
+    IPC hub run by the launcher: workers connect over localhost, and a query from
+    one worker is fanned out to every worker and the answers sent back to it.
+    """
+
+    def __init__(self, token: str):
+        self.token = token
+        self.workers = {}  # cluster id -> StreamWriter
+        self._pending = {}  # hub query id -> (replies, expected, future)
+        self._ids = itertools.count()
+        self.port = None
+
+    async def start(self):
+        server = await asyncio.start_server(self._handle, '127.0.0.1', 0)
+        self.port = server.sockets[0].getsockname()[1]
+        return server
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        hello = json.loads(await reader.readline() or b'{}')
+        if hello.get('type') != 'hello' or not secrets.compare_digest(hello.get('token', ''), self.token):
+            writer.close()
+            return
+        cluster_id = hello['cluster']
+        self.workers[cluster_id] = writer
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)
+                    kind = message['type']
+                except (ValueError, KeyError, TypeError) as e:
+                    log.warning("Ignoring a malformed message from cluster %s: %s", cluster_id, e)
+                    continue
+                if kind == 'query':
+                    asyncio.ensure_future(self._fan_out(writer, message))
+                elif kind == 'reply':
+                    if message.get('error'):
+                        log.warning("Cluster %s could not answer a query: %s", cluster_id, message['error'])
+                    self._collect(message)
+        finally:
+            if self.workers.get(cluster_id) is writer:
+                del self.workers[cluster_id]
+            writer.close()
+
+    async def _fan_out(self, origin: asyncio.StreamWriter, message: dict):
+        hub_id = next(self._ids)
+        workers = list(self.workers.values())
+        future = asyncio.get_running_loop().create_future()
+        replies = []
+        self._pending[hub_id] = (replies, len(workers), future)
+        for writer in workers:
+            try:
+                await _send(writer, {'type': 'query', 'id': hub_id, 'name': message.get('name')})
+            except ConnectionError:
+                self._collect({'id': hub_id, 'data': None})
+        try:
+            await asyncio.wait_for(future, QUERY_TIMEOUT)
+        except asyncio.TimeoutError:
+            pass  # Answer with whoever replied in time
+        self._pending.pop(hub_id, None)
+        await _send(origin, {'type': 'result', 'id': message['id'],
+                             'results': [reply for reply in replies if reply is not None]})
+
+    def _collect(self, message: dict):
+        pending = self._pending.get(message.get('id'))
+        if pending is None:
+            return
+        replies, expected, future = pending
+        replies.append(message.get('data'))
+        if len(replies) >= expected and not future.done():
+            future.set_result(None)
+
+
+class ClusterClient:
+    """A worker's connection to the hub, answers queries and asks the whole cluster."""
+
+    def __init__(self, cluster_id: str, port: int, token: str):
+        self.cluster_id = cluster_id
+        self.port = port
+        self.token = token
+        self.handlers = {}  # query name -> callable returning JSON-ready data
+        self._pending = {}  # query id -> future
+        self._ids = itertools.count()
+        self._writer = None
+
+    def register(self, name: str, handler):
+        self.handlers[name] = handler
+
+    async def connect(self):
+        reader, self._writer = await asyncio.open_connection('127.0.0.1', self.port)
+        await _send(self._writer, {'type': 'hello', 'cluster': self.cluster_id, 'token': self.token})
+        asyncio.ensure_future(self._listen(reader))
+
+    async def _listen(self, reader: asyncio.StreamReader):
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            try:
+                message = json.loads(line)
+                kind = message['type']
+            except (ValueError, KeyError, TypeError) as e:
+                log.warning("Ignoring a malformed message from the cluster hub: %s", e)
+                continue
+            if kind == 'query':
+                await self._answer(message)
+            elif kind == 'result':
+                future = self._pending.pop(message.get('id'), None)
+                if future and not future.done():
+                    future.set_result(message.get('results', []))
+        # Hub went away, fail anything still waiting
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError("Lost the connection to the cluster hub"))
+        self._pending.clear()
+
+    async def _answer(self, message: dict):
+        # A failing handler answers with an error instead of taking the connection down with it,
+        # the hub still gets a reply and stops waiting for this worker
+        try:
+            handler = self.handlers.get(message['name'])
+            data = handler() if handler else None
+            if asyncio.iscoroutine(data):
+                data = await data
+            reply = {'type': 'reply', 'id': message.get('id'), 'data': data}
+            json.dumps(reply)  # Data that can't be serialized fails here, not halfway through a send
+        except Exception as e:
+            log.exception("Cluster query %r failed", message.get('name'))
+            reply = {'type': 'reply', 'id': message.get('id'), 'data': None, 'error': f"{type(e).__name__}: {e}"}
+        try:
+            await _send(self._writer, reply)
+        except ConnectionError:
+            pass  # The hub is gone, the listen loop sees that on its next read
+
+    async def query(self, name: str) -> list:
+        """Asks every worker (this one included) and returns their answers."""
+        query_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[query_id] = future
+        await _send(self._writer, {'type': 'query', 'id': query_id, 'name': name})
+        return await asyncio.wait_for(future, QUERY_TIMEOUT * 2)
+
+
+def client_from_env():
+    """The worker's ClusterClient when running under the launcher, otherwise None."""
+    port = os.getenv('CLUSTER_IPC_PORT')
+    if not port:
+        return None
+    return ClusterClient(os.getenv('CLUSTER_ID', '0'), int(port), os.getenv('CLUSTER_IPC_TOKEN', ''))
+
+
+async def recommended_shard_count(token: str) -> int:
+    async with aiohttp.ClientSession() as session:
+        async with session.get('https://discord.com/api/v10/gateway/bot',
+                               headers={'Authorization': f"Bot {token}"}) as response:
+            response.raise_for_status()
+            return (await response.json())['shards']
+
+
+def split_shards(shard_count: int, processes: int) -> list:
+    """Contiguous shard ranges, as even as possible, one per process."""
+    processes = max(1, min(processes, shard_count))
+    size, extra = divmod(shard_count, processes)
+    ranges, start = [], 0
+    for index in range(processes):
+        end = start + size + (1 if index < extra else 0)
+        ranges.append(list(range(start, end)))
+        start = end
+    return ranges
+
+
+async def _supervise(cluster_id: int, shard_ids: list, shard_count: int, hub: ClusterHub, delay: float,
+                     stopping: asyncio.Event):
+    await asyncio.sleep(delay)
+    backoff = 1.0
+    while not stopping.is_set():
+        env = dict(os.environ, CLUSTER_WORKER='1', CLUSTER_ID=str(cluster_id), SHARD_COUNT=str(shard_count),
+                   SHARD_IDS=','.join(map(str, shard_ids)), CLUSTER_IPC_PORT=str(hub.port),
+                   CLUSTER_IPC_TOKEN=hub.token)
+        started = time.monotonic()
+        process = await asyncio.create_subprocess_exec(sys.executable, WORKER_SCRIPT, env=env)
+        log.info("Cluster %s started with shards %d-%d (pid %d)", cluster_id, shard_ids[0], shard_ids[-1], process.pid)
+
+        stop_waiter = asyncio.ensure_future(stopping.wait())
+        done, _ = await asyncio.wait({asyncio.ensure_future(process.wait()), stop_waiter},
+                                     return_when=asyncio.FIRST_COMPLETED)
+        if stop_waiter in done:
+            process.terminate()
+            await process.wait()
+            return
+        stop_waiter.cancel()
+
+        # Restart with backoff, reset once a worker has stayed up for a while
+        if time.monotonic() - started > 60:
+            backoff = 1.0
+        log.warning("Cluster %s exited with code %s, restarting in %.0fs", cluster_id, process.returncode, backoff)
+        await asyncio.sleep(backoff)
+        backoff = min(backoff * 2, 60.0)
+
+
+async def launch(token: str, processes: int):
+    """Spreads the shards over `processes` worker processes and keeps them running."""
+    shard_count = int(os.getenv('SHARD_COUNT') or 0) or await recommended_shard_count(token)
+    hub = ClusterHub(secrets.token_hex(16))
+    await hub.start()
+
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, stopping.set)
+        except NotImplementedError:
+            pass  # Windows
+
+    workers, delay = [], 0.0
+    for cluster_id, shard_ids in enumerate(split_shards(shard_count, processes)):
+        workers.append(_supervise(cluster_id, shard_ids, shard_count, hub, delay, stopping))
+        # Stagger the workers so their shards don't identify at the same time
+        delay += IDENTIFY_INTERVAL * len(shard_ids)
+    log.info("Launching %d shards over %d processes", shard_count, len(workers))
+    await asyncio.gather(*workers)
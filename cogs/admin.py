@@ -0,0 +1,61 @@
+from discord.ext import commands
+
+from outbound import dispatcher
+
+
+class AdminCog(commands.Cog):
+    """Owner-only commands to load, unload and reload cogs without reconnecting to the gateway."""
+
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+
+    async def cog_check(self, ctx):
+        return await self.bot.is_owner(ctx.author)
+
+    @staticmethod
+    def extension_name(name: str) -> str:
+        # `!reload music` and `!reload cogs.music` both work
+        return name if '.' in name else f"cogs.{name}"
+
+    @commands.command(name="reload", usage="<cog>")
+    async def reload_cog(self, ctx, name: str):
+        """Reloads a cog's module, rolling back to the old one if the new code fails to load."""
+        extension = self.extension_name(name)
+        try:
+            await self.bot.reload_extension(extension)
+        except commands.ExtensionError as e:
+            await dispatcher.send(ctx, f"Could not reload `{extension}`: {e}")
+            return
+        self.bot.dispatch('extensions_changed', extension)  # The help index rebuilds itself
+        await dispatcher.send(ctx, f"Reloaded `{extension}`.")
+
+    @commands.command(name="load", usage="<cog>")
+    async def load_cog(self, ctx, name: str):
+        """Loads a cog that isn't loaded yet."""
+        extension = self.extension_name(name)
+        try:
+            await self.bot.load_extension(extension)
+        except commands.ExtensionError as e:
+            await dispatcher.send(ctx, f"Could not load `{extension}`: {e}")
+            return
+        self.bot.dispatch('extensions_changed', extension)
+        await dispatcher.send(ctx, f"Loaded `{extension}`.")
+
+    @commands.command(name="unload", usage="<cog>")
+    async def unload_cog(self, ctx, name: str):
+        """Unloads a cog, its commands and listeners stop until it's loaded again."""
+        extension = self.extension_name(name)
+        if extension == __name__:
+            await dispatcher.send(ctx, "Unloading the admin cog would leave no way to load it back.")
+            return
+        try:
+            await self.bot.unload_extension(extension)
+        except commands.ExtensionError as e:
+            await dispatcher.send(ctx, f"Could not unload `{extension}`: {e}")
+            return
+        self.bot.dispatch('extensions_changed', extension)
+        await dispatcher.send(ctx, f"Unloaded `{extension}`.")
+
+
+async def setup(bot: commands.Bot):
+    await bot.add_cog(AdminCog(bot))
@@ -0,0 +1,162 @@
+import logging
+import os
+import time
+
+import discord
+from discord.ext import commands, tasks
+
+from activity import tracker
+from cluster import cluster_path
+from outbound import dispatcher
+
+log = logging.getLogger(__name__)
+
+
+class EventsCog(commands.Cog):
+    # Joins are collected for this many seconds and welcomed in one message
+    WELCOME_WINDOW = 3.0
+    # Above this many joins in one window, welcome them as a count instead of mentioning everyone
+    AGGREGATE_THRESHOLD = 10
+    # How long a resolved welcome channel is reused before it is looked up again
+    WELCOME_CHANNEL_TTL = 300.0
+
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+        self.channel_activity = tracker  # Decaying per-guild activity, fed by the message router
+        self.pending_joins = {}  # guild id -> members waiting for the next welcome
+        self.welcome_channels = {}  # guild id -> (resolved at, channel)
+
+        # Optional file the activity index is saved to, so it survives restarts
+        self.activity_file = cluster_path(os.getenv('ACTIVITY_SNAPSHOT_FILE'))  # Per cluster worker, like polls
+
+    async def cog_load(self):
+        if self.activity_file:
+            self.channel_activity.load(self.activity_file)
+            self.save_activity.start()
+
+    def cog_unload(self):
+        if self.activity_file:
+            self.save_activity.cancel()
+            self.channel_activity.save(self.activity_file)
+
+    @tasks.loop(minutes=5)
+    async def save_activity(self):
+        self.channel_activity.save(self.activity_file)
+
+    # Helper function to get the most active channel
+    def get_most_active_channel(self, guild: discord.Guild):
+        # Best of the guild's top channels that still exists and that we can post in
+        for channel_id in self.channel_activity.ranked(guild.id):
+            channel = guild.get_channel(channel_id)
+            if channel is None:
+                self.channel_activity.forget(guild.id, channel_id)
+            elif channel.permissions_for(guild.me).send_messages:
+                return channel
+        return None  # No activity recorded yet
+
+    def get_welcome_channel(self, guild: discord.Guild):
+        """Resolves where welcomes go, reusing a channel found for WELCOME_CHANNEL_TTL seconds."""
+        cached = self.welcome_channels.get(guild.id)
+        if cached and time.monotonic() - cached[0] < self.WELCOME_CHANNEL_TTL:
+            return cached[1]
+
+        channel = self.get_most_active_channel(guild)
+        # Fallback to system channel or a channel named "general"
+        if channel is None:
+            channel = guild.system_channel or discord.utils.get(guild.text_channels, name="general")
+        # Finding nothing isn't cached, the next join looks again in case an admin has set a channel up since
+        if channel is not None:
+            self.welcome_channels[guild.id] = (time.monotonic(), channel)
+        return channel
+
+    # Event: When the bot is ready
+    @commands.Cog.listener()
+    async def on_ready(self):
+        log.info("Logged in as %s!", self.bot.user)
+        log.info("Command prefix is: %s", self.bot.command_prefix)
+        log.debug("Loaded cogs: %s", list(self.bot.cogs.keys()))
+
+    # Event: When a member joins
+    @commands.Cog.listener()
+    async def on_member_join(self, member: discord.Member):
+        # Buffer the join, the first join of a window schedules the flush
+        pending = self.pending_joins.get(member.guild.id)
+        if pending is None:
+            self.pending_joins[member.guild.id] = [member]
+            self.bot.loop.call_later(self.WELCOME_WINDOW, self._flush_joins, member.guild)
+        else:
+            pending.append(member)
+
+    def _flush_joins(self, guild: discord.Guild):
+        members = self.pending_joins.pop(guild.id, None)
+        if not members:
+            return
+
+        channel = self.get_welcome_channel(guild)
+        if channel is None:
+            log.info("No channel found to send the welcome message.")
+            return
+
+        if len(members) > self.AGGREGATE_THRESHOLD:
+            # Probably a raid or an invite spike, don't ping everyone
+            welcome_message = f"{len(members)} members just joined, welcome to the server everyone!"
+        elif len(members) == 1:
+            welcome_message = f"Welcome to the server, {members[0].mention}!"
+        else:
+            mentions = ", ".join(member.mention for member in members[:-1])
+            welcome_message = f"Welcome to the server, {mentions} and {members[-1].mention}!"
+
+        dispatcher.send(channel, welcome_message)
+        log.debug("Welcome message for %d member(s) sent to %s", len(members), channel.name)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel):
+        self.channel_activity.forget(channel.guild.id, channel.id)
+        cached = self.welcome_channels.get(channel.guild.id)
+        if cached and cached[1].id == channel.id:
+            del self.welcome_channels[channel.guild.id]
+
+    @commands.Cog.listener()
+    async def on_guild_channel_create(self, channel):
+        # A new "general" or a channel the bot can finally post in may beat the cached choice
+        self.welcome_channels.pop(channel.guild.id, None)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_update(self, before, after):
+        # Renames and permission changes can make or break a welcome channel
+        self.welcome_channels.pop(after.guild.id, None)
+
+    @commands.Cog.listener()
+    async def on_guild_update(self, before: discord.Guild, after: discord.Guild):
+        # The system channel may have changed
+        self.welcome_channels.pop(after.id, None)
+
+    # Event: When the bot joins a new server
+    @commands.Cog.listener()
+    async def on_guild_join(self, guild: discord.Guild):
+        """
+        Triggered when the bot joins a new guild (server).
+        Sends a welcome message in the system channel or the first available text channel.
+        """
+        welcome_message = "Hi, I'm NehmanBot! Use `!help` to figure out all my commands. 🦁"
+
+        # Try to send the message in the system channel
+        try:
+            if guild.system_channel and guild.system_channel.permissions_for(guild.me).send_messages:
+                await dispatcher.send(guild.system_channel, welcome_message)
+                log.info("Welcome message sent in system channel of guild: %s", guild.name)
+            else:
+                # If no system channel, find the first available channel
+                for channel in guild.text_channels:
+                    if channel.permissions_for(guild.me).send_messages:
+                        await dispatcher.send(channel, welcome_message)
+                        log.info("Welcome message sent in %s of guild: %s", channel.name, guild.name)
+                        break
+                else:
+                    log.info("No suitable channel found to send welcome message in guild: %s", guild.name)
+        except Exception as e:
+            log.warning("Error sending welcome message in guild: %s. Error: %s", guild.name, e)
+
+
+async def setup(bot: commands.Bot):
+    await bot.add_cog(EventsCog(bot))
@@ -0,0 +1,173 @@
+import difflib
+
+from discord.ext import commands
+import discord
+
+from outbound import dispatcher
+
+# Overview sections in this order, by cog. Commands of cogs not listed get a section named after the cog.
+SECTIONS = {
+    'ModerationCog': "🛠 Moderation Commands",
+    'StatsCog': "📊 Statistics Commands",
+    'PollCog': "📋 Poll Commands",
+    'MusicCog': "🎵 Music Commands",
+    'TicTacToe': "🎮 Games",
+    'AdminCog': "🔧 Owner Commands",
+    'HelpCog': "❓ Help",
+}
+
+# Not commands, so there is nothing to generate these from
+EVENTS = ("🎉 Events", "`on_guild_join`: Sends a welcome message when the bot joins a server.\n"
+                      "`on_member_join`: Welcomes new members to the server.")
+RESPONSES = ("💬 Responses", "`!hello`, `!how are you`, `!bye`: Small talk.\n"
+                            "`!roll dice`: Rolls a dice between 1-6.\n"
+                            "`!generate a poem about <topic>`: Writes a poem.")
+
+LION_IMAGE = ("https://media.istockphoto.com/id/458017717/vector/king-lion-aslan.jpg"
+              "?s=612x612&w=0&k=20&c=yKt4ae9kvAdf3JsMsZqb4vZ43sch49ky5rEQ_n8X7-Q=")
+
+# Discord's embed limits
+FIELD_LIMIT = 1024
+FIELDS_PER_EMBED = 25
+EMBED_LIMIT = 6000
+
+
+class HelpIndex:
+    """
+    Help generated from the registered commands, their docstrings and signatures: the overview
+    as ready-to-send embeds, one detail embed per command and alias, and every prefix of every
+    name for lookups like `!help pur`.
+    """
+
+    def __init__(self, bot: commands.Bot):
+        self.prefix = bot.command_prefix if isinstance(bot.command_prefix, str) else "!"
+        self.details = {}  # command name or alias -> Embed
+        self.prefixes = {}  # prefix of a name or alias -> command names it could mean, sorted
+
+        sections = {}  # section title -> overview lines
+        for command in sorted(bot.walk_commands(), key=lambda command: command.qualified_name):
+            if command.hidden:
+                continue
+            section = SECTIONS.get(command.cog_name) or command.cog_name or "Other Commands"
+            sections.setdefault(section, []).append(f"`{self.usage(command)}`: {command.short_doc}")
+            detail = self.detail(command, section)
+            for name in [command.qualified_name, *command.aliases]:
+                self.details[name] = detail
+                for end in range(1, len(name) + 1):
+                    names = self.prefixes.setdefault(name[:end], [])
+                    if command.qualified_name not in names:
+                        names.append(command.qualified_name)
+
+        order = list(SECTIONS.values())
+        fields = [EVENTS]
+        for title in sorted(sections, key=lambda title: order.index(title) if title in order else len(order)):
+            fields += self.split_field(title, sections[title])
+        fields.append(RESPONSES)
+        self.pages = self.paginate(fields)
+
+    def usage(self, command: commands.Command) -> str:
+        return f"{self.prefix}{command.qualified_name} {command.usage or command.signature}".rstrip()
+
+    def detail(self, command: commands.Command, section: str) -> discord.Embed:
+        embed = discord.Embed(title=self.usage(command), description=(command.help or command.short_doc)[:4096],
+                              color=discord.Color.blue())
+        if command.aliases:
+            embed.add_field(name="Aliases", value=", ".join(f"`{self.prefix}{alias}`" for alias in command.aliases))
+        embed.set_footer(text=section)
+        return embed
+
+    @staticmethod
+    def split_field(title: str, lines: list) -> list:
+        """(name, value) fields under Discord's field length limit, continuing the section as needed."""
+        fields = []
+        value = ""
+        for line in lines:
+            line = line[:FIELD_LIMIT]
+            if value and len(value) + 1 + len(line) > FIELD_LIMIT:
+                fields.append((title if not fields else f"{title} (continued)", value))
+                value = ""
+            value = f"{value}\n{line}" if value else line
+        if value:
+            fields.append((title if not fields else f"{title} (continued)", value))
+        return fields
+
+    def paginate(self, fields: list) -> list:
+        """Overview embeds, starting a new one whenever the next field would break a limit."""
+        pages = []
+        embed = discord.Embed(title="NehmanBot Help hehe",
+                              description="Here are all the features and commands NehmanBot supports! 🦁🦁🦁",
+                              color=discord.Color.blue())
+        embed.set_image(url=LION_IMAGE)
+        footer = f"Use {self.prefix}help <command> for more details on a specific command."
+        for name, value in fields:
+            if len(embed.fields) == FIELDS_PER_EMBED or len(embed) + len(name) + len(value) + len(footer) > EMBED_LIMIT:
+                pages.append(embed)
+                embed = discord.Embed(color=discord.Color.blue())
+            embed.add_field(name=name, value=value, inline=False)
+        embed.set_footer(text=footer)
+        pages.append(embed)
+        return pages
+
+    def find(self, query: str):
+        """Returns (detail embed or None, names to suggest instead)."""
+        query = query.strip().lower()
+        if query.startswith(self.prefix):
+            query = query[len(self.prefix):]
+        embed = self.details.get(query)
+        if embed is not None:
+            return embed, []
+        names = self.prefixes.get(query, [])
+        if len(names) == 1:
+            return self.details[names[0]], []
+        if names:
+            return None, names
+        # Not a prefix of anything, maybe a typo. Only runs on a miss, over a few dozen names.
+        return None, difflib.get_close_matches(query, self.details, n=3, cutoff=0.6)
+
+
+class HelpCog(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        self.index = None
+
+    async def cog_load(self):
+        # Loaded first at startup, before the other cogs' commands exist: on_ready builds it then
+        if self.bot.is_ready():
+            self.index = HelpIndex(self.bot)
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        self.index = HelpIndex(self.bot)
+
+    @commands.Cog.listener()
+    async def on_extensions_changed(self, extension: str):
+        # Dispatched by the admin cog after a load, unload or reload
+        self.index = HelpIndex(self.bot)
+
+    @commands.command(name="help", usage="[command]")
+    async def help_command(self, ctx, *, command: str = None):
+        """
+        Lists every command, or explains one.
+        `!help purge` shows a command's usage, details and aliases, the start of a name is enough.
+        """
+        if self.index is None:
+            self.index = HelpIndex(self.bot)
+
+        if command is None:
+            for page in self.index.pages:
+                await dispatcher.send(ctx, embed=page)
+            return
+
+        command = command[:50]
+        embed, suggestions = self.index.find(command)
+        if embed is not None:
+            await dispatcher.send(ctx, embed=embed)
+        elif suggestions:
+            listed = ", ".join(f"`{self.index.prefix}{name}`" for name in suggestions)
+            await dispatcher.send(ctx, f"No command `{command}`. Did you mean {listed}?")
+        else:
+            await dispatcher.send(ctx, f"No command `{command}`. Use `{self.index.prefix}help` to see them all.")
+
+
+async def setup(bot: commands.Bot):
+    await bot.add_cog(HelpCog(bot))
@@ -0,0 +1,262 @@
+import asyncio
+import os
+import time
+from datetime import timedelta
+from typing import Optional
+
+import discord
+from discord.ext import commands
+
+from membercache import CachedMember, member_lru
+from modengine import MAX_TIMEOUT, BulkAction, RecentJoins, parse_targets
+from outbound import dispatcher
+from purgeengine import PurgeJob, parse_filters
+
+# Verbs for bulk action messages: (command word, in progress, done)
+BULK_VERBS = {'ban': ("ban", "Banning", "Banned"), 'kick': ("kick", "Kicking", "Kicked"),
+              'timeout': ("time out", "Timing out", "Timed out")}
+
+
+class ModerationCog(commands.Cog):
+    """Cog for moderation commands."""
+
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+        self.purges = {}  # channel id -> PurgeJob running there
+        # A purge gives up after looking at this many messages, even if it found fewer matches than asked
+        self.purge_scan_limit = int(os.getenv('PURGE_SCAN_LIMIT', '5000'))
+        self.recent_joins = RecentJoins()  # For joined:<duration> in bulk actions
+        # Bulk actions refuse to touch more users than this in one command
+        self.bulk_limit = int(os.getenv('BULK_ACTION_LIMIT', '500'))
+        self.lookups = asyncio.Semaphore(10)  # Uncached targets fetched at once while checking bulk actions
+
+    def cog_unload(self):
+        for job in self.purges.values():
+            job.cancelled = True
+
+    @commands.Cog.listener()
+    async def on_member_update(self, before: discord.Member, after: discord.Member):
+        member_lru.discard(after.guild.id, after.id)
+
+    @commands.Cog.listener()
+    async def on_member_remove(self, member: discord.Member):
+        member_lru.discard(member.guild.id, member.id)
+
+    @commands.Cog.listener()
+    async def on_member_join(self, member: discord.Member):
+        self.recent_joins.add(member.guild.id, member.id)
+
+    @commands.command(name="kick", usage="<@user> [reason]")
+    @commands.has_permissions(kick_members=True)
+    async def kick_user(self, ctx, member: CachedMember = None, *, reason: str = "No reason provided"):
+        """Kick a user from the server."""
+        if member is None:
+            await dispatcher.send(ctx, "You must mention a user to kick. Example: `!kick @user reason`")
+            return
+
+        if ctx.guild.me.top_role <= member.top_role:
+            await dispatcher.send(ctx, "I cannot kick this user as their role is equal to or higher than mine.")
+            return
+
+        try:
+            await member.kick(reason=reason)
+            await dispatcher.send(ctx, f"{member.mention} has been kicked. Reason: {reason}")
+        except discord.Forbidden:
+            await dispatcher.send(ctx, "I do not have permission to kick this user.")
+        except discord.HTTPException as e:
+            await dispatcher.send(ctx, f"Failed to kick the user. Error: {e}")
+
+    @commands.command(name="ban", usage="<@user> [reason]")
+    @commands.has_permissions(ban_members=True)
+    async def ban_user(self, ctx, member: CachedMember = None, *, reason: str = "No reason provided"):
+        """Ban a user from the server."""
+        if member is None:
+            await dispatcher.send(ctx, "You must mention a user to ban. Example: `!ban @user reason`")
+            return
+
+        if ctx.guild.me.top_role <= member.top_role:
+            await dispatcher.send(ctx, "I cannot ban this user as their role is equal to or higher than mine.")
+            return
+
+        try:
+            await member.ban(reason=reason)
+            await dispatcher.send(ctx, f"{member.mention} has been banned. Reason: {reason}")
+        except discord.Forbidden:
+            await dispatcher.send(ctx, "I do not have permission to ban this user.")
+        except discord.HTTPException as e:
+            await dispatcher.send(ctx, f"Failed to ban the user. Error: {e}")
+
+    @commands.command(name="massban", usage="<@user/ID...> [joined:<duration>] [reason]")
+    @commands.has_permissions(ban_members=True)
+    async def mass_ban(self, ctx, *, targets: str = ""):
+        """Bans mentioned users, user IDs and/or everyone who joined within joined:<duration>."""
+        await self.run_bulk(ctx, 'ban', targets)
+
+    @commands.command(name="masskick", usage="<@user/ID...> [joined:<duration>] [reason]")
+    @commands.has_permissions(kick_members=True)
+    async def mass_kick(self, ctx, *, targets: str = ""):
+        """Kicks mentioned users, user IDs and/or everyone who joined within joined:<duration>."""
+        await self.run_bulk(ctx, 'kick', targets)
+
+    @commands.command(name="timeout", aliases=["mute", "masstimeout"],
+                      usage="<@user/ID...> [duration] [joined:<duration>] [reason]")
+    @commands.has_permissions(moderate_members=True)
+    async def timeout_users(self, ctx, *, targets: str = ""):
+        """Times out one or more users for a duration like 10m (default 1h), joined:<duration> works too."""
+        await self.run_bulk(ctx, 'timeout', targets)
+
+    def joined_within(self, guild: discord.Guild, seconds: int) -> list:
+        cutoff = time.time() - seconds
+        user_ids = self.recent_joins.since(guild.id, cutoff)
+        # Cached members cover joins from before the bot started listening
+        user_ids += [member.id for member in guild.members
+                     if member.joined_at is not None and member.joined_at.timestamp() >= cutoff]
+        return user_ids
+
+    async def protected(self, ctx, user_id: int, kind: str):
+        """Why the action must not touch this user, or None."""
+        if user_id == ctx.author.id:
+            return "that's you"
+        if user_id == self.bot.user.id:
+            return "that's me"
+        if user_id == ctx.guild.owner_id:
+            return "server owner"
+        member = ctx.guild.get_member(user_id) or member_lru.get(ctx.guild.id, user_id)
+        if member is None:
+            # Discord only checks the bot's rank, the moderator's has to be checked here
+            try:
+                async with self.lookups:
+                    member = await ctx.guild.fetch_member(user_id)
+            except discord.NotFound:
+                # No roles to outrank anyone with, but only a ban means anything for a non-member
+                return None if kind == 'ban' else "not in the server"
+            except discord.HTTPException:
+                return "couldn't look them up"
+            member_lru.put(member)
+        if member.top_role >= ctx.guild.me.top_role:
+            return "role is equal to or higher than mine"
+        if ctx.author.id != ctx.guild.owner_id and member.top_role >= ctx.author.top_role:
+            return "role is equal to or higher than yours"
+        return None
+
+    async def run_bulk(self, ctx, kind: str, text: str):
+        word, doing, done = BULK_VERBS[kind]
+        try:
+            user_ids, window, duration, reason = parse_targets(text, with_duration=kind == 'timeout')
+        except ValueError as e:
+            await dispatcher.send(ctx, str(e))
+            return
+        if window is not None:
+            user_ids += self.joined_within(ctx.guild, window)
+        user_ids = list(dict.fromkeys(user_ids))  # Mentioned and recently joined, once each
+        if not user_ids:
+            await dispatcher.send(ctx, f"Mention users or give their IDs, or use `joined:<duration>` to {word} "
+                                       f"everyone who joined that recently. Example: `!mass{kind} joined:5m raid`")
+            return
+        if len(user_ids) > self.bulk_limit:
+            await dispatcher.send(ctx, f"That's {len(user_ids)} users, more than the limit of {self.bulk_limit}.")
+            return
+
+        reason = f"{ctx.author} ({ctx.author.id}): {reason or 'No reason provided'}"
+        reasons = await asyncio.gather(*(self.protected(ctx, user_id, kind) for user_id in user_ids))
+        skipped = {user_id: why for user_id, why in zip(user_ids, reasons) if why is not None}
+
+        guild = ctx.guild
+        if kind == 'ban':
+            async def action(user_id):
+                await guild.ban(discord.Object(user_id), reason=reason)
+        elif kind == 'kick':
+            async def action(user_id):
+                await guild.kick(discord.Object(user_id), reason=reason)
+        else:
+            until = discord.utils.utcnow() + timedelta(seconds=min(3600 if duration is None else duration, MAX_TIMEOUT))
+
+            async def action(user_id):
+                # Straight to the API so uncached members don't need fetching first
+                await self.bot.http.edit_member(guild.id, user_id, reason=reason,
+                                                communication_disabled_until=until.isoformat())
+
+        bulk = BulkAction(action, [user_id for user_id in user_ids if user_id not in skipped])
+
+        def status(bulk):
+            return f"{doing} {len(bulk.user_ids)} users: {bulk.finished}/{len(bulk.user_ids)} done."
+
+        # One message for the whole run, edits collapse in the dispatcher. The summary's mentions don't ping anyone.
+        progress = await dispatcher.send(ctx, status(bulk), coalesce=False,
+                                         allowed_mentions=discord.AllowedMentions.none())
+        await bulk.run(on_progress=lambda bulk: dispatcher.edit(progress, content=status(bulk)))
+
+        lines = [f"{done} {bulk.succeeded} of {len(user_ids)} users."]
+        for title, problems in (("Skipped", skipped), ("Failed", bulk.failed)):
+            if problems:
+                listed = ", ".join(f"<@{user_id}> ({why})" for user_id, why in list(problems.items())[:20])
+                more = f" and {len(problems) - 20} more" if len(problems) > 20 else ""
+                lines.append(f"{title} {len(problems)}: {listed}{more}")
+        dispatcher.edit(progress, content="\n".join(lines)[:2000])
+
+    @commands.command(name="purge", usage="<amount> [@user] [filters] [reason]")
+    @commands.has_permissions(manage_messages=True)
+    async def purge_messages(self, ctx, amount: int = None, member: Optional[CachedMember] = None, *,
+                             options: str = ""):
+        """
+        Deletes the last `amount` messages matching the filters.
+        Filters are a member, then any of regex:<pattern>, attachments, newer:<duration> and
+        older:<duration>. Anything else is the audit log reason. Messages older than 14 days
+        are deleted one by one in the background, stop that with !cancelpurge.
+        """
+        if amount is None:
+            await dispatcher.send(ctx, "Specify the number of messages.")
+            return
+
+        if amount <= 0:
+            await dispatcher.send(ctx, "Please specify a value greater than 0.")
+            return
+
+        if ctx.channel.id in self.purges:
+            await dispatcher.send(ctx, "A purge is already running in this channel. Stop it with `!cancelpurge`.")
+            return
+
+        try:
+            check, reason = parse_filters(options, member.id if member else None)
+        except ValueError as e:
+            await dispatcher.send(ctx, str(e))
+            return
+
+        job = PurgeJob(ctx.channel, amount, check, self.purge_scan_limit, reason or "No reason provided")
+        self.purges[ctx.channel.id] = job
+        try:
+            await job.collect(start=ctx.message)
+        except BaseException:
+            del self.purges[ctx.channel.id]
+            raise
+        if not job.old or job.cancelled:
+            del self.purges[ctx.channel.id]
+            await dispatcher.send(ctx, job.summary(), delete_after=3)
+            return
+
+        # Messages older than 14 days can't be bulk deleted, they go one by one in the background
+        progress = await dispatcher.send(ctx, job.progress() + " Stop with `!cancelpurge`.", coalesce=False)
+        asyncio.ensure_future(self.delete_old(job, progress))
+
+    async def delete_old(self, job: PurgeJob, progress: discord.Message):
+        try:
+            # The dispatcher collapses these edits to what the channel's edit bucket allows
+            await job.delete_old(on_progress=lambda job: dispatcher.edit(progress, content=job.progress()))
+        finally:
+            self.purges.pop(job.channel.id, None)
+            dispatcher.edit(progress, content=job.summary())
+
+    @commands.command(name="cancelpurge")
+    @commands.has_permissions(manage_messages=True)
+    async def cancel_purge(self, ctx):
+        """Stops the purge running in this channel."""
+        job = self.purges.get(ctx.channel.id)
+        if job is None:
+            await dispatcher.send(ctx, "No purge is running in this channel.")
+            return
+        job.cancelled = True
+        await dispatcher.send(ctx, "Stopping the purge.", delete_after=5)
+
+
+async def setup(bot: commands.Bot):
+    await bot.add_cog(ModerationCog(bot))
@@ -0,0 +1,320 @@
+import asyncio
+import logging
+import os
+import time
+from collections import defaultdict, deque
+
+import discord
+from discord.ext import commands, tasks
+
+import extractor
+from audiocache import OpusDiskCache, create_source
+from outbound import dispatcher
+
+log = logging.getLogger(__name__)
+
+
+class GuildMusicState:
+    """Playback queue and track-to-track timing for a single guild."""
+
+    def __init__(self):
+        self.queue = deque()
+        self.current = None  # Track dict that is playing (or being resolved)
+        self.text_channel = None  # Where "Now playing" messages go
+        self.prefetch = None  # Task resolving the next track's stream URL in the background
+        self.track_ended_at = None
+        self.last_gap = None
+        self.total_gap = 0.0
+        self.transitions = 0
+        self.connected_at = time.monotonic()
+        self.last_active = time.monotonic()  # Last time something was playing
+
+    def record_gap(self, gap: float):
+        self.last_gap = gap
+        self.total_gap += gap
+        self.transitions += 1
+
+    @property
+    def avg_gap(self):
+        return self.total_gap / self.transitions if self.transitions else None
+
+
+class MusicCog(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        self.voice_clients = {}
+        self.music_states = defaultdict(GuildMusicState)
+        self.extractor = extractor.ExtractorPool()
+
+        # Optional on-disk cache of recently played tracks, replays skip the network entirely
+        cache_dir = os.getenv('MUSIC_CACHE_DIR')
+        self.audio_cache = OpusDiskCache(cache_dir) if cache_dir else None
+
+        # Voice resource budget: idle sessions are reaped, and at most this many are open at once (0 = no cap)
+        self.idle_timeout = float(os.getenv('MUSIC_IDLE_TIMEOUT', '300'))
+        self.max_voice_sessions = int(os.getenv('MAX_VOICE_SESSIONS', '0'))
+
+    async def cog_load(self):
+        # Loaded at startup before login, when wait_until_ready can't be awaited yet: on_ready starts it then
+        if self.bot.is_ready():
+            self.reap_idle_voice.start()
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        # Fires again after a reconnect, the loop is already running by then
+        if not self.reap_idle_voice.is_running():
+            self.reap_idle_voice.start()
+
+    async def cog_unload(self):
+        # The voice clients stay connected to the gateway after the cog goes, and the reloaded cog starts
+        # without them: its next connect() would raise "Already connected". Leave instead of orphaning them.
+        self.reap_idle_voice.cancel()
+        for guild_id in list(self.voice_clients):
+            await self._disconnect(guild_id, "The music player was restarted, use `!play` to start again.")
+        self.extractor.shutdown()
+
+    async def _disconnect(self, guild_id: int, reason: str = None):
+        """Stops playback, clears the queue and leaves the voice channel."""
+        # Drop the queue first so the after= callback doesn't start another track
+        state = self.music_states.pop(guild_id, None)
+        voice_client = self.voice_clients.pop(guild_id, None)
+        if voice_client is not None:
+            if voice_client.is_playing() or voice_client.is_paused():
+                voice_client.stop()
+            if voice_client.is_connected():
+                await voice_client.disconnect()
+        if reason and state and state.text_channel:
+            try:
+                await dispatcher.send(state.text_channel, reason)
+            except discord.HTTPException:
+                pass
+
+    @tasks.loop(seconds=30)
+    async def reap_idle_voice(self):
+        """Disconnects voice sessions that are idle, alone, or already dropped."""
+        now = time.monotonic()
+        for guild_id, voice_client in list(self.voice_clients.items()):
+            if not voice_client.is_connected():
+                await self._disconnect(guild_id)
+                continue
+
+            state = self.music_states[guild_id]
+            if voice_client.is_playing():
+                state.last_active = now
+
+            if not self._listeners(voice_client.channel):
+                await self._disconnect(guild_id, "Everyone left the voice channel, so I disconnected.")
+            elif now - state.last_active > self.idle_timeout:
+                await self._disconnect(guild_id, "Disconnected after being idle for a while.")
+
+    def _listeners(self, channel) -> int:
+        # From voice_states, which discord.py keeps whatever MEMBER_CACHE says: channel.members is empty
+        # under 'none'. Other bots count when they aren't cached, better that than leaving on people.
+        count = 0
+        for user_id in channel.voice_states:
+            member = channel.guild.get_member(user_id)
+            if user_id != self.bot.user.id and not (member and member.bot):
+                count += 1
+        return count
+
+    async def _make_room(self, guild_id: int):
+        """Evicts sessions until a new one fits under max_voice_sessions."""
+        if not self.max_voice_sessions:
+            return
+        while True:
+            others = [gid for gid in self.voice_clients if gid != guild_id]
+            if len(others) < self.max_voice_sessions:
+                return
+            # Idle sessions go first (longest idle), otherwise the session that has held a slot the longest
+            idle = [gid for gid in others if not self.voice_clients[gid].is_playing()]
+            if idle:
+                victim = min(idle, key=lambda gid: self.music_states[gid].last_active)
+            else:
+                victim = min(others, key=lambda gid: self.music_states[gid].connected_at)
+            await self._disconnect(victim, "Disconnected to make room for another server, use `!play` to start again.")
+
+    def queue_metrics(self):
+        """Per-guild queue depth and measured gap (seconds) between consecutive tracks."""
+        return {
+            guild_id: {
+                'queue_depth': len(state.queue),
+                'last_gap': state.last_gap,
+                'avg_gap': state.avg_gap,
+            }
+            for guild_id, state in self.music_states.items()
+        }
+
+    def _prefetch_next(self, state: GuildMusicState):
+        # Resolve the upcoming track while the current one plays, the result lands in the extractor cache
+        if not state.queue:
+            return
+        state.prefetch = asyncio.ensure_future(self.extractor.extract(state.queue[0]['url']))
+        # A failed prefetch is reported when the track is actually played
+        state.prefetch.add_done_callback(lambda task: task.cancelled() or task.exception())
+
+    def _on_track_end(self, guild_id: int, error):
+        # Called from the voice player thread, hand control back to the event loop
+        ended_at = time.perf_counter()
+        if error:
+            log.warning("Finished playing: %s", error)
+        self.bot.loop.call_soon_threadsafe(self._start_next, guild_id, ended_at)
+
+    def _start_next(self, guild_id: int, ended_at: float):
+        state = self.music_states.get(guild_id)
+        if state is None:
+            return  # Stopped in the meantime
+        state.track_ended_at = ended_at
+        self.bot.loop.create_task(self._play_next(guild_id))
+
+    async def _play_next(self, guild_id: int):
+        state = self.music_states[guild_id]
+        voice_client = self.voice_clients.get(guild_id)
+
+        while state.queue and voice_client and voice_client.is_connected():
+            track = state.queue.popleft()
+            state.current = track
+            try:
+                # Normally a cache hit (or joins the in-flight prefetch)
+                info = await self.extractor.extract(track['url'])
+                # Opus-native source, discord.py then sends the packets without re-encoding
+                source = await create_source(info, self.audio_cache)
+                voice_client.play(
+                    source,
+                    after=lambda e: self._on_track_end(guild_id, e)
+                )
+            except Exception as e:
+                log.warning("Could not play %s: %s", track['title'], e)
+                if state.text_channel:
+                    await dispatcher.send(state.text_channel, f"Skipping {track['title']}, it could not be played.")
+                continue
+
+            state.last_active = time.monotonic()
+            if state.track_ended_at is not None:
+                state.record_gap(time.perf_counter() - state.track_ended_at)
+                state.track_ended_at = None
+
+            self._prefetch_next(state)
+            if state.text_channel:
+                await dispatcher.send(state.text_channel, f"Now playing: {track['title']}")
+            return
+
+        state.current = None
+        state.track_ended_at = None
+        state.last_active = time.monotonic()  # The idle timer starts when the queue runs dry
+
+    @commands.command(name="play", usage="<YouTube URL>")
+    async def play(self, ctx, url: str):
+        """
+        Play music from a YouTube URL, or add it to the queue if something is already playing.
+        """
+        if not ctx.author.voice:
+            await dispatcher.send(ctx, "You need to be in a voice channel to use this command!")
+            return
+
+        voice_channel = ctx.author.voice.channel
+
+        if ctx.guild.id not in self.voice_clients or not self.voice_clients[ctx.guild.id].is_connected():
+            await self._make_room(ctx.guild.id)
+            self.voice_clients[ctx.guild.id] = await voice_channel.connect()
+            self.music_states.pop(ctx.guild.id, None)  # Fresh session, fresh timers
+
+        try:
+            # Extraction runs in the extractor's thread pool so the event loop keeps running
+            info = await self.extractor.extract(url)
+        except extractor.DownloadError as e:
+            log.warning("yt_dlp Error: %s", e)
+            await dispatcher.send(ctx, "An error occurred while processing the YouTube URL. Please try again.")
+            return
+        except Exception as e:
+            log.exception("Unexpected Error: %s", e)
+            await dispatcher.send(ctx, "An unexpected error occurred while trying to play the audio.")
+            return
+
+        state = self.music_states[ctx.guild.id]
+        state.text_channel = ctx.channel
+        state.queue.append({'url': info['webpage_url'], 'title': info['title'], 'requester': ctx.author})
+
+        if state.current is None:
+            await self._play_next(ctx.guild.id)
+        else:
+            if len(state.queue) == 1:
+                self._prefetch_next(state)
+            await dispatcher.send(ctx, f"Queued: {info['title']} (position {len(state.queue)})")
+
+    @commands.command(name="skip")
+    async def skip(self, ctx):
+        """
+        Skip the current track.
+        """
+        voice_client = self.voice_clients.get(ctx.guild.id)
+        state = self.music_states.get(ctx.guild.id)
+        if not voice_client or not state or state.current is None:
+            await dispatcher.send(ctx, "No music is currently playing.")
+            return
+        # Stopping fires the after= callback, which starts the next track
+        await dispatcher.send(ctx, f"Skipped: {state.current['title']}")
+        voice_client.stop()
+
+    @commands.command(name="queue")
+    async def show_queue(self, ctx):
+        """
+        Show the upcoming tracks.
+        """
+        state = self.music_states.get(ctx.guild.id)
+        if not state or not state.queue:
+            await dispatcher.send(ctx, "The queue is empty.")
+            return
+        lines = [f"{i}. {track['title']}" for i, track in enumerate(list(state.queue)[:10], start=1)]
+        if len(state.queue) > 10:
+            lines.append(f"...and {len(state.queue) - 10} more")
+        await dispatcher.send(ctx, "Up next:\n" + "\n".join(lines))
+
+    @commands.command(name="np")
+    async def now_playing(self, ctx):
+        """
+        Show the track that is currently playing.
+        """
+        state = self.music_states.get(ctx.guild.id)
+        if not state or state.current is None:
+            await dispatcher.send(ctx, "No music is currently playing.")
+            return
+        await dispatcher.send(ctx, f"Now playing: {state.current['title']} (requested by {state.current['requester'].display_name})")
+
+    @commands.command(name="stop")
+    async def stop(self, ctx):
+        """
+        Stop the music, clear the queue and disconnect.
+        """
+        if ctx.guild.id in self.voice_clients:
+            await self._disconnect(ctx.guild.id)
+            await dispatcher.send(ctx, "Stopped and disconnected from the voice channel.")
+
+    @commands.command(name="pause")
+    async def pause(self, ctx):
+        """
+        Pause the currently playing music.
+        """
+        if ctx.guild.id in self.voice_clients:
+            voice_client = self.voice_clients[ctx.guild.id]
+            if voice_client.is_playing():
+                voice_client.pause()
+                await dispatcher.send(ctx, "Paused the music.")
+            else:
+                await dispatcher.send(ctx, "No music is currently playing.")
+
+    @commands.command(name="resume")
+    async def resume(self, ctx):
+        """
+        Resume paused music.
+        """
+        if ctx.guild.id in self.voice_clients:
+            voice_client = self.voice_clients[ctx.guild.id]
+            if voice_client.is_paused():
+                voice_client.resume()
+                await dispatcher.send(ctx, "Resumed the music.")
+            else:
+                await dispatcher.send(ctx, "The music is not paused.")
+
+
+async def setup(bot: commands.Bot):
+    await bot.add_cog(MusicCog(bot))
@@ -0,0 +1,298 @@
+import asyncio
+import functools
+import logging
+import os
+import time
+from datetime import datetime, timezone
+
+import discord
+from discord.ext import commands, tasks
+
+from cluster import cluster_path
+from outbound import dispatcher
+from pollengine import EMOJIS, EMOJI_INDEX, Poll, PollStore, parse_duration
+
+log = logging.getLogger(__name__)
+
+
+class PollButtons(discord.ui.View):
+    """
+    One button per option. The custom IDs (poll:<option>) are the same on every poll,
+    so a single persistent view registered at startup handles clicks on all of them.
+    """
+
+    def __init__(self, cog, options=None):
+        super().__init__(timeout=None)
+        for i, label in enumerate(options or [None] * len(EMOJIS)):
+            button = discord.ui.Button(label=(label or str(i + 1))[:80], emoji=EMOJIS[i], custom_id=f"poll:{i}",
+                                       style=discord.ButtonStyle.secondary, row=i // 5)
+            button.callback = functools.partial(cog.on_vote_button, i)
+            self.add_item(button)
+
+
+class PollCog(commands.Cog):
+    """A cog to create polls"""
+
+    # Votes are collected and the results embed is edited at most once per poll every this many seconds
+    EDIT_INTERVAL = 2.0
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.store = PollStore()  # Open polls, counted from raw reaction events and button clicks
+        self.pending_edits = set()  # Message IDs of polls whose embed is behind their counts
+        self.closing = {}  # message id -> TimerHandle closing the poll at its deadline
+        # Per cluster worker: a poll is created, voted on and closed by the worker hosting its guild's shard
+        self.state_file = cluster_path(os.getenv('POLL_STATE_FILE', 'polls.json'))
+
+    async def cog_load(self):
+        self.store.load(self.state_file)
+        for poll in self.store.polls.values():
+            self.schedule_close(poll)
+        self.bot.add_view(PollButtons(self))  # Replaces the previous cog's view on reload
+        self.flush_edits.start()
+        self.save_polls.start()
+
+    def cog_unload(self):
+        self.flush_edits.cancel()
+        self.save_polls.cancel()
+        for handle in self.closing.values():
+            handle.cancel()
+        if self.store.dirty:
+            self.store.save(self.state_file)
+
+    def build_embed(self, poll: Poll, closed: bool = False) -> discord.Embed:
+        embed = discord.Embed(title="Poll (closed)" if closed else "Poll", description=poll.question,
+                              color=discord.Color.dark_grey() if closed else discord.Color.blue())
+        lines = []
+        for i, (option, count) in enumerate(zip(poll.options, poll.counts)):
+            share = count / poll.total if poll.total else 0
+            bar = "▇" * round(share * 10)
+            lines.append(f"{EMOJIS[i]} {option}: **{count}** ({share:.0%}) {bar}")
+        embed.add_field(name="Options", value="\n".join(lines), inline=False)
+
+        if closed:
+            winners = poll.winners()
+            result = f"Winner: {', '.join(winners)}" if len(winners) == 1 else (
+                f"Tie: {', '.join(winners)}" if winners else "No votes")
+            embed.set_footer(text=f"{result} · {poll.total} vote(s)")
+            return embed
+
+        how = "Click a button to vote!" if poll.buttons else "React with the corresponding emoji to vote!"
+        if poll.deadline is not None:
+            # Discord renders the timestamp in each reader's timezone
+            embed.set_footer(text=f"{how} · {poll.total} vote(s) · Closes")
+            embed.timestamp = datetime.fromtimestamp(poll.deadline, tz=timezone.utc)
+        else:
+            embed.set_footer(text=f"{how} · {poll.total} vote(s)")
+        return embed
+
+    def poll_message_of(self, poll: Poll) -> discord.PartialMessage:
+        # Edits and reaction removals don't need the full message, so nothing is fetched
+        return self.bot.get_partial_messageable(poll.channel_id).get_partial_message(poll.message_id)
+
+    def mark_changed(self, poll: Poll):
+        self.pending_edits.add(poll.message_id)
+        self.store.dirty = True
+
+    def schedule_close(self, poll: Poll):
+        if poll.deadline is None:
+            return
+        delay = max(0.0, poll.deadline - time.time())
+        self.closing[poll.message_id] = asyncio.get_running_loop().call_later(
+            delay, lambda: asyncio.ensure_future(self.close_poll(poll.message_id)))
+
+    async def close_poll(self, message_id: int):
+        """Stops counting and edits the final results into the poll."""
+        await self.bot.wait_until_ready()
+        poll = self.store.get(message_id)
+        if poll is None:
+            return  # Already closed
+        self.store.remove(message_id)
+        self.pending_edits.discard(message_id)
+        handle = self.closing.pop(message_id, None)
+        if handle is not None:
+            handle.cancel()
+
+        try:
+            # Closed button polls lose their buttons
+            extra = {'view': None} if poll.buttons else {}
+            await self.poll_message_of(poll).edit(embed=self.build_embed(poll, closed=True), **extra)
+        except discord.HTTPException as e:
+            log.warning("Could not edit the results of poll %s: %s", message_id, e)
+        winners = poll.winners()
+        if winners:
+            summary = f"The poll \"{poll.question}\" has closed, {' / '.join(winners)} won with {max(poll.counts)} vote(s)."
+        else:
+            summary = f"The poll \"{poll.question}\" has closed without any votes."
+        try:
+            await dispatcher.send(self.bot.get_partial_messageable(poll.channel_id), summary)
+        except discord.HTTPException:
+            pass
+
+    @tasks.loop(seconds=EDIT_INTERVAL)
+    async def flush_edits(self):
+        """Edits every poll that got votes since the last run, once each, however many votes came in."""
+        if not self.pending_edits:
+            return
+        message_ids, self.pending_edits = self.pending_edits, set()
+        polls = [self.store.get(message_id) for message_id in message_ids]
+        polls = [poll for poll in polls if poll is not None]
+        results = await asyncio.gather(
+            *(self.poll_message_of(poll).edit(embed=self.build_embed(poll)) for poll in polls),
+            return_exceptions=True,
+        )
+        for poll, result in zip(polls, results):
+            if isinstance(result, discord.NotFound):
+                self.store.remove(poll.message_id)  # Message was deleted
+            elif isinstance(result, Exception):
+                log.warning("Could not update poll %s: %s", poll.message_id, result)
+
+    @flush_edits.before_loop
+    async def before_flush_edits(self):
+        await self.bot.wait_until_ready()
+
+    @tasks.loop(seconds=15)
+    async def save_polls(self):
+        if self.store.dirty:
+            self.store.save(self.state_file)
+
+    async def remove_old_vote(self, poll: Poll, option: int, user_id: int):
+        # Take the replaced reaction off so the message shows one vote per user (needs Manage Messages)
+        try:
+            await self.poll_message_of(poll).remove_reaction(EMOJIS[option], discord.Object(user_id))
+        except discord.HTTPException:
+            pass
+
+    async def on_vote_button(self, option: int, interaction: discord.Interaction):
+        poll = self.store.get(interaction.message.id)
+        if poll is None:
+            await interaction.response.send_message("This poll is closed.", ephemeral=True)
+            return
+        # Clicking your current option again takes the vote back
+        if poll.vote(interaction.user.id, option) == -1:
+            poll.unvote(interaction.user.id, option)
+            reply = f"Removed your vote for {poll.options[option]}."
+        else:
+            reply = f"You voted for {poll.options[option]}."
+        self.mark_changed(poll)
+        await interaction.response.send_message(reply, ephemeral=True)
+
+    @commands.Cog.listener()
+    async def on_raw_reaction_add(self, payload: discord.RawReactionActionEvent):
+        poll = self.store.get(payload.message_id)
+        # Button polls are voted on with the buttons, reactions on them are just reactions
+        if poll is None or poll.buttons or payload.user_id == self.bot.user.id:
+            return
+        previous = poll.vote(payload.user_id, EMOJI_INDEX.get(str(payload.emoji), -1))
+        if previous == -1:
+            return
+        self.mark_changed(poll)
+        if previous is not None:
+            self.bot.loop.create_task(self.remove_old_vote(poll, previous, payload.user_id))
+
+    @commands.Cog.listener()
+    async def on_raw_reaction_remove(self, payload: discord.RawReactionActionEvent):
+        poll = self.store.get(payload.message_id)
+        if poll is not None and not poll.buttons and poll.unvote(payload.user_id, EMOJI_INDEX.get(str(payload.emoji), -1)):
+            self.mark_changed(poll)
+
+    @commands.Cog.listener()
+    async def on_raw_reaction_clear(self, payload: discord.RawReactionClearEvent):
+        poll = self.store.get(payload.message_id)
+        if poll is not None and not poll.buttons:
+            poll.voters.clear()
+            poll.counts = [0] * len(poll.options)
+            self.mark_changed(poll)
+
+    @commands.Cog.listener()
+    async def on_raw_message_delete(self, payload: discord.RawMessageDeleteEvent):
+        self.store.remove(payload.message_id)
+        self.pending_edits.discard(payload.message_id)
+        handle = self.closing.pop(payload.message_id, None)
+        if handle is not None:
+            handle.cancel()
+
+    async def create_poll(self, ctx, question_and_options: str, buttons: bool = False):
+        # Ensure the input contains a question and options
+        if "|" not in question_and_options:
+            await dispatcher.send(ctx, "Please provide the question and options separated by '|'.")
+            return
+
+        # An optional duration in front of the question sets a deadline
+        duration = None
+        first, _, rest = question_and_options.partition(" ")
+        if rest and parse_duration(first) is not None:
+            duration = parse_duration(first)
+            question_and_options = rest
+
+        # Split the question and options
+        question, options = question_and_options.split("|", 1)
+        options = [option.strip() for option in options.split(",")]
+
+        # Validate the number of options
+        if len(options) < 2:
+            await dispatcher.send(ctx, "Provide at least two options.")
+            return
+
+        if len(options) > 10:
+            await dispatcher.send(ctx, "You can provide up to 10 options.")
+            return
+
+        deadline = time.time() + duration if duration else None
+        poll = Poll(0, ctx.channel.id, ctx.author.id, question.strip(), options, deadline, buttons)
+
+        if buttons:
+            # Buttons come with the message, nothing to add afterwards
+            message = await dispatcher.send(ctx, embed=self.build_embed(poll), view=PollButtons(self, options))
+        else:
+            message = await dispatcher.send(ctx, embed=self.build_embed(poll))
+        poll.message_id = message.id
+        self.store.add(poll)
+        self.schedule_close(poll)
+
+        if not buttons:
+            # In the background, at the reaction route's one per 0.25s. Button polls skip this wait.
+            seeding = dispatcher.add_reactions(message, EMOJIS[:len(options)])
+            seeding.add_done_callback(functools.partial(self._seeding_done, message.id))
+
+    @staticmethod
+    def _seeding_done(message_id: int, task: asyncio.Future):
+        if not task.cancelled() and task.exception() is not None:
+            log.warning("Could not add every reaction to poll %s: %s", message_id, task.exception())
+
+    @commands.command(name="poll", usage="[duration] <question> | <option1>, <option2>, ...")
+    async def poll_message(self, ctx, *, question_and_options: str):
+        """
+        Creates a poll.
+        Usage:
+        !poll Question | Option 1, Option 2, Option 3
+        !poll 10m Question | Option 1, Option 2   (closes after 10 minutes, also s/h/d)
+        """
+        await self.create_poll(ctx, question_and_options)
+
+    @commands.command(name="buttonpoll", usage="[duration] <question> | <option1>, <option2>, ...")
+    async def button_poll(self, ctx, *, question_and_options: str):
+        """
+        Creates a poll voted on with buttons, same usage as !poll.
+        """
+        await self.create_poll(ctx, question_and_options, buttons=True)
+
+    @commands.command(name="closepoll", usage="[message ID]")
+    async def close_poll_command(self, ctx, message_id: int = None):
+        """
+        Closes a poll early. Reply to the poll, or pass its message ID.
+        """
+        if message_id is None and ctx.message.reference is not None:
+            message_id = ctx.message.reference.message_id
+        poll = self.store.get(message_id) if message_id else None
+        if poll is None:
+            await dispatcher.send(ctx, "That isn't an open poll. Reply to the poll or give its message ID.")
+            return
+        if ctx.author.id != poll.author_id and not ctx.channel.permissions_for(ctx.author).manage_messages:
+            await dispatcher.send(ctx, "Only the poll's creator or a moderator can close it.")
+            return
+        await self.close_poll(message_id)
+
+
+async def setup(bot: commands.Bot):
+    await bot.add_cog(PollCog(bot))
@@ -0,0 +1,163 @@
+import asyncio
+import os
+import time
+
+import discord
+from discord.ext import commands
+
+from cluster import ShardMetrics, local_stats
+from membercache import ensure_chunked
+from outbound import dispatcher
+
+
+class GuildMemberCounts:
+    """Online human members of one guild, kept up to date from gateway events."""
+    __slots__ = ('online_humans',)
+
+    def __init__(self, members):
+        # One scan when the guild is first seen, events keep the number current after that
+        self.online_humans = 0
+        for member in members:
+            if not member.bot and member.status != discord.Status.offline:
+                self.online_humans += 1
+
+
+class StatsCog(commands.Cog):
+    """  A cog that provides server statistics and member information. """
+
+    # Seconds an approximate count fetched from the API is reused
+    APPROXIMATE_TTL = 60.0
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.member_counts = {}  # guild id -> GuildMemberCounts
+        self.approximate_counts = {}  # guild id -> (fetched at, member count, presence count)
+        # Answer from the API's approximate counts instead of the member cache, for unchunked guilds
+        self.use_approximate = os.getenv('STATS_APPROXIMATE') == '1'
+
+    def get_counts(self, guild: discord.Guild) -> GuildMemberCounts:
+        counts = self.member_counts.get(guild.id)
+        if counts is None:
+            counts = self.member_counts[guild.id] = GuildMemberCounts(guild.members)
+        return counts
+
+    async def get_approximate_counts(self, guild: discord.Guild):
+        """approximate_member_count and approximate_presence_count, without chunking the guild."""
+        cached = self.approximate_counts.get(guild.id)
+        if cached and time.monotonic() - cached[0] < self.APPROXIMATE_TTL:
+            return cached[1], cached[2]
+        fetched = await self.bot.fetch_guild(guild.id, with_counts=True)
+        self.approximate_counts[guild.id] = (time.monotonic(), fetched.approximate_member_count,
+                                             fetched.approximate_presence_count)
+        return fetched.approximate_member_count, fetched.approximate_presence_count
+
+    async def answers_from_cache(self, guild: discord.Guild) -> bool:
+        # Guilds that weren't chunked at startup are chunked here, on first use, if they're small enough
+        return not self.use_approximate and await ensure_chunked(guild)
+
+    @commands.Cog.listener()
+    async def on_guild_available(self, guild: discord.Guild):
+        self.member_counts.pop(guild.id, None)  # Recounted on first use after a reconnect
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild: discord.Guild):
+        self.member_counts.pop(guild.id, None)
+        self.approximate_counts.pop(guild.id, None)
+
+    @commands.Cog.listener()
+    async def on_member_join(self, member: discord.Member):
+        counts = self.member_counts.get(member.guild.id)
+        if counts is not None and not member.bot and member.status != discord.Status.offline:
+            counts.online_humans += 1
+
+    @commands.Cog.listener()
+    async def on_member_remove(self, member: discord.Member):
+        counts = self.member_counts.get(member.guild.id)
+        if counts is not None and not member.bot and member.status != discord.Status.offline:
+            counts.online_humans -= 1
+
+    @commands.Cog.listener()
+    async def on_presence_update(self, before: discord.Member, after: discord.Member):
+        counts = self.member_counts.get(after.guild.id)
+        if counts is None or after.bot:
+            return
+        was_online = before.status != discord.Status.offline
+        is_online = after.status != discord.Status.offline
+        if was_online != is_online:
+            counts.online_humans += 1 if is_online else -1
+
+    @commands.command(name="members")
+    async def members(self, ctx):
+        """
+        Responds with the number of server members.
+        """
+        guild = ctx.guild  # Get the guild (server) the command was invoked in
+
+        if not guild:
+            await dispatcher.send(ctx, "This command must be used in a server.")
+            return
+
+        # Discord keeps the member count up to date on the guild, no need to walk the members
+        if guild.member_count is not None:
+            total_members = guild.member_count
+        else:
+            total_members, _ = await self.get_approximate_counts(guild)
+
+        # Send the count as a message
+        await dispatcher.send(ctx, f"There are {total_members} members.")
+
+    @commands.command(name="activemembers")
+    async def activemembers(self, ctx):
+        """
+        Responds with the number of active users.
+        """
+        guild = ctx.guild
+
+        if not guild:
+            await dispatcher.send(ctx, "This command must be used in a server.")
+            return
+
+        # Without the privileged presences intent every cached member looks offline and no presence
+        # updates arrive, only the API's presence count knows who is online
+        if not self.bot.intents.presences or not await self.answers_from_cache(guild):
+            # The API's presence count includes bots, so say it's an estimate
+            _, presence_count = await self.get_approximate_counts(guild)
+            await dispatcher.send(ctx, f"There are about {presence_count} active members.")
+            return
+
+        # Members who are active (not offline and not a bot), counted incrementally
+        active_count = self.get_counts(guild).online_humans
+
+        # Send the count as a message
+        await dispatcher.send(ctx, f"There are {active_count} active members.")
+
+    async def cluster_stats(self) -> list:
+        # Every cluster's local stats over IPC, or just ours when running as a single process
+        metrics = getattr(self.bot, 'shard_metrics', None) or ShardMetrics(self.bot)
+        cluster = getattr(self.bot, 'cluster', None)
+        if cluster is not None:
+            try:
+                return await cluster.query('stats')
+            except (ConnectionError, asyncio.TimeoutError):
+                pass  # Hub is gone, report what this process knows
+        return [local_stats(self.bot, metrics)]
+
+    @commands.command(name="globalstats")
+    async def globalstats(self, ctx):
+        """
+        Responds with guild and member totals across every shard, plus per-shard latency and event rate.
+        """
+        results = await self.cluster_stats()
+        guilds = sum(result['guilds'] for result in results)
+        members = sum(result['members'] for result in results)
+
+        lines = [f"{guilds} servers, {members} members across {len(results)} cluster(s)."]
+        for result in sorted(results, key=lambda result: int(result['cluster'])):
+            for shard_id, shard in sorted(result['shards'].items(), key=lambda item: int(item[0])):
+                latency = f"{shard['latency_ms']:.0f} ms" if shard['latency_ms'] is not None else "connecting"
+                lines.append(f"Cluster {result['cluster']} shard {shard_id}: {latency}, {shard['events_per_sec']} events/s")
+        await dispatcher.send(ctx, "\n".join(lines))
+
+
+async def setup(bot: commands.Bot):
+    await bot.add_cog(StatsCog(bot))
@@ -0,0 +1,191 @@
+import functools
+import os
+
+import discord
+from discord.ext import commands, tasks
+
+from outbound import dispatcher
+from tttengine import CONTINUE, DIFFICULTIES, DRAW, INVALID, NOT_YOUR_TURN, SessionManager, ai_move
+
+MARK_STYLES = {'X': discord.ButtonStyle.primary, 'O': discord.ButtonStyle.danger, ' ': discord.ButtonStyle.secondary}
+
+
+class BoardButtons(discord.ui.View):
+    """
+    The board as a 3x3 grid of buttons. The custom IDs (ttt:<cell>) are the same on every
+    board, so a single persistent view registered at startup handles clicks on all of them.
+    """
+
+    def __init__(self, cog, marks=None, finished=False):
+        super().__init__(timeout=None)
+        for i, mark in enumerate(marks or [' '] * 9):
+            button = discord.ui.Button(label=mark if mark != ' ' else '\u200b', custom_id=f"ttt:{i}",
+                                       style=MARK_STYLES[mark], row=i // 3, disabled=finished or mark != ' ')
+            button.callback = functools.partial(cog.on_square, i)
+            self.add_item(button)
+
+
+class TicTacToe(commands.Cog):
+    """A cog to play Tic-Tac-Toe"""
+
+    def __init__(self, bot):
+        self.bot = bot
+        # Every game in progress, one per player per channel. Games nobody plays are ended after a while.
+        self.sessions = SessionManager(expire_after=float(os.getenv('TICTACTOE_EXPIRE_AFTER', '600')))
+
+    async def cog_load(self):
+        self.bot.add_view(BoardButtons(self))  # Replaces the previous cog's view on reload
+        self.expire_games.start()
+
+    def cog_unload(self):
+        self.expire_games.cancel()
+
+    @tasks.loop(seconds=30)
+    async def expire_games(self):
+        for game in self.sessions.expire():
+            if game.message_id is not None:
+                self.update_board(game, self.render(game, "Game over, nobody moved for a while.", finished=True))
+
+    @expire_games.before_loop
+    async def before_expire_games(self):
+        await self.bot.wait_until_ready()
+
+    def render(self, game, status: str, finished: bool = False) -> dict:
+        """Arguments for sending or editing the board message."""
+        x_player, o_player = game.players
+        content = f"<@{x_player}> (X) vs <@{o_player}> (O)\n{status}"
+        if game.buttons:
+            return {'content': content, 'view': BoardButtons(self, game.marks(), finished)}
+        cells = game.marks()
+        board = "\n".join([
+            f"{cells[0]} | {cells[1]} | {cells[2]}",
+            "---+---+---",
+            f"{cells[3]} | {cells[4]} | {cells[5]}",
+            "---+---+---",
+            f"{cells[6]} | {cells[7]} | {cells[8]}",
+        ])
+        return {'content': f"{content}\n```\n{board}\n```"}
+
+    @staticmethod
+    def turn_status(game) -> str:
+        if game.buttons:
+            return f"It's <@{game.current_player}>'s turn!"
+        return f"It's <@{game.current_player}>'s turn! Type `!move [position]` to play."
+
+    def update_board(self, game, board: dict):
+        # Edits pile up in the dispatcher while the channel's edit bucket is empty, only the latest board is sent
+        message = self.bot.get_partial_messageable(game.channel_id).get_partial_message(game.message_id)
+        dispatcher.edit(message, **board)
+
+    def play(self, game, user_id: int, position: int):
+        """
+        Plays `position` (0-8) for the user, then the bot's answer in games against it.
+        Returns (error, None) if the move isn't allowed, otherwise (None, the new board).
+        """
+        result = game.move(user_id, position)
+        if result == NOT_YOUR_TURN:
+            return "It's not your turn!", None
+        if result == INVALID:
+            return "Invalid move! Choose a position between 1-9 that isn't already taken.", None
+
+        note = ""
+        if result == CONTINUE and game.mistake_rate is not None:
+            # The bot answers straight away, its move is a table lookup
+            position = ai_move(game.cells, game.mistake_rate)
+            result = game.move(game.current_player, position)
+            note = f"I played {position + 1}. "
+
+        if result == CONTINUE:
+            self.sessions.touch(game)
+            return None, self.render(game, note + self.turn_status(game))
+        self.sessions.end(game)
+        if result == DRAW:
+            return None, self.render(game, note + "It's a tie!", finished=True)
+        if game.current_player == self.bot.user.id:
+            return None, self.render(game, note + "I win! 🦁", finished=True)
+        return None, self.render(game, f"<@{game.current_player}> wins!", finished=True)
+
+    @commands.command(name="tictactoe", usage="<@opponent|ai> [easy|medium|hard] [buttons]")
+    async def start_game(self, ctx, opponent: str, *options: str):
+        """
+        Starts a game against another member, or against the bot with `ai` (or by mentioning it).
+        Against the bot, pick a difficulty: easy, medium or hard (default, it never loses).
+        Add `buttons` to play by clicking the board instead of with !move.
+        """
+        if opponent.lower() == "ai":
+            opponent = ctx.me
+        else:
+            opponent = await commands.MemberConverter().convert(ctx, opponent)
+        if ctx.author == opponent:
+            await dispatcher.send(ctx, "You cannot play against yourself!")
+            return
+
+        options = [option.lower() for option in options]
+        buttons = "buttons" in options
+        difficulties = [option for option in options if option != "buttons"]
+        mistake_rate = None
+        if opponent.id == self.bot.user.id:
+            mistake_rate = DIFFICULTIES.get(difficulties[0] if difficulties else "hard")
+            if mistake_rate is None or len(difficulties) > 1:
+                await dispatcher.send(ctx, f"Difficulty must be one of {', '.join(DIFFICULTIES)}.")
+                return
+        elif difficulties:
+            await dispatcher.send(ctx, "Only `buttons` can be added when playing against a member.")
+            return
+
+        game = self.sessions.start(ctx.channel.id, ctx.author.id, opponent.id, mistake_rate, buttons)
+        if game is None:
+            await dispatcher.send(ctx, "One of you is already in a game in this channel! Finish it or use `!endgame`.")
+            return
+        # The only message the game sends, every move edits it
+        try:
+            message = await dispatcher.send(ctx, coalesce=False, **self.render(game, self.turn_status(game)))
+        except discord.HTTPException:
+            self.sessions.end(game)
+            raise
+        game.message_id = message.id
+
+    @commands.command(name="move", usage="<1-9>")
+    async def make_move(self, ctx, position: int):
+        """Makes your move, squares are numbered 1-9 from the top left."""
+        game = self.sessions.get(ctx.channel.id, ctx.author.id)
+        if game is None:
+            await dispatcher.send(ctx, "No game in progress. Start one with `!tictactoe @opponent`.")
+            return
+        if game.message_id is None:
+            await dispatcher.send(ctx, "Wait for the board to show up!")
+            return
+
+        error, board = self.play(game, ctx.author.id, position - 1)
+        if error is not None:
+            await dispatcher.send(ctx, f"{error} {ctx.author.mention}")
+            return
+        self.update_board(game, board)
+
+    async def on_square(self, position: int, interaction: discord.Interaction):
+        game = self.sessions.get(interaction.channel_id, interaction.user.id)
+        if game is None or game.message_id != interaction.message.id:
+            await interaction.response.send_message("This isn't your game.", ephemeral=True)
+            return
+        error, board = self.play(game, interaction.user.id, position)
+        if error is not None:
+            await interaction.response.send_message(error, ephemeral=True)
+            return
+        # Answering the click with the new board is the edit, no separate request
+        await interaction.response.edit_message(**board)
+
+    @commands.command(name="endgame")
+    async def end_game(self, ctx):
+        """Ends your Tic-Tac-Toe game in this channel."""
+        game = self.sessions.get(ctx.channel.id, ctx.author.id)
+        if game is None:
+            await dispatcher.send(ctx, "You are not in a game in this channel!")
+            return
+        self.sessions.end(game)
+        if game.message_id is not None:
+            self.update_board(game, self.render(game, f"The game has been ended by {ctx.author.mention}.",
+                                                finished=True))
+
+
+async def setup(bot: commands.Bot):
+    await bot.add_cog(TicTacToe(bot))
@@ -0,0 +1,171 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse, parse_qs
+
+YDL_OPTIONS = {
+    'format': 'bestaudio/best',
+    'quiet': True,
+    'extract_flat': False,
+    'noplaylist': True,
+    'source_address': '0.0.0.0',
+}
+
+
+def _youtube_dl():
+    # yt_dlp's extractor registry takes a few hundred ms to import, so it's only loaded once something is played
+    import yt_dlp as youtube_dl
+    return youtube_dl
+
+
+def __getattr__(name):
+    # extractor.DownloadError without importing yt_dlp up front
+    if name == 'DownloadError':
+        return _youtube_dl().DownloadError
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# Hosts that serve the same video under different URL shapes
+YOUTUBE_HOSTS = {'youtube.com', 'www.youtube.com', 'm.youtube.com', 'music.youtube.com'}
+
+
+def normalize_video_key(url: str) -> str:
+    """
+    Returns a cache key for a URL, collapsing the different YouTube URL
+    shapes (watch?v=, youtu.be/, /shorts/, /embed/) onto the video ID.
+    """
+    url = url.strip()
+    parsed = urlparse(url)
+    host = parsed.netloc.lower()
+
+    if host in YOUTUBE_HOSTS:
+        video_ids = parse_qs(parsed.query).get('v')
+        if video_ids:
+            return f"youtube:{video_ids[0]}"
+        parts = [part for part in parsed.path.split('/') if part]
+        if len(parts) >= 2 and parts[0] in ('shorts', 'embed', 'live', 'v'):
+            return f"youtube:{parts[1]}"
+    elif host in ('youtu.be', 'www.youtu.be'):
+        video_id = parsed.path.strip('/').split('/')[0]
+        if video_id:
+            return f"youtube:{video_id}"
+
+    return url
+
+
+def stream_expiry(stream_url: str):
+    """Returns the unix timestamp a signed stream URL expires at, if it carries one."""
+    expire = parse_qs(urlparse(stream_url).query).get('expire')
+    if expire:
+        try:
+            return float(expire[0])
+        except ValueError:
+            return None
+    return None
+
+
+class ExtractorPool:
+    """
+    Runs yt_dlp extraction in a bounded thread pool so it never blocks the event loop.
+
+    Each worker thread keeps its own YoutubeDL instance (they are not thread safe),
+    results are kept in a TTL + LRU cache keyed by video ID, and concurrent lookups
+    for the same video share a single extraction.
+    """
+
+    def __init__(self, max_workers: int = 4, cache_size: int = 256, ttl: float = 3600.0,
+                 expiry_margin: float = 300.0, ydl_opts: dict = None):
+        self.max_workers = max_workers
+        self.cache_size = cache_size
+        self.ttl = ttl
+        self.expiry_margin = expiry_margin  # Refresh this many seconds before the stream URL expires
+        self.ydl_opts = dict(ydl_opts or YDL_OPTIONS)
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ytdl")
+        self._local = threading.local()
+        self._cache = OrderedDict()  # key -> (expires_at, info)
+        self._in_flight = {}  # key -> asyncio.Future shared by concurrent callers
+
+        self.hits = 0
+        self.misses = 0
+
+    def _get_ydl(self):
+        # Reuse one YoutubeDL per worker thread instead of building one per request
+        ydl = getattr(self._local, 'ydl', None)
+        if ydl is None:
+            ydl = _youtube_dl().YoutubeDL(self.ydl_opts)
+            self._local.ydl = ydl
+        return ydl
+
+    def _extract(self, url: str) -> dict:
+        info = self._get_ydl().extract_info(url, download=False)
+        # Only keep the fields playback needs, the full info dict is large
+        return {
+            'id': info.get('id'),
+            'url': info['url'],
+            'title': info.get('title', 'Unknown Title'),
+            'duration': info.get('duration'),
+            'webpage_url': info.get('webpage_url', url),
+            'acodec': info.get('acodec'),
+            'abr': info.get('abr'),
+            'ext': info.get('ext'),
+        }
+
+    def _cache_get(self, key: str):
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        expires_at, info = entry
+        if expires_at <= time.time():
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return info
+
+    def _cache_put(self, key: str, info: dict):
+        expires_at = time.time() + self.ttl
+        signed_expiry = stream_expiry(info['url'])
+        if signed_expiry is not None:
+            expires_at = min(expires_at, signed_expiry - self.expiry_margin)
+
+        self._cache[key] = (expires_at, info)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def extract(self, url: str) -> dict:
+        """
+        Resolves a URL to playable stream info without blocking the event loop.
+        Raises extractor.DownloadError (yt_dlp's) if the extraction fails.
+        """
+        key = normalize_video_key(url)
+
+        info = self._cache_get(key)
+        if info is not None:
+            self.hits += 1
+            return info
+
+        future = self._in_flight.get(key)
+        if future is None:
+            self.misses += 1
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self._executor, self._extract, url)
+            self._in_flight[key] = future
+            future.add_done_callback(lambda fut: self._on_extracted(key, fut))
+
+        # Shield so one cancelled !play doesn't cancel the extraction for everyone else
+        return await asyncio.shield(future)
+
+    def _on_extracted(self, key: str, future: asyncio.Future):
+        self._in_flight.pop(key, None)
+        if not future.cancelled() and future.exception() is None:
+            self._cache_put(key, future.result())
+
+    def invalidate(self, url: str):
+        """Drops a cached entry, e.g. when its stream URL stopped working."""
+        self._cache.pop(normalize_video_key(url), None)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
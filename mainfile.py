@@ -1,72 +1,182 @@
-from typing import Final
+# Set STARTUP_PROFILE=1 to log per-module import times and time-to-READY
 import os
+from startup import profile
+if os.getenv('STARTUP_PROFILE') == '1':
+    profile.install()
+
+import logging
+from typing import Final
 import discord
 from dotenv import load_dotenv
-from discord.ext import commands
+
+from admission import AdmissionControl
+from botlog import setup_logging
+from cluster import ShardMetrics, client_from_env, launch, local_stats, sharding_options
+from membercache import member_cache_flags
+from metrics import metrics
+from outbound import dispatcher
+from poems import generator_from_env
+from router import MessageRouter
 
 load_dotenv()
 TOKEN: Final[str] = os.getenv('DISCORD_TOKEN')
+# Optional Prometheus-style endpoint at http://METRICS_HOST:METRICS_PORT/metrics
+METRICS_HOST: Final[str] = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT: Final[int] = int(os.getenv('METRICS_PORT', '0'))
+
+log = logging.getLogger('mainfile')
 
 # Set up intents
 intents = discord.Intents.default()
 intents.members = True
 intents.message_content = True
+# Privileged, enable "Presence Intent" in the developer portal first. Without it !activemembers uses
+# Discord's approximate presence count, the member cache has no statuses to count.
+intents.presences = os.getenv('PRESENCES_INTENT') == '1'
+
+# Member cache policy: which members are kept in memory, and whether every guild is chunked at startup.
+# With MEMBER_CACHE=voice/none and CHUNK_GUILDS_AT_STARTUP=0, members are fetched when a command needs them.
+MEMBER_CACHE: Final[str] = os.getenv('MEMBER_CACHE', 'all')
+CHUNK_GUILDS_AT_STARTUP: Final[bool] = os.getenv('CHUNK_GUILDS_AT_STARTUP', '1') == '1'
+
+# Sharding: a plain Bot by default, AutoShardedBot with AUTOSHARD=1 or when the cluster launcher
+# hands this process a shard range. CLUSTER_PROCESSES > 1 spreads the shards over that many processes.
+CLUSTER_PROCESSES: Final[int] = int(os.getenv('CLUSTER_PROCESSES', '1'))
+BotClass, shard_kwargs = sharding_options()
 
 # Create the bot instance
-bot = commands.Bot(command_prefix="!", intents=intents)
+bot = BotClass(
+    command_prefix="!",
+    intents=intents,
+    member_cache_flags=member_cache_flags(MEMBER_CACHE),
+    chunk_guilds_at_startup=CHUNK_GUILDS_AT_STARTUP,
+    **shard_kwargs,
+)
+bot.shard_metrics = ShardMetrics(bot)
+bot.cluster = client_from_env()  # None unless started by the cluster launcher
+
+# Per-command latency and errors, plus what the other subsystems already count
+metrics.install(bot)
+metrics.gauge('bot_outbound_queue_depth', 'Messages waiting in the outbound dispatcher.',
+              lambda: dispatcher.stats()['queue_depth'])
+metrics.gauge('bot_outbound_messages', 'Messages the outbound dispatcher sent, or failed to send.',
+              lambda: {'result="sent"': dispatcher.sent, 'result="failed"': dispatcher.failed})
+metrics.gauge('bot_outbound_requested', 'Sends cogs asked the outbound dispatcher for, before merging.',
+              lambda: dispatcher.requested)
+metrics.gauge('bot_outbound_coalesce_ratio', 'Sends asked for per message actually sent, 1 when nothing merges.',
+              lambda: dispatcher.stats()['coalesce_ratio'])
+metrics.gauge('bot_outbound_rate_limited', '429s the outbound dispatcher has run into.',
+              lambda: dispatcher.stats()['rate_limited'])
+metrics.gauge('bot_gateway_latency_seconds', 'Heartbeat latency per shard.',
+              lambda: {f'shard="{shard_id}"': (shard['latency_ms'] or 0) / 1000
+                       for shard_id, shard in bot.shard_metrics.snapshot().items()})
+metrics.gauge('bot_gateway_events_per_second', 'Gateway events per second per shard.',
+              lambda: {f'shard="{shard_id}"': shard['events_per_sec']
+                       for shard_id, shard in bot.shard_metrics.snapshot().items()})
+metrics.gauge('bot_guilds', 'Guilds this process is in.', lambda: len(bot.guilds))
+
+
+def music_metric(key: str) -> dict:
+    # Looked up on every scrape: the music cog can be reloaded, or not loaded at all
+    cog = bot.get_cog('MusicCog')
+    if cog is None:
+        return {}
+    return {f'guild="{guild_id}"': guild[key] for guild_id, guild in cog.queue_metrics().items()
+            if guild[key] is not None}
+
+
+metrics.gauge('bot_music_queue_depth', "Tracks waiting in each guild's music queue.",
+              lambda: music_metric('queue_depth'))
+metrics.gauge('bot_music_last_gap_seconds', 'Silence between the last two tracks, per guild.',
+              lambda: music_metric('last_gap'))
+metrics.gauge('bot_music_avg_gap_seconds', 'Average silence between tracks this session, per guild.',
+              lambda: music_metric('avg_gap'))
 
 # Event: When the bot is ready
 @bot.event
 async def on_ready():
-    print(f'{bot.user} is now running!')
+    log.info("%s is now running!", bot.user)
+    if os.getenv('STARTUP_PROFILE') == '1' and profile.time_to_ready is None:
+        profile.ready()
+        log.info("%s", profile.report())
 
-# Event: When a message is received
-@bot.event
-async def on_message(message):
-    if message.author.bot:
-        return
+# Every message is classified once and handled by a single path (command, keyword response or DM response)
+# Admission control sheds fun responses first when the event loop lags or the outbound queue backs up
+# Poems come from the OpenAI-compatible API at POEM_API_URL when it's set, the templates stand in on timeouts
+router = MessageRouter(bot, admission=AdmissionControl(lag=metrics.loop_lag.current,
+                                                       queue_depth=dispatcher.queue_depth),
+                       poems=generator_from_env())
+metrics.gauge('bot_messages_routed', 'Messages by the route they took.',
+              lambda: {f'route="{route}"': count for route, count in router.routes.items()})
 
-    # Allow commands to be processed
-    await bot.process_commands(message)
 
-    # Import and use get_response function from responses.py
-    from responses import get_response
-    user_message = message.content
+def router_stage_metric(key: str, scale: float = 1) -> dict:
+    return {f'stage="{stage}"': timing[key] * scale for stage, timing in router.timings.snapshot().items()}
 
-    if not user_message:
-        print('(Message was empty because intents were not enabled probably)')
-        return
 
-    is_private = user_message.startswith('?')
-    if is_private:
-        user_message = user_message[1:]
+metrics.gauge('bot_router_stage_seconds_avg', 'Average time per message in each routing stage.',
+              lambda: router_stage_metric('avg_ms', 0.001))
+metrics.gauge('bot_router_stage_seconds_max', 'Slowest message seen in each routing stage.',
+              lambda: router_stage_metric('max_ms', 0.001))
+metrics.gauge('bot_router_stage_runs', 'Messages timed in each routing stage.',
+              lambda: router_stage_metric('count'))
+metrics.gauge('bot_admission_rejected', 'Commands and responses turned away, by reason.',
+              lambda: {f'reason="{reason}"': count for reason, count in router.admission.rejected.items()})
+metrics.gauge('bot_admission_load_level', 'Load shedding level: 0 none, 1 fun responses, 2 all but moderation.',
+              lambda: router.admission.load_level())
+if router.poems is not None:
+    metrics.gauge('bot_poems', 'Poem requests: answered from the cache, generated, or by a template and why.',
+                  lambda: {'result="cached"': router.poems.hits, 'result="generated"': router.poems.generated,
+                           **{f'result="fallback_{reason}"': count
+                              for reason, count in router.poems.fallbacks.items()}})
 
-    try:
-        response: str = get_response(user_message)
-        if is_private:
-            await message.author.send(response)
-        else:
-            await message.channel.send(response)
-    except Exception as e:
-        print(e)
+# Event: When a message is received
+@bot.event
+async def on_message(message):
+    await router.route(message)
 
 bot.remove_command("help")
 
 
+# Every cog is an extension in cogs/, so it can be reloaded with `!reload <name>` without reconnecting
+EXTENSIONS: Final[list] = [
+    'cogs.help',
+    'cogs.music',
+    'cogs.tictactoe',
+    'cogs.polls',
+    'cogs.stats',
+    'cogs.events',
+    'cogs.moderation',
+    'cogs.admin',
+]
+
+
 # Load the cogs
 async def main():
-    # Import the EventsCog and ModerationCog from events.py
-    from events import EventsCog, ModerationCog, StatsCog, PollCog, TicTacToe, MusicCog
-    from help import HelpCog
-
-    await bot.add_cog(HelpCog(bot))
-    await bot.add_cog(MusicCog(bot))
-    await bot.add_cog(TicTacToe(bot))
-    await bot.add_cog(PollCog(bot))
-    await bot.add_cog(StatsCog(bot))
-    await bot.add_cog(EventsCog(bot))
-    await bot.add_cog(ModerationCog(bot))  # ModerationCog is in the same file as EventsCog
-    await bot.start(TOKEN)
+    # Entering the bot sets up its ready event, the cogs' background loops wait on it when they are loaded
+    async with bot:
+        for extension in EXTENSIONS:
+            await profile.load_extension(bot, extension)
+
+        if bot.cluster is not None:
+            bot.cluster.register('stats', lambda: local_stats(bot, bot.shard_metrics))
+            await bot.cluster.connect()
+        bot.shard_metrics.start()
+        metrics.loop_lag.start()
+        if METRICS_PORT:
+            # Cluster workers share the host, each serves on its own port
+            await metrics.serve(METRICS_HOST, METRICS_PORT + int(os.getenv('CLUSTER_ID', '0')))
+        try:
+            await bot.start(TOKEN)
+        finally:
+            await metrics.stop()
+            await dispatcher.close()
+            if router.poems is not None:
+                await router.poems.close()
 if __name__ == '__main__':
     import asyncio
-    asyncio.run(main())
+    setup_logging()
+    if CLUSTER_PROCESSES > 1 and not os.getenv('CLUSTER_WORKER'):
+        asyncio.run(launch(TOKEN, CLUSTER_PROCESSES))
+    else:
+        asyncio.run(main())
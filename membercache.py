@@ -0,0 +1,101 @@
+import re
+import time
+from collections import OrderedDict
+
+import discord
+from discord.ext import commands
+
+# MEMBER_CACHE values and the members discord.py keeps for each
+MEMBER_CACHE_POLICIES = {
+    'all': discord.MemberCacheFlags.all,  # Everyone, needs chunking to be complete
+    'voice': lambda: discord.MemberCacheFlags(voice=True, joined=False),  # Members in voice channels (music)
+    'none': discord.MemberCacheFlags.none,  # Nothing beyond what events carry
+}
+
+MENTION_OR_ID = re.compile(r'<@!?([0-9]{15,20})>$|([0-9]{15,20})$')
+
+
+def member_cache_flags(policy: str) -> discord.MemberCacheFlags:
+    try:
+        return MEMBER_CACHE_POLICIES[policy]()
+    except KeyError:
+        raise ValueError(f"Unknown MEMBER_CACHE policy {policy!r}, expected one of {', '.join(MEMBER_CACHE_POLICIES)}")
+
+
+class MemberLRU:
+    """Bounded cache of members fetched on demand, for guilds whose members aren't all cached."""
+
+    def __init__(self, max_size: int = 5000, ttl: float = 600.0):
+        self.max_size = max_size
+        self.ttl = ttl  # Roles and nicknames go stale, refetch after this many seconds
+        self._members = OrderedDict()  # (guild id, user id) -> (fetched at, member)
+
+    def get(self, guild_id: int, user_id: int):
+        entry = self._members.get((guild_id, user_id))
+        if entry is None:
+            return None
+        if time.monotonic() - entry[0] > self.ttl:
+            del self._members[(guild_id, user_id)]
+            return None
+        self._members.move_to_end((guild_id, user_id))
+        return entry[1]
+
+    def put(self, member: discord.Member):
+        key = (member.guild.id, member.id)
+        self._members[key] = (time.monotonic(), member)
+        self._members.move_to_end(key)
+        if len(self._members) > self.max_size:
+            self._members.popitem(last=False)
+
+    def discard(self, guild_id: int, user_id: int):
+        self._members.pop((guild_id, user_id), None)
+
+    def __len__(self):
+        return len(self._members)
+
+
+member_lru = MemberLRU()
+
+
+class CachedMember(commands.MemberConverter):
+    """
+    Member converter that works without a full member cache.
+
+    Mentions and IDs are looked up in the member cache, then the LRU, then fetched
+    over REST and remembered. Names fall back to the regular MemberConverter.
+    """
+
+    async def convert(self, ctx: commands.Context, argument: str) -> discord.Member:
+        match = MENTION_OR_ID.match(argument)
+        if match is None or ctx.guild is None:
+            return await super().convert(ctx, argument)
+
+        user_id = int(match.group(1) or match.group(2))
+        member = ctx.guild.get_member(user_id) or member_lru.get(ctx.guild.id, user_id)
+        if member is None:
+            try:
+                member = await ctx.guild.fetch_member(user_id)
+            except discord.NotFound:
+                raise commands.MemberNotFound(argument)
+            member_lru.put(member)
+        return member
+
+
+_chunk_attempted = set()  # Guilds we already asked for members, so a cache that drops them isn't re-requested
+
+
+async def ensure_chunked(guild: discord.Guild, max_members: int = 10000) -> bool:
+    """
+    Chunks a guild the first time something needs its full member list, instead of at startup.
+    Guilds above max_members are left alone, callers should fall back to approximate counts.
+    """
+    if guild.chunked:
+        return True
+    if guild.id in _chunk_attempted or (guild.member_count or 0) > max_members:
+        return False
+    _chunk_attempted.add(guild.id)
+    try:
+        await guild.chunk()
+    except discord.ClientException:
+        return False  # Members intent is off
+    return guild.chunked
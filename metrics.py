@@ -0,0 +1,220 @@
+import asyncio
+import bisect
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import defaultdict
+
+from aiohttp import web
+from discord.ext import commands
+
+import botlog
+
+log = logging.getLogger(__name__)
+
+# Bucket upper bounds in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class Histogram:
+    """Counts per fixed bucket plus a running sum, what a Prometheus histogram exposes."""
+
+    __slots__ = ('bounds', 'counts', 'sum', 'count')
+
+    def __init__(self, bounds: tuple):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # The last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name: str, labels: str = '') -> list:
+        prefix = labels + ',' if labels else ''
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.bounds, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {self.count}')
+        suffix = f'{{{labels}}}' if labels else ''
+        lines.append(f'{name}_sum{suffix} {self.sum:.6f}')
+        lines.append(f'{name}_count{suffix} {self.count}')
+        return lines
+
+
+class LoopLagMonitor:
+    """
+    Measures how late the event loop wakes a task that sleeps `interval` seconds. A watchdog
+    thread also notices when the loop hasn't ticked for `stall_after` seconds and logs the
+    loop thread's stack while it is still stuck, which names the blocking call.
+    """
+
+    def __init__(self, interval: float = 0.5, stall_after: float = 1.0):
+        self.interval = interval
+        self.stall_after = stall_after
+        self.histogram = Histogram(LAG_BUCKETS)
+        self.max_lag = 0.0
+        self.last_lag = 0.0
+        self.stalls = 0
+        self._tick = time.monotonic()
+        self._loop_thread = None
+        self._task = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        self._loop_thread = threading.get_ident()
+        self._tick = time.monotonic()
+        self._task = asyncio.ensure_future(self._run())
+        self._stopped.clear()
+        threading.Thread(target=self._watch, name='loop-watchdog', daemon=True).start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._task:
+            self._task.cancel()
+
+    async def _run(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            self._tick = now = time.monotonic()
+            lag = max(now - expected, 0.0)
+            self.histogram.observe(lag)
+            self.last_lag = lag
+            if lag > self.max_lag:
+                self.max_lag = lag
+
+    def current(self) -> float:
+        """The last sample, or how overdue the next one is if that's worse (right after a stall)."""
+        if self._task is None or self._task.done():
+            return 0.0
+        return max(self.last_lag, time.monotonic() - self._tick - self.interval)
+
+    def _watch(self):
+        reported = None  # The tick the last stall was reported for, once per stall
+        while not self._stopped.wait(self.interval):
+            tick = self._tick
+            blocked = time.monotonic() - tick - self.interval
+            if blocked < self.stall_after or tick == reported:
+                continue
+            reported = tick
+            self.stalls += 1
+            frame = sys._current_frames().get(self._loop_thread)
+            stack = ''.join(traceback.format_stack(frame)[-6:]) if frame is not None else ''
+            log.warning("Event loop blocked for %.2f s so far, at:\n%s", blocked, stack.rstrip())
+
+
+class Metrics:
+    """
+    Per-command latency histograms and error counts from the command events, event loop lag,
+    and whatever gauges other modules register, served in the Prometheus text format.
+    """
+
+    def __init__(self):
+        self.commands = defaultdict(lambda: Histogram(LATENCY_BUCKETS))  # command name -> Histogram
+        self.errors = defaultdict(int)  # (command name, error class) -> count
+        self.loop_lag = LoopLagMonitor()
+        self.gauges = []  # (name, help, function returning a number or {labels: number})
+        self._started = {}  # message id -> perf_counter when its command was invoked
+        self._runner = None
+
+    def install(self, bot):
+        bot.add_listener(self.on_command)
+        bot.add_listener(self.on_command_completion)
+        bot.add_listener(self.on_command_error)
+
+    def gauge(self, name: str, help: str, function):
+        self.gauges.append((name, help, function))
+
+    async def on_command(self, ctx):
+        self._started[ctx.message.id] = time.perf_counter()
+
+    def _finished(self, ctx) -> str:
+        name = ctx.command.qualified_name if ctx.command else 'unknown'
+        started = self._started.pop(ctx.message.id, None)
+        if started is not None:
+            self.commands[name].observe(time.perf_counter() - started)
+        return name
+
+    async def on_command_completion(self, ctx):
+        self._finished(ctx)
+
+    async def on_command_error(self, ctx, error):
+        original = getattr(error, 'original', error)  # CommandInvokeError wraps what the command raised
+        name = self._finished(ctx)
+        self.errors[name, type(original).__name__] += 1
+        # Listening for this event turns off discord.py's default handler, which printed the traceback.
+        # Bad input and failed checks are the user's doing, anything else is a bug and gets logged.
+        if isinstance(error, commands.CommandError) and not isinstance(error, commands.CommandInvokeError):
+            log.debug("Command %s rejected: %s", name, error)
+            return
+        if ctx.command is not None and (ctx.command.has_error_handler()
+                                        or (ctx.cog is not None and ctx.cog.has_error_handler())):
+            return  # Handled where it was raised, like the default handler leaves it
+        log.error("Command %s failed", name, exc_info=original)
+
+    def render(self) -> str:
+        lines = ['# HELP bot_command_duration_seconds Time from a command being invoked to it finishing.',
+                 '# TYPE bot_command_duration_seconds histogram']
+        for name, histogram in sorted(self.commands.items()):
+            lines += histogram.lines('bot_command_duration_seconds', f'command="{name}"')
+        lines += ['# HELP bot_command_errors_total Commands that ended in an error, by error class.',
+                  '# TYPE bot_command_errors_total counter']
+        lines += [f'bot_command_errors_total{{command="{name}",error="{error}"}} {count}'
+                  for (name, error), count in sorted(self.errors.items())]
+        lines += ['# HELP bot_commands_in_flight Commands invoked and not finished yet.',
+                  '# TYPE bot_commands_in_flight gauge',
+                  f'bot_commands_in_flight {len(self._started)}',
+                  '# HELP bot_event_loop_lag_seconds How late the event loop woke a sleeping task.',
+                  '# TYPE bot_event_loop_lag_seconds histogram']
+        lines += self.loop_lag.histogram.lines('bot_event_loop_lag_seconds')
+        lines += ['# HELP bot_event_loop_lag_max_seconds Worst event loop lag seen.',
+                  '# TYPE bot_event_loop_lag_max_seconds gauge',
+                  f'bot_event_loop_lag_max_seconds {self.loop_lag.max_lag:.6f}',
+                  '# HELP bot_event_loop_stalls_total Times the loop was blocked long enough to log its stack.',
+                  '# TYPE bot_event_loop_stalls_total counter',
+                  f'bot_event_loop_stalls_total {self.loop_lag.stalls}',
+                  '# HELP bot_log_records_dropped_total Log records dropped because the log queue was full.',
+                  '# TYPE bot_log_records_dropped_total counter',
+                  f'bot_log_records_dropped_total {botlog.handler.dropped if botlog.handler else 0}']
+        for name, help, function in self.gauges:
+            try:
+                value = function()
+            except Exception as e:
+                log.warning("Could not read gauge %s: %s", name, e)
+                continue
+            lines += [f'# HELP {name} {help}', f'# TYPE {name} gauge']
+            if isinstance(value, dict):
+                lines += [f'{name}{{{labels}}} {number}' for labels, number in value.items()]
+            else:
+                lines.append(f'{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        return web.Response(text=self.render(), content_type='text/plain', charset='utf-8',
+                            headers={'Cache-Control': 'no-store'})
+
+    async def serve(self, host: str, port: int):
+        """Serves GET /metrics until stop()."""
+        app = web.Application()
+        app.router.add_get('/metrics', self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        log.info("Serving metrics on http://%s:%d/metrics", host, port)
+
+    async def stop(self):
+        self.loop_lag.stop()
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+metrics = Metrics()
@@ -0,0 +1,122 @@
+import asyncio
+import time
+from collections import deque
+
+import discord
+
+from membercache import MENTION_OR_ID
+from outbound import TokenBucket
+from pollengine import parse_duration
+
+# Discord refuses timeouts longer than 28 days
+MAX_TIMEOUT = 28 * 86400
+
+
+def parse_targets(text: str, with_duration: bool = False):
+    """
+    Splits bulk moderation arguments into user IDs (mentions or raw IDs), a join window from
+    joined:<duration> and, for timeouts, a duration like 10m, in any order. The first word that
+    is none of these starts the reason, which runs to the end: IDs and durations in it are text.
+    Returns (user ids, join window seconds, duration seconds, reason), with None for whatever
+    wasn't given. Raises ValueError for a bad joined: duration or a timeout of zero.
+    """
+    user_ids = []
+    window = duration = None
+    words = text.split()
+    for index, word in enumerate(words):
+        match = MENTION_OR_ID.match(word)
+        if match is not None:
+            user_ids.append(int(match.group(1) or match.group(2)))
+            continue
+        name, _, value = word.partition(':')
+        if name.lower() == 'joined' and value:
+            window = parse_duration(value)
+            if window is None:
+                raise ValueError(f"Invalid duration `{value}`, use something like 5m or 1h.")
+        elif with_duration and duration is None and parse_duration(word) is not None:
+            duration = parse_duration(word)
+            if duration <= 0:
+                raise ValueError(f"A timeout of `{word}` wouldn't do anything, use something like 10m or 1h.")
+        else:
+            return user_ids, window, duration, " ".join(words[index:])
+    return user_ids, window, duration, None
+
+
+class RecentJoins:
+    """
+    Who joined each guild in the last `max_age` seconds, from member join events, so join
+    windows work even when members aren't cached.
+    """
+
+    def __init__(self, max_age: float = 3600.0, max_per_guild: int = 10000):
+        self.max_age = max_age
+        self.max_per_guild = max_per_guild
+        self.joins = {}  # guild id -> deque of (unix time, user id), oldest first
+
+    def add(self, guild_id: int, user_id: int, when: float = None):
+        joins = self.joins.get(guild_id)
+        if joins is None:
+            joins = self.joins[guild_id] = deque(maxlen=self.max_per_guild)
+        joins.append((time.time() if when is None else when, user_id))
+        self._trim(guild_id)
+
+    def _trim(self, guild_id: int):
+        joins = self.joins[guild_id]
+        cutoff = time.time() - self.max_age
+        while joins and joins[0][0] < cutoff:
+            joins.popleft()
+        if not joins:
+            del self.joins[guild_id]
+
+    def since(self, guild_id: int, cutoff: float) -> list:
+        """User IDs that joined at or after unix time `cutoff`, oldest first."""
+        if guild_id not in self.joins:
+            return []
+        self._trim(guild_id)
+        return [user_id for when, user_id in self.joins.get(guild_id, ()) if when >= cutoff]
+
+
+class BulkAction:
+    """
+    Runs one moderation action (a coroutine function taking a user ID) for many users, with
+    at most `concurrency` requests in flight and starts paced to `rate` per `per` seconds.
+    If Discord still answers with a 429, discord.py holds that route's bucket and the other
+    workers queue behind it instead of piling on.
+    """
+
+    def __init__(self, action, user_ids, concurrency: int = 4, rate: int = 10, per: float = 1.0):
+        self.action = action
+        self.user_ids = list(user_ids)
+        self.concurrency = concurrency
+        # Evenly spaced starts, no burst: a full bucket's burst plus its refill would overrun
+        # Discord's fixed windows by up to twice the limit
+        self.bucket = TokenBucket(1, per / rate)
+        self.succeeded = 0
+        self.failed = {}  # user id -> why the action failed
+
+    @property
+    def finished(self) -> int:
+        return self.succeeded + len(self.failed)
+
+    async def run(self, on_progress=None):
+        """Works through every user, calling on_progress(action) after each one."""
+        queue = deque(self.user_ids)
+
+        async def worker():
+            while queue:
+                user_id = queue.popleft()
+                await self.bucket.acquire()
+                try:
+                    await self.action(user_id)
+                except discord.Forbidden:
+                    self.failed[user_id] = "missing permissions"
+                except discord.NotFound:
+                    self.failed[user_id] = "unknown user"
+                except discord.HTTPException as e:
+                    self.failed[user_id] = e.text or str(e.status)
+                else:
+                    self.succeeded += 1
+                if on_progress is not None:
+                    on_progress(self)
+
+        await asyncio.gather(*(worker() for _ in range(min(self.concurrency, len(queue)))))
@@ -0,0 +1,289 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+
+import discord
+
+log = logging.getLogger(__name__)
+
+# Discord caps message content at this many characters
+MAX_MESSAGE_LENGTH = 2000
+
+
+class TokenBucket:
+    """Local model of a Discord rate limit bucket: `rate` requests every `per` seconds."""
+
+    def __init__(self, rate: int, per: float):
+        self.rate = rate
+        self.per = per
+        self.tokens = float(rate)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate / self.per)
+        self.updated = now
+
+    def delay(self) -> float:
+        """Seconds until a request fits in the bucket, 0 if it fits now."""
+        self._refill()
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) * self.per / self.rate
+
+    async def acquire(self):
+        delay = self.delay()
+        while delay > 0:
+            await asyncio.sleep(delay)
+            delay = self.delay()
+        self.tokens -= 1
+
+
+class _Outgoing:
+    __slots__ = ('content', 'kwargs', 'future', 'coalesce')
+
+    def __init__(self, content, kwargs, future, coalesce=True):
+        self.content = content
+        self.kwargs = kwargs
+        self.future = future
+        self.coalesce = coalesce
+
+    def can_merge(self) -> bool:
+        return self.coalesce and self.content is not None and not self.kwargs
+
+
+def _retrieve(future: asyncio.Future):
+    # Fire-and-forget callers never look at the result, don't warn about their failures twice
+    if not future.cancelled():
+        future.exception()
+
+
+class _RateLimitCounter(logging.Handler):
+    """Counts the 429 warnings discord.py's HTTP client logs."""
+
+    def __init__(self, dispatcher):
+        super().__init__(level=logging.WARNING)
+        self.dispatcher = dispatcher
+
+    def emit(self, record: logging.LogRecord):
+        if isinstance(record.msg, str) and 'rate limit' in record.msg:
+            self.dispatcher.rate_limited += 1
+
+
+class OutboundDispatcher:
+    """
+    Queues outgoing messages per channel and sends them as the rate limits allow.
+
+    Adjacent plain-text sends to the same channel are merged into one message when
+    they arrive within `coalesce_window` seconds, or pile up while the channel is
+    waiting for bucket headroom. Sends are paced by local per-channel and global
+    buckets instead of being fired and retried after a 429. Edits are paced the same
+    way, and repeated edits of one message collapse into the latest.
+    """
+
+    def __init__(self, coalesce_window: float = 0.05, channel_rate: int = 5, channel_per: float = 5.0,
+                 global_rate: int = 50, global_per: float = 1.0, max_buckets: int = 10000):
+        self.coalesce_window = coalesce_window
+        self.channel_rate = channel_rate
+        self.channel_per = channel_per
+        self.max_buckets = max_buckets
+
+        self._queues = {}  # channel id -> deque of _Outgoing
+        self._workers = {}  # channel id -> Task draining that channel
+        self._buckets = OrderedDict()  # channel id -> TokenBucket, least recently used first
+        self._edit_buckets = OrderedDict()  # channel id -> TokenBucket for message edits
+        self._edits = {}  # message id -> (latest edit kwargs, futures waiting on it)
+        self._edit_workers = set()  # Message IDs with an edit worker running
+        self._global_bucket = TokenBucket(global_rate, global_per)
+        self._reaction_tasks = set()  # add_reactions calls still running
+
+        self.requested = 0  # Sends asked for by cogs
+        self.sent = 0  # Messages actually sent
+        self.failed = 0  # Sends Discord refused or that errored, their callers got the exception
+        self.reactions = 0  # Reactions added through add_reactions
+        self.edits_requested = 0  # Edits asked for by cogs
+        self.edits_sent = 0  # Edits actually made, after collapsing
+        self.rate_limited = 0  # 429 responses seen by discord.py
+        logging.getLogger('discord.http').addHandler(_RateLimitCounter(self))
+
+    def send(self, destination, content=None, coalesce: bool = True, **kwargs) -> asyncio.Future:
+        """
+        Queues a message for a Context, channel or user, with the same arguments as `send`.
+
+        Returns a future for the sent discord.Message, await it when the message is needed.
+        Merged sends all resolve to the same message. Pass coalesce=False for a message that
+        will be edited later, nothing is merged into it that the edit would wipe out.
+        """
+        channel = getattr(destination, 'channel', destination)
+        key = channel.id
+
+        future = asyncio.get_running_loop().create_future()
+        future.add_done_callback(_retrieve)
+        if content is not None:
+            content = str(content)
+
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = self._queues[key] = deque()
+        queue.append(_Outgoing(content, kwargs, future, coalesce))
+        self.requested += 1
+
+        if key not in self._workers:
+            self._workers[key] = asyncio.ensure_future(self._drain(key, destination))
+        return future
+
+    def _bucket(self, key: int, buckets: OrderedDict = None, rate: int = None, per: float = None) -> TokenBucket:
+        buckets = self._buckets if buckets is None else buckets
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = TokenBucket(rate or self.channel_rate, per or self.channel_per)
+            if len(buckets) > self.max_buckets:
+                buckets.popitem(last=False)
+        else:
+            buckets.move_to_end(key)
+        return bucket
+
+    def edit(self, message, **kwargs) -> asyncio.Future:
+        """
+        Queues an edit of a Message or PartialMessage, with the same arguments as `edit`.
+
+        Edits to the same message that pile up while its channel's edit bucket has no room
+        (or while the previous edit is in flight) are collapsed into one request with the
+        latest value of every argument.
+        """
+        future = asyncio.get_running_loop().create_future()
+        future.add_done_callback(_retrieve)
+        self.edits_requested += 1
+
+        pending = self._edits.get(message.id)
+        if pending is None:
+            self._edits[message.id] = (kwargs, [future])
+        else:
+            self._edits[message.id] = ({**pending[0], **kwargs}, pending[1] + [future])
+        if message.id not in self._edit_workers:
+            self._edit_workers.add(message.id)
+            asyncio.ensure_future(self._drain_edits(message))
+        return future
+
+    async def _drain_edits(self, message):
+        bucket = self._bucket(message.channel.id, self._edit_buckets)
+        try:
+            while message.id in self._edits:
+                if self.coalesce_window:
+                    await asyncio.sleep(self.coalesce_window)
+                await bucket.acquire()
+                await self._global_bucket.acquire()
+
+                kwargs, futures = self._edits.pop(message.id)
+                self.edits_sent += 1
+                try:
+                    result = await message.edit(**kwargs)
+                except Exception as e:
+                    log.warning("Failed to edit message %s: %s", message.id, e)
+                    for future in futures:
+                        if not future.done():
+                            future.set_exception(e)
+                    continue
+                for future in futures:
+                    if not future.done():
+                        future.set_result(result)
+        finally:
+            self._edit_workers.discard(message.id)
+
+    def add_reactions(self, message, emojis) -> asyncio.Future:
+        """
+        Adds reactions to a message in order in the background, the future resolves once all
+        of them are on.
+
+        There is no local bucket in front: Discord allows one reaction per 0.25s per channel and
+        discord.py's HTTP client already waits out each reset, so pacing them here saved nothing.
+        """
+        future = asyncio.ensure_future(self._add_reactions(message, list(emojis)))
+        self._reaction_tasks.add(future)
+        future.add_done_callback(self._reaction_tasks.discard)
+        future.add_done_callback(_retrieve)
+        return future
+
+    async def _add_reactions(self, message, emojis: list):
+        # One after another: a reaction that had to be retried can't land after the next one
+        for emoji in emojis:
+            await message.add_reaction(emoji)
+            self.reactions += 1
+
+    async def close(self):
+        """Cancels the sends and reactions still queued, at shutdown."""
+        for task in [*self._workers.values(), *self._reaction_tasks]:
+            task.cancel()
+
+    @staticmethod
+    def _take_batch(queue: deque):
+        first = queue.popleft()
+        batch = [first]
+        if not first.can_merge():
+            return batch, first.content, first.kwargs
+
+        content = first.content
+        while queue and queue[0].can_merge():
+            merged = f"{content}\n{queue[0].content}"
+            if len(merged) > MAX_MESSAGE_LENGTH:
+                break
+            content = merged
+            batch.append(queue.popleft())
+        return batch, content, {}
+
+    async def _drain(self, key: int, destination):
+        queue = self._queues[key]
+        bucket = self._bucket(key)
+        try:
+            while queue:
+                if self.coalesce_window:
+                    await asyncio.sleep(self.coalesce_window)
+                # Everything queued while waiting for headroom gets a chance to merge
+                await bucket.acquire()
+                await self._global_bucket.acquire()
+
+                batch, content, kwargs = self._take_batch(queue)
+                try:
+                    message = await destination.send(content, **kwargs)
+                except Exception as e:
+                    self.failed += 1
+                    log.warning("Failed to send message to %s: %s", key, e)
+                    for item in batch:
+                        if not item.future.done():
+                            item.future.set_exception(e)
+                    continue
+                self.sent += 1
+
+                for item in batch:
+                    if not item.future.done():
+                        item.future.set_result(message)
+        finally:
+            del self._workers[key]
+            if not queue:
+                del self._queues[key]
+
+    def queue_depth(self) -> int:
+        """Messages waiting to be sent, over every channel."""
+        return sum(map(len, self._queues.values()))
+
+    def stats(self) -> dict:
+        """Queue depth, how many sends were merged away, and 429s seen."""
+        depths = [len(queue) for queue in self._queues.values()]
+        return {
+            'queue_depth': sum(depths),
+            'max_channel_depth': max(depths, default=0),
+            'active_channels': len(self._workers),
+            'requested': self.requested,
+            'sent': self.sent,
+            'failed': self.failed,
+            # Sends asked for per request made, failed requests were merged all the same
+            'coalesce_ratio': self.requested / (self.sent + self.failed) if self.sent + self.failed else 1.0,
+            'reactions': self.reactions,
+            'edits_requested': self.edits_requested,
+            'edits_sent': self.edits_sent,
+            'rate_limited': self.rate_limited,
+        }
+
+
+dispatcher = OutboundDispatcher()
@@ -0,0 +1,212 @@
+import asyncio
+import logging
+import os
+import re
+from collections import OrderedDict, defaultdict
+
+import aiohttp
+
+log = logging.getLogger(__name__)
+
+PROMPT = "Write a short, light-hearted poem of four lines about {topic}. Reply with the poem only."
+MAX_TOKENS = 120
+
+
+def normalize_topic(topic: str) -> str:
+    # "The Sea!", "the  sea" and "the sea." share a cache entry
+    return " ".join(re.sub(r"[^\w\s']", " ", topic.lower()).split())
+
+
+class CompletionsBackend:
+    """
+    OpenAI-compatible /completions, which takes a list of prompts: a whole batch is one
+    request, and servers that batch on the GPU (vLLM and friends) answer it in about the
+    time of one.
+    """
+
+    def __init__(self, base_url: str, model: str, api_key: str = None, max_tokens: int = MAX_TOKENS):
+        self.url = base_url.rstrip('/') + '/completions'
+        self.model = model
+        self.headers = {'Authorization': f'Bearer {api_key}'} if api_key else {}
+        self.max_tokens = max_tokens
+
+    async def generate(self, session: aiohttp.ClientSession, prompts: list) -> list:
+        """The text for each prompt, None where there was none."""
+        payload = {'model': self.model, 'prompt': prompts, 'max_tokens': self.max_tokens, 'temperature': 0.9}
+        async with session.post(self.url, json=payload, headers=self.headers) as response:
+            response.raise_for_status()
+            data = await response.json()
+        texts = [None] * len(prompts)
+        for choice in data.get('choices', ()):
+            index = choice.get('index', 0)
+            if 0 <= index < len(texts):
+                texts[index] = (choice.get('text') or '').strip() or None
+        return texts
+
+
+class ChatBackend:
+    """
+    OpenAI-compatible /chat/completions, one prompt per request: a batch goes out as concurrent
+    requests over the pooled connections.
+    """
+
+    def __init__(self, base_url: str, model: str, api_key: str = None, max_tokens: int = MAX_TOKENS):
+        self.url = base_url.rstrip('/') + '/chat/completions'
+        self.model = model
+        self.headers = {'Authorization': f'Bearer {api_key}'} if api_key else {}
+        self.max_tokens = max_tokens
+
+    async def _one(self, session: aiohttp.ClientSession, prompt: str):
+        payload = {'model': self.model, 'messages': [{'role': 'user', 'content': prompt}],
+                   'max_tokens': self.max_tokens, 'temperature': 0.9}
+        async with session.post(self.url, json=payload, headers=self.headers) as response:
+            response.raise_for_status()
+            data = await response.json()
+        return (data['choices'][0]['message'].get('content') or '').strip() or None
+
+    async def generate(self, session: aiohttp.ClientSession, prompts: list) -> list:
+        results = await asyncio.gather(*(self._one(session, prompt) for prompt in prompts), return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                log.warning("Poem request failed: %s", result)
+        return [None if isinstance(result, Exception) else result for result in results]
+
+
+class PoemGenerator:
+    """
+    Generates poems through a backend without ever keeping a caller waiting longer than
+    `timeout` seconds. Requests arriving within `batch_window` seconds of each other go out
+    as one batch (up to `max_batch`), concurrent requests for the same topic share one
+    generation, and finished poems are kept in an LRU cache keyed by normalized topic.
+
+    The caller's fallback (the template poem) answers instead on a timeout, an error, or
+    when more than `max_pending` topics are already waiting. A timed out generation still
+    finishes and lands in the cache for the next person asking.
+    """
+
+    def __init__(self, backend, timeout: float = 4.0, batch_window: float = 0.02, max_batch: int = 8,
+                 max_pending: int = 64, cache_size: int = 512, connections: int = 8):
+        self.backend = backend
+        self.timeout = timeout
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self.cache_size = cache_size
+        self.connections = connections
+
+        self._session = None
+        self._cache = OrderedDict()  # normalized topic -> poem, least recently used first
+        self._in_flight = {}  # normalized topic -> Future of the poem (None if generation failed)
+        self._queue = []  # Normalized topics waiting for the next batch
+        self._flush_handle = None
+        self._batches = set()
+
+        self.requests = 0
+        self.hits = 0
+        self.generated = 0
+        self.batch_sizes = defaultdict(int)  # batch size -> batches sent
+        self.fallbacks = defaultdict(int)  # reason -> count
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        # Created on first use, inside the running loop. One pool of keep-alive connections for every request.
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.connections),
+                                                  timeout=aiohttp.ClientTimeout(total=30))
+        return self._session
+
+    async def poem(self, topic: str, fallback) -> str:
+        """A generated poem about `topic`, or fallback() if one can't be had in time."""
+        self.requests += 1
+        key = normalize_topic(topic)
+        poem = self._cache.get(key)
+        if poem is not None:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return poem
+
+        future = self._in_flight.get(key)
+        if future is None:
+            if len(self._in_flight) >= self.max_pending:
+                self.fallbacks['load'] += 1
+                return fallback()
+            future = self._in_flight[key] = asyncio.get_running_loop().create_future()
+            self._queue.append(key)
+            if len(self._queue) >= self.max_batch:
+                self._flush()
+            elif self._flush_handle is None:
+                self._flush_handle = asyncio.get_running_loop().call_later(self.batch_window, self._flush)
+
+        try:
+            # Shielded: one caller timing out mustn't cancel the generation the others wait on
+            poem = await asyncio.wait_for(asyncio.shield(future), self.timeout)
+        except asyncio.TimeoutError:
+            self.fallbacks['timeout'] += 1
+            return fallback()
+        if poem is None:
+            self.fallbacks['error'] += 1
+            return fallback()
+        return poem
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        while self._queue:
+            batch, self._queue = self._queue[:self.max_batch], self._queue[self.max_batch:]
+            task = asyncio.ensure_future(self._generate(batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _generate(self, keys: list):
+        self.batch_sizes[len(keys)] += 1
+        try:
+            poems = await self.backend.generate(self.session, [PROMPT.format(topic=key) for key in keys])
+        except Exception as e:
+            log.warning("Could not generate %d poem(s): %s", len(keys), e)
+            poems = [None] * len(keys)
+        for key, poem in zip(keys, poems):
+            future = self._in_flight.pop(key)
+            if poem is not None:
+                self.generated += 1
+                self._cache_put(key, poem)
+            future.set_result(poem)
+
+    def _cache_put(self, key: str, poem: str):
+        if not self.cache_size:
+            return
+        self._cache[key] = poem
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {
+            'requests': self.requests,
+            'cache_hits': self.hits,
+            'generated': self.generated,
+            'pending': len(self._in_flight),
+            'batches': dict(self.batch_sizes),
+            'fallbacks': dict(self.fallbacks),
+        }
+
+    async def close(self):
+        for task in list(self._batches):
+            task.cancel()
+        if self._session is not None:
+            await self._session.close()
+
+
+def generator_from_env():
+    """
+    A PoemGenerator for POEM_API_URL (an OpenAI-compatible base URL like https://api.openai.com/v1),
+    or None when it isn't set and the templates answer on their own.
+    """
+    base_url = os.getenv('POEM_API_URL')
+    if not base_url:
+        return None
+    api_key = os.getenv('POEM_API_KEY') or os.getenv('OPENAI_API_KEY')
+    model = os.getenv('POEM_MODEL', 'gpt-4o-mini')
+    backend_class = CompletionsBackend if os.getenv('POEM_API_MODE', 'chat') == 'completions' else ChatBackend
+    return PoemGenerator(backend_class(base_url, model, api_key), timeout=float(os.getenv('POEM_TIMEOUT', '4')))
+
@@ -0,0 +1,134 @@
+import json
+import logging
+import os
+import re
+
+log = logging.getLogger(__name__)
+
+EMOJIS = ["1️⃣", "2️⃣", "3️⃣", "4️⃣", "5️⃣", "6️⃣", "7️⃣", "8️⃣", "9️⃣", "🔟"]
+EMOJI_INDEX = {emoji: i for i, emoji in enumerate(EMOJIS)}
+
+DURATION = re.compile(r'^(\d+)([smhd])$')
+DURATION_SECONDS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_duration(text: str):
+    """Seconds for durations like 30s, 10m, 2h or 1d, None if text isn't one."""
+    match = DURATION.match(text.strip().lower())
+    if match is None:
+        return None
+    return int(match.group(1)) * DURATION_SECONDS[match.group(2)]
+
+
+class Poll:
+    """Vote counters for one poll message. Every user has at most one vote, changing it moves the vote."""
+    __slots__ = ('message_id', 'channel_id', 'author_id', 'question', 'options', 'counts', 'voters', 'deadline',
+                 'buttons')
+
+    def __init__(self, message_id: int, channel_id: int, author_id: int, question: str, options: list,
+                 deadline: float = None, buttons: bool = False):
+        self.message_id = message_id
+        self.channel_id = channel_id
+        self.author_id = author_id
+        self.question = question
+        self.options = options
+        self.counts = [0] * len(options)
+        self.voters = {}  # user id -> option index
+        self.deadline = deadline  # Unix time the poll closes at, None for open-ended polls
+        self.buttons = buttons  # Voted on with buttons instead of reactions
+
+    def vote(self, user_id: int, option: int):
+        """
+        Records a vote and returns the option it replaced (None for a first vote).
+        Returns -1 if nothing changed, i.e. the option is invalid or already the user's vote.
+        """
+        if not 0 <= option < len(self.options):
+            return -1
+        previous = self.voters.get(user_id)
+        if previous == option:
+            return -1
+        if previous is not None:
+            self.counts[previous] -= 1
+        self.voters[user_id] = option
+        self.counts[option] += 1
+        return previous
+
+    def unvote(self, user_id: int, option: int) -> bool:
+        # Only the user's current vote counts, removing a reaction that was already replaced is a no-op
+        if self.voters.get(user_id) != option:
+            return False
+        del self.voters[user_id]
+        self.counts[option] -= 1
+        return True
+
+    @property
+    def total(self) -> int:
+        return len(self.voters)
+
+    def winners(self) -> list:
+        best = max(self.counts)
+        return [option for option, count in zip(self.options, self.counts) if count == best] if best else []
+
+    def to_dict(self) -> dict:
+        return {
+            'message_id': self.message_id,
+            'channel_id': self.channel_id,
+            'author_id': self.author_id,
+            'question': self.question,
+            'options': self.options,
+            'deadline': self.deadline,
+            'buttons': self.buttons,
+            # Counts are rebuilt from the votes on load
+            'voters': {str(user_id): option for user_id, option in self.voters.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'Poll':
+        poll = cls(data['message_id'], data['channel_id'], data['author_id'], data['question'], data['options'],
+                   data.get('deadline'), data.get('buttons', False))
+        for user_id, option in data['voters'].items():
+            poll.vote(int(user_id), option)
+        return poll
+
+
+class PollStore:
+    """Open polls by message ID, saved to a JSON file so votes survive restarts."""
+
+    def __init__(self):
+        self.polls = {}  # message id -> Poll
+        self.dirty = False  # Changed since the last save
+
+    def add(self, poll: Poll):
+        self.polls[poll.message_id] = poll
+        self.dirty = True
+
+    def get(self, message_id: int):
+        return self.polls.get(message_id)
+
+    def remove(self, message_id: int):
+        if self.polls.pop(message_id, None) is not None:
+            self.dirty = True
+
+    def save(self, path: str):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump([poll.to_dict() for poll in self.polls.values()], file)
+        os.replace(tmp_path, path)
+        self.dirty = False
+
+    def load(self, path: str):
+        """Loads saved polls. A file that can't be read is moved aside to `path`.bad and no polls are loaded."""
+        if not os.path.exists(path):
+            return
+        try:
+            with open(path, encoding='utf-8') as file:
+                polls = [Poll.from_dict(data) for data in json.load(file)]
+        except (OSError, ValueError, KeyError, TypeError) as e:  # ValueError covers JSONDecodeError
+            log.error("Could not load polls from %s, starting without them: %s", path, e)
+            try:
+                os.replace(path, path + '.bad')  # Kept for a look, and not overwritten by the next save
+            except OSError:
+                pass
+            return
+        for poll in polls:
+            self.polls[poll.message_id] = poll
@@ -0,0 +1,177 @@
+import asyncio
+import logging
+import re
+from datetime import timedelta
+
+import discord
+
+from pollengine import parse_duration
+
+log = logging.getLogger(__name__)
+
+# Discord only bulk deletes messages younger than 14 days, the minute of slack covers clock skew
+BULK_DELETE_AGE = timedelta(days=14, minutes=-1)
+BULK_DELETE_SIZE = 100
+
+
+class PurgeFilter:
+    """Which messages a purge deletes. Every criterion that is set has to match."""
+    __slots__ = ('author_id', 'pattern', 'attachments', 'after', 'before')
+
+    def __init__(self, author_id: int = None, pattern: str = None, attachments: bool = False, after=None,
+                 before=None):
+        self.author_id = author_id
+        self.pattern = re.compile(pattern) if pattern is not None else None
+        self.attachments = attachments  # Only messages with files
+        self.after = after  # Only messages sent after this datetime, scanning stops at the first older one
+        self.before = before  # Only messages sent before this datetime
+
+    def matches(self, message: discord.Message) -> bool:
+        if self.author_id is not None and message.author.id != self.author_id:
+            return False
+        if self.attachments and not message.attachments:
+            return False
+        if self.before is not None and message.created_at >= self.before:
+            return False
+        return self.pattern is None or self.pattern.search(message.content) is not None
+
+
+def parse_filters(text: str, author_id: int = None):
+    """
+    Reads filters out of purge arguments: regex:<pattern>, attachments, newer:<duration>
+    and older:<duration> (durations like 30m or 2d). Returns the PurgeFilter and the
+    remaining text, the reason. Raises ValueError for bad patterns or durations.
+    """
+    options = {'author_id': author_id}
+    reason = []
+    now = discord.utils.utcnow()
+    for word in text.split():
+        name, _, value = word.partition(':')
+        name = name.lower()
+        if name == 'regex' and value:
+            try:
+                re.compile(value)
+            except re.error as e:
+                raise ValueError(f"Invalid pattern `{value}`: {e}")
+            options['pattern'] = value
+        elif name == 'attachments' and not value:
+            options['attachments'] = True
+        elif name in ('newer', 'older') and value:
+            seconds = parse_duration(value)
+            if seconds is None:
+                raise ValueError(f"Invalid duration `{value}`, use something like 30m, 2h or 3d.")
+            options['after' if name == 'newer' else 'before'] = now - timedelta(seconds=seconds)
+        else:
+            reason.append(word)
+    return PurgeFilter(**options), " ".join(reason) or None
+
+
+class PurgeJob:
+    """
+    One purge in one channel. collect() pages through history newest first until `amount`
+    messages matched (or `scan_limit` were looked at), bulk deleting them 100 at a time
+    as batches fill up. Matches too old to bulk delete are kept for delete_old(), which
+    removes them one by one. Setting `cancelled` stops either at the next message.
+    """
+
+    def __init__(self, channel, amount: int, check: PurgeFilter, scan_limit: int = 5000, reason: str = None):
+        self.channel = channel
+        self.amount = amount
+        self.check = check
+        self.scan_limit = scan_limit
+        self.reason = reason
+        self.cancelled = False
+        self.start_id = None
+        self.scanned = 0
+        self.matched = 0
+        self.bulk_deleted = 0
+        self.old = []  # Matches older than BULK_DELETE_AGE, oldest last
+        self.single_deleted = 0
+        self.failed = 0
+
+    async def collect(self, start: discord.Message = None):
+        """
+        Scans and bulk deletes. `start` (the command message) is where scanning begins,
+        it is deleted with the first batch but doesn't count towards `amount`.
+        """
+        cutoff = discord.utils.utcnow() - BULK_DELETE_AGE
+        batch = []
+        if start is not None:
+            self.start_id = start.id
+            batch.append(start)
+        deletes = []
+        async for message in self.channel.history(limit=self.scan_limit, before=start):
+            if self.cancelled:
+                break
+            self.scanned += 1
+            if self.check.after is not None and message.created_at < self.check.after:
+                break
+            if not self.check.matches(message):
+                continue
+            self.matched += 1
+            if message.created_at > cutoff:
+                batch.append(message)
+                if len(batch) == BULK_DELETE_SIZE:
+                    # Deleted while the next pages are fetched
+                    deletes.append(asyncio.ensure_future(self._bulk_delete(batch)))
+                    batch = []
+            else:
+                self.old.append(message)
+            if self.matched >= self.amount:
+                break
+        if batch:
+            deletes.append(asyncio.ensure_future(self._bulk_delete(batch)))
+        await asyncio.gather(*deletes)
+
+    async def _bulk_delete(self, batch: list):
+        counted = sum(message.id != self.start_id for message in batch)  # The command message isn't a match
+        try:
+            if len(batch) == 1:
+                await batch[0].delete()
+            else:
+                await self.channel.delete_messages(batch, reason=self.reason)
+        except discord.NotFound:
+            pass
+        except discord.HTTPException as e:
+            log.warning("Failed to bulk delete %d messages in %s: %s", len(batch), self.channel.id, e)
+            self.failed += counted
+            return
+        self.bulk_deleted += counted
+
+    async def delete_old(self, on_progress=None):
+        """Deletes the old matches one at a time, calling on_progress(job) after each."""
+        for message in self.old:
+            if self.cancelled:
+                break
+            try:
+                await message.delete()
+            except discord.NotFound:
+                pass
+            except discord.HTTPException as e:
+                log.warning("Failed to delete message %s: %s", message.id, e)
+                self.failed += 1
+                continue
+            self.single_deleted += 1
+            if on_progress is not None:
+                on_progress(self)
+
+    @property
+    def deleted(self) -> int:
+        return self.bulk_deleted + self.single_deleted
+
+    def progress(self) -> str:
+        text = (f"Purged {self.bulk_deleted} messages, deleting {len(self.old)} older ones one by one: "
+                f"{self.single_deleted}/{len(self.old)} done.")
+        if self.failed:
+            text += f" {self.failed} could not be deleted."
+        return text
+
+    def summary(self) -> str:
+        text = f"Purged {self.deleted} messages."
+        if self.cancelled:
+            text = f"Purge cancelled after deleting {self.deleted} messages."
+        elif self.matched < self.amount:
+            text += f" Only {self.matched} of the last {self.scanned} messages matched."
+        if self.failed:
+            text += f" {self.failed} could not be deleted."
+        return text
@@ -1,49 +1,193 @@
+import json
+import logging
+import os
 import random
+import re
+import time
 
-def get_response(user_input: str) -> str:
+log = logging.getLogger(__name__)
+
+# Keyword -> response rules, edited without touching the code and picked up without a restart
+RESPONSES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'responses.json')
+
+# Values templates can use on top of the rule's named groups, only computed when a template asks for them
+TEMPLATE_VARIABLES = {
+    'roll': lambda: random.randint(1, 6),
+}
+
+
+class _TemplateVars(dict):
+    """Template values that are only computed when a template actually references them."""
+
+    def __missing__(self, key):
+        value = TEMPLATE_VARIABLES[key]()
+        self[key] = value
+        return value
+
+
+class ResponseRule:
+    def __init__(self, index: int, spec: dict):
+        self.index = index
+        self.keyword = spec['keyword'].lower() if 'keyword' in spec else None
+        self.regex = re.compile(spec['pattern'] if self.keyword is None else re.escape(self.keyword), re.DOTALL)
+        self.templates = spec.get('responses') or [spec['response']]
+        self.kind = spec.get('class', 'fun')  # Admission class, what gets shed under load
+        self.defaults = spec.get('defaults', {})
+
+    def values(self, lowered: str) -> dict:
+        """The rule's named groups in the text, defaults filling in the ones left empty."""
+        match = self.regex.search(lowered)
+        values = _TemplateVars(self.defaults)
+        for name, value in match.groupdict().items():
+            if value and value.strip():
+                values[name] = value.strip()
+        return values
+
+    def render(self, lowered: str) -> str:
+        # Only the chosen template is rendered
+        template = self.templates[0] if len(self.templates) == 1 else random.choice(self.templates)
+        return template.format_map(self.values(lowered))
+
+
+class ResponseMatcher:
     """
-    Processes user input and generates appropriate responses based on commands.
+    Matches a message against every keyword rule in a single pass (Aho-Corasick).
 
-    Args:
-        user_input (str): The input message from the user.
+    Rules keep the priority of their order in the table, exactly like a chain of
+    `in` checks: every automaton state knows the best rule ending there, and regex
+    rules are only tried when they would outrank the best keyword found.
+    """
 
-    Returns:
-        str: The response generated based on the user's input.
+    def __init__(self, table: dict):
+        self.empty_response = table.get('empty_response', '')
+        self.rules = [ResponseRule(index, spec) for index, spec in enumerate(table['rules'])]
+        self.pattern_rules = [rule for rule in self.rules if rule.keyword is None]
+        self._build([rule for rule in self.rules if rule.keyword])
+
+    def _build(self, keyword_rules):
+        no_match = len(self.rules)
+        self._goto = [{}]
+        self._best = [no_match]  # Lowest rule index recognised in each state
+
+        for rule in keyword_rules:
+            state = 0
+            for char in rule.keyword:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._best.append(no_match)
+                state = next_state
+            self._best[state] = min(self._best[state], rule.index)
+
+        # Breadth first, so a state's failure link is final before its children are linked
+        self._fail = [0] * len(self._goto)
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for char, next_state in self._goto[state].items():
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._best[next_state] = min(self._best[next_state], self._best[self._fail[next_state]])
+                queue.append(next_state)
+
+    def match(self, lowered: str):
+        """Returns the highest priority rule matching the text, or None."""
+        goto, fail, best_at = self._goto, self._fail, self._best
+        best = len(self.rules)
+        state = 0
+        for char in lowered:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if best_at[state] < best:
+                best = best_at[state]
+                if best == 0:
+                    break
+
+        for rule in self.pattern_rules:
+            if rule.index >= best:
+                break
+            if rule.regex.search(lowered):
+                return rule
+        return None if best == len(self.rules) else self.rules[best]
+
+
+class ResponseTable:
+    """Loads the response table from disk and recompiles it when the file changes."""
+
+    def __init__(self, path: str = RESPONSES_FILE, check_interval: float = 2.0):
+        self.path = path
+        self.check_interval = check_interval  # Seconds between mtime checks
+        self.matcher = None
+        self._mtime = None
+        self._next_check = 0.0
+        self.reload()
+
+    def reload(self):
+        mtime = os.path.getmtime(self.path)
+        with open(self.path, encoding='utf-8') as file:
+            matcher = ResponseMatcher(json.load(file))
+        # Swap in one assignment so a message never sees a half-built matcher
+        self.matcher = matcher
+        self._mtime = mtime
+
+    def get_matcher(self) -> ResponseMatcher:
+        now = time.monotonic()
+        if now >= self._next_check:
+            self._next_check = now + self.check_interval
+            try:
+                mtime = os.path.getmtime(self.path)
+                if mtime != self._mtime:
+                    self._mtime = mtime  # A broken edit is only reported once, not on every check
+                    self.reload()
+            except (OSError, ValueError, KeyError, re.error) as e:
+                # Keep serving the last good table if an edit is broken
+                log.warning("Could not reload %s: %s", self.path, e)
+        return self.matcher
+
+
+response_table = ResponseTable()
+
+
+def find_rule(user_input: str):
+    """
+    Splits a message into (rule, lowered text) without rendering anything, so the caller can
+    decide whether to answer first. The rule is None when nothing answers the message, the
+    lowered text is None when it doesn't start with '!' and empty for a bare '!'.
     """
     # Check if input starts with '!'
     if not user_input.startswith('!'):
-        return ''  # Return an empty string to avoid any response
+        return None, None
 
     # Remove the '!' and process the input
     lowered = user_input[1:].strip().lower()
-
     if not lowered:
-        return "Well, you're awfully silent..."
-
-    # Handle predefined commands
-    if 'hello' in lowered:
-        return 'Hello there!'
-    elif 'how are you' in lowered:
-        return 'Good, thanks!'
-    elif 'bye' in lowered:
-        return 'See you!'
-    elif 'roll dice' in lowered:
-        return f'You rolled: {random.randint(1, 6)}'
-    elif 'generate a poem' in lowered:
-        # Extract the topic of the poem from the user's input
-        topic = user_input.lower().replace('!generate a poem about', '').strip()
-        if not topic:
-            topic = "something random"  # Default topic if no specific topic is given
-
-        # Generate a rule-based poem
-        poems = [
-            f"Roses are red, violets are blue,\nA lovely poem about {topic}, just for you.",
-            f"The {topic} is bright, under the sun,\nA poem to delight, for everyone.",
-            f"Through the {topic}'s embrace, a story unfolds,\nA poem of wonder, in words so bold.",
-            f"The {topic} whispers secrets of old,\nIn every shadow and story told.",
-            f"With {topic} as the muse, we write,\nA song of dreams in the moonlight."
-        ]
-        return random.choice(poems)
+        return None, lowered
+    return response_table.get_matcher().match(lowered), lowered
+
+
+def render_response(rule, lowered) -> str:
+    """The answer to a message split by find_rule, empty if there is none."""
+    if rule is not None:
+        return rule.render(lowered)
+    return response_table.matcher.empty_response if lowered == '' else ''
+
+
+def get_response(user_input: str) -> str:
+    """
+    Processes user input and generates appropriate responses based on commands.
+
+    Args:
+        user_input (str): The input message from the user.
+
+    Returns:
+        str: The response generated based on the user's input.
+    """
+    return render_response(*find_rule(user_input))
 
 # Example for testing
 if __name__ == "__main__":
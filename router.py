@@ -0,0 +1,154 @@
+import logging
+import time
+from collections import defaultdict
+
+import discord
+from discord.ext import commands
+
+from activity import tracker
+from admission import AdmissionControl
+from outbound import dispatcher
+from poems import PoemGenerator
+from responses import find_rule, render_response
+
+log = logging.getLogger(__name__)
+
+# Routes a message can take, decided once per message
+IGNORE = 'ignore'
+COMMAND = 'command'
+KEYWORD = 'keyword'
+PRIVATE = 'private'
+
+
+class StageTimings:
+    """Count, total and worst-case time per pipeline stage."""
+
+    def __init__(self):
+        self.count = defaultdict(int)
+        self.total = defaultdict(float)
+        self.max = defaultdict(float)
+
+    def record(self, stage: str, seconds: float):
+        self.count[stage] += 1
+        self.total[stage] += seconds
+        if seconds > self.max[stage]:
+            self.max[stage] = seconds
+
+    def snapshot(self) -> dict:
+        return {
+            stage: {
+                'count': count,
+                'avg_ms': self.total[stage] / count * 1000,
+                'max_ms': self.max[stage] * 1000,
+            }
+            for stage, count in self.count.items()
+        }
+
+
+class MessageRouter:
+    """
+    Classifies every message exactly once and sends it down a single path:
+    ignored, a prefix command, a keyword response, or a `?` keyword response by DM.
+    Commands and responses go through admission control before any work is done for them.
+    """
+
+    def __init__(self, bot: commands.Bot, private_prefix: str = '?', admission: AdmissionControl = None,
+                 poems: PoemGenerator = None):
+        self.bot = bot
+        self.prefix = bot.command_prefix
+        self.private_prefix = private_prefix
+        self.admission = admission or AdmissionControl()
+        self.poems = poems  # Generates poems when set, otherwise the poem rule's templates answer
+        self.timings = StageTimings()
+        self.routes = defaultdict(int)
+
+    def command_name(self, content: str) -> str:
+        # Same word split the command parser uses, but only a dict lookup instead of building a Context
+        rest = content[len(self.prefix):]
+        return rest.split(None, 1)[0] if rest and not rest[0].isspace() else ''
+
+    def classify(self, message: discord.Message) -> str:
+        # Cheapest checks first, most chatter never gets past the first character
+        if message.author.bot:
+            return IGNORE
+        content = message.content
+        if not content:
+            log.debug('Message was empty because intents were not enabled probably')
+            return IGNORE
+        if content.startswith(self.private_prefix):
+            return PRIVATE if content.startswith(self.prefix, len(self.private_prefix)) else IGNORE
+        if not content.startswith(self.prefix):
+            return IGNORE
+
+        return COMMAND if self.command_name(content) in self.bot.all_commands else KEYWORD
+
+    async def route(self, message: discord.Message):
+        started = time.perf_counter()
+        if message.guild is not None and not message.author.bot:
+            tracker.record(message.guild.id, message.channel.id)
+        route = self.classify(message)
+        stage_started = time.perf_counter()
+        self.timings.record('classify', stage_started - started)
+        self.routes[route] += 1
+
+        guild_id = message.guild.id if message.guild is not None else None
+        if route == COMMAND:
+            command = self.bot.all_commands[self.command_name(message.content)]
+            rejected = self.admission.admit(message.author.id, guild_id, AdmissionControl.command_class(command))
+            if rejected is not None:
+                self.routes['rejected'] += 1
+                await self.reject(message, *rejected)
+                return
+            ctx = await self.bot.get_context(message)
+            now = time.perf_counter()
+            self.timings.record('parse', now - stage_started)
+            await self.bot.invoke(ctx)
+            self.timings.record('command', time.perf_counter() - now)
+        elif route != IGNORE:
+            content = message.content[len(self.private_prefix):] if route == PRIVATE else message.content
+            rule, lowered = find_rule(content)
+            if rule is None and lowered != '':
+                response = ''
+            elif self.admission.admit(message.author.id, guild_id, rule.kind if rule else 'fun') is not None:
+                # Responses are the first thing to go, quietly, spam shouldn't earn replies
+                self.routes['rejected'] += 1
+                return
+            elif rule is not None and rule.kind == 'poem' and self.poems is not None:
+                response = None
+            else:
+                response = render_response(rule, lowered)
+            now = time.perf_counter()
+            self.timings.record('match', now - stage_started)
+            if response is None:
+                # Awaited in this message's own task, other messages keep flowing. The generator answers
+                # with the template itself within its timeout, or at once under load.
+                topic = rule.values(lowered).get('topic', '')
+                response = await self.poems.poem(topic, lambda: rule.render(lowered))
+                stage_started, now = now, time.perf_counter()
+                self.timings.record('generate', now - stage_started)
+            if response:
+                destination = message.author if route == PRIVATE else message.channel
+                try:
+                    await dispatcher.send(destination, response)
+                except discord.HTTPException as e:
+                    log.warning("Could not send a response to %s: %s", destination, e)
+                self.timings.record('send', time.perf_counter() - now)
+
+        self.timings.record(f'total:{route}', time.perf_counter() - started)
+
+    async def reject(self, message: discord.Message, reason: str, wait: float):
+        # One notice per user per window, whatever they keep sending
+        if not self.admission.should_notify(message.author.id):
+            return
+        if reason == 'overloaded':
+            text = f"I'm too busy for that right now, {message.author.mention}, try again in a moment."
+        else:
+            text = f"Slow down, {message.author.mention}! Try again in {max(wait, 1):.0f}s."
+        try:
+            await dispatcher.send(message.channel, text)
+        except discord.HTTPException as e:
+            log.warning("Could not tell %s to slow down: %s", message.author, e)
+
+    def stats(self) -> dict:
+        """Messages per route and the per-stage timing breakdown."""
+        return {'routes': dict(self.routes), 'stages': self.timings.snapshot()}
@@ -0,0 +1,110 @@
+import importlib.abc
+import sys
+import threading
+import time
+
+# Imported first thing in mainfile, so keep this module to the standard library
+
+STARTED = time.perf_counter()
+
+
+class _TimedLoader(importlib.abc.Loader):
+    def __init__(self, loader, profile):
+        self.loader = loader
+        self.profile = profile
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module):
+        self.profile._enter()
+        try:
+            self.loader.exec_module(module)
+        finally:
+            self.profile._exit(module.__name__)
+
+    def __getattr__(self, name):
+        # get_resource_reader, get_source and friends go to the real loader
+        return getattr(self.loader, name)
+
+
+class StartupProfile(importlib.abc.MetaPathFinder):
+    """
+    Records how long each module takes to import (self time, like python -X importtime),
+    how long each extension takes to load, and the time from process start to READY.
+    """
+
+    def __init__(self):
+        self.imports = {}  # module name -> seconds spent importing it, excluding its own imports
+        self.extensions = {}  # extension name -> seconds to load
+        self.time_to_ready = None
+        self._stack = []  # [started at, time spent in nested imports]
+        self._finding = False
+
+    def install(self):
+        sys.meta_path.insert(0, self)
+
+    def uninstall(self):
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+    def find_spec(self, fullname, path, target=None):
+        # Imports on other threads (yt_dlp in the extractor pool) would interleave with the timing stack
+        if self._finding or threading.current_thread() is not threading.main_thread():
+            return None
+        # Let the regular finders locate the module, then time its loader
+        self._finding = True
+        try:
+            for finder in sys.meta_path:
+                if finder is self or not hasattr(finder, 'find_spec'):
+                    continue
+                spec = finder.find_spec(fullname, path, target)
+                if spec is not None:
+                    break
+            else:
+                return None
+        finally:
+            self._finding = False
+        if spec.loader is not None and hasattr(spec.loader, 'exec_module'):
+            spec.loader = _TimedLoader(spec.loader, self)
+        return spec
+
+    def _enter(self):
+        self._stack.append([time.perf_counter(), 0.0])
+
+    def _exit(self, name: str):
+        started, nested = self._stack.pop()
+        elapsed = time.perf_counter() - started
+        self.imports[name] = elapsed - nested
+        if self._stack:
+            self._stack[-1][1] += elapsed
+
+    async def load_extension(self, bot, name: str):
+        started = time.perf_counter()
+        await bot.load_extension(name)
+        self.extensions[name] = time.perf_counter() - started
+
+    def ready(self):
+        if self.time_to_ready is None:
+            self.time_to_ready = time.perf_counter() - STARTED
+        self.uninstall()
+
+    def report(self, top: int = 15) -> str:
+        """Slowest top-level packages (their submodules included), extension loads and time-to-READY."""
+        packages = {}
+        for name, seconds in self.imports.items():
+            root = name.split('.')[0]
+            packages[root] = packages.get(root, 0.0) + seconds
+
+        lines = [f"Imported {len(self.imports)} modules in {sum(packages.values()) * 1000:.0f} ms, slowest packages:"]
+        for root, seconds in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]:
+            lines.append(f"  {seconds * 1000:8.1f} ms  {root}")
+        lines.append("Extensions:")
+        for name, seconds in self.extensions.items():
+            lines.append(f"  {seconds * 1000:8.1f} ms  {name}")
+        if self.time_to_ready is not None:
+            lines.append(f"Time to READY: {self.time_to_ready:.2f} s")
+        return "\n".join(lines)
+
+
+profile = StartupProfile()
@@ -0,0 +1,53 @@
+from admission import CLASS_LIMITS, GUILD_LIMIT, USER_LIMIT, AdmissionControl, BucketTable
+
+
+def test_user_cooldown():
+    control = AdmissionControl()
+    results = [control.admit(1, 10, 'general', now=0.0) for _ in range(USER_LIMIT[0] + 1)]
+    assert results[:-1] == [None] * USER_LIMIT[0]
+    reason, wait = results[-1]
+    assert reason == 'user' and wait > 0
+    assert control.admit(1, 10, 'general', now=USER_LIMIT[1] / USER_LIMIT[0]) is None  # One token back
+
+
+def test_class_cooldown_leaves_the_user_bucket_alone():
+    control = AdmissionControl()
+    burst = CLASS_LIMITS['poem'][0]
+    assert [control.admit(2, 10, 'poem', now=0.0) for _ in range(burst)] == [None] * burst
+    assert control.admit(2, 10, 'poem', now=0.0)[0] == 'poem'
+    assert control.admit(2, 10, 'general', now=0.0) is None
+
+
+def test_guild_cooldown_spares_moderation():
+    control = AdmissionControl()
+    # A different user each time, so only the guild bucket runs out
+    results = [control.admit(user_id, 10, 'general', now=0.0) for user_id in range(GUILD_LIMIT[0] + 1)]
+    assert results[:-1] == [None] * GUILD_LIMIT[0] and results[-1][0] == 'guild'
+    assert control.admit(1000, 10, 'moderation', now=0.0) is None
+    assert control.admit(1001, 11, 'general', now=0.0) is None  # Other guilds are unaffected
+
+
+def test_shedding_follows_priority():
+    control = AdmissionControl(lag=lambda: 0.2)
+    assert control.admit(3, 10, 'fun', now=0.0)[0] == 'overloaded'
+    assert control.admit(3, 10, 'poem', now=0.0)[0] == 'overloaded'
+    assert control.admit(3, 10, 'games', now=0.0) is None
+
+    control = AdmissionControl(queue_depth=lambda: 5000)
+    assert control.admit(3, 10, 'games', now=0.0)[0] == 'overloaded'
+    assert control.admit(3, 10, 'moderation', now=0.0) is None
+    assert control.rejected['overloaded'] == 1
+
+
+def test_rejected_users_are_told_once_per_window():
+    control = AdmissionControl()
+    assert control.should_notify(4, now=0.0)
+    assert not control.should_notify(4, now=1.0)
+    assert control.should_notify(4, now=31.0)
+
+
+def test_idle_buckets_are_dropped():
+    table = BucketTable(1, 1.0, max_keys=100)
+    for i in range(10000):
+        table.take(i, now=i * 0.01)
+    assert len(table) <= 101
@@ -0,0 +1,47 @@
+import asyncio
+
+from cluster import ClusterClient, ClusterHub, cluster_path, split_shards
+
+
+def test_split_shards():
+    assert split_shards(10, 3) == [[0, 1, 2, 3], [4, 5, 6], [7, 8, 9]]
+    assert split_shards(2, 5) == [[0], [1]]
+
+
+def test_cluster_path(monkeypatch):
+    monkeypatch.delenv('CLUSTER_WORKER', raising=False)
+    assert cluster_path('polls.json') == 'polls.json'
+    assert cluster_path(None) is None
+    monkeypatch.setenv('CLUSTER_WORKER', '1')
+    monkeypatch.setenv('CLUSTER_ID', '2')
+    assert cluster_path('polls.json') == 'polls.2.json'
+    assert cluster_path('/var/bot/activity') == '/var/bot/activity.2'
+
+
+def test_a_failing_worker_does_not_break_queries():
+    async def scenario():
+        hub = ClusterHub('token')
+        server = await hub.start()
+        good = ClusterClient('0', hub.port, 'token')
+        good.register('stats', lambda: {'guilds': 1})
+        bad = ClusterClient('1', hub.port, 'token')
+        bad.register('stats', lambda: 1 / 0)
+        await good.connect()
+        await bad.connect()
+        while len(hub.workers) < 2:
+            await asyncio.sleep(0.01)
+        try:
+            bad._writer.write(b'not json\n')  # Malformed lines are skipped, the connection stays up
+            for writer in hub.workers.values():
+                writer.write(b'{oops\n')
+            first = await asyncio.wait_for(bad.query('stats'), 1.0)
+            second = await asyncio.wait_for(bad.query('stats'), 1.0)
+        finally:
+            for client in (good, bad):
+                client._writer.close()
+            server.close()
+            await server.wait_closed()
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first == second == [{'guilds': 1}]
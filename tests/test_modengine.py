@@ -0,0 +1,24 @@
+import pytest
+
+from modengine import parse_targets
+
+
+def test_targets_options_and_reason():
+    text = "<@123456789012345678> 10m 234567890123456789 joined:5m spam raid"
+    assert parse_targets(text, with_duration=True) == ([123456789012345678, 234567890123456789], 300, 600,
+                                                       "spam raid")
+    assert parse_targets("<@!123456789012345678>") == ([123456789012345678], None, None, None)
+
+
+def test_reason_ends_the_targets():
+    # IDs and durations quoted in the reason are text, not more users to act on
+    text = "123456789012345678 alt of 234567890123456789, banned for 2h"
+    assert parse_targets(text, with_duration=True) == ([123456789012345678], None, None,
+                                                       "alt of 234567890123456789, banned for 2h")
+
+
+def test_bad_durations_are_rejected():
+    with pytest.raises(ValueError):
+        parse_targets("123456789012345678 0s", with_duration=True)
+    with pytest.raises(ValueError):
+        parse_targets("joined:soon 123456789012345678")
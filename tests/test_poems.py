@@ -0,0 +1,113 @@
+import asyncio
+
+import aiohttp
+
+from benchmarks.fakepoems import FakePoemAPI
+from poems import ChatBackend, CompletionsBackend, PoemGenerator, normalize_topic
+
+
+class FakeBackend:
+    """Answers every prompt after `delay` seconds, or fails, recording each batch's size."""
+
+    def __init__(self, delay: float = 0.0, fail: bool = False):
+        self.delay = delay
+        self.fail = fail
+        self.batches = []
+
+    async def generate(self, session, prompts: list) -> list:
+        self.batches.append(len(prompts))
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise aiohttp.ClientError("down")
+        return [f"poem: {prompt}" for prompt in prompts]
+
+
+def template():
+    return "template"
+
+
+def run(generator: PoemGenerator, make):
+    """Runs make() to completion on a fresh loop, then closes the generator."""
+    async def wrapped():
+        try:
+            return await make()
+        finally:
+            await generator.close()
+    return asyncio.run(wrapped())
+
+
+def test_normalize_topic():
+    assert normalize_topic("The Sea!") == normalize_topic("the  sea") == normalize_topic(" the sea.") == "the sea"
+
+
+def test_requests_are_batched_and_shared():
+    backend = FakeBackend(0.05)
+    generator = PoemGenerator(backend, timeout=1.0, max_batch=4)
+    topics = ["The Sea!", "the  sea", "cats", "dogs", "rain", "snow"]
+    poems = run(generator, lambda: asyncio.gather(*(generator.poem(topic, template) for topic in topics)))
+    assert poems[0] == poems[1] and "template" not in poems
+    assert backend.batches == [4, 1]  # 5 distinct topics: one batch full, the rest on the timer
+
+
+def test_cache_answers_repeats():
+    backend = FakeBackend()
+    generator = PoemGenerator(backend)
+
+    async def twice():
+        return await generator.poem("The Sea", template), await generator.poem("THE SEA!", template)
+    first, second = run(generator, twice)
+    assert first == second and generator.hits == 1 and backend.batches == [1]
+
+
+def test_cache_evicts_least_recently_used():
+    generator = PoemGenerator(FakeBackend(), cache_size=2)
+
+    async def scenario():
+        for topic in ("a", "b", "a", "c"):  # "b" is the least recently used when "c" comes in
+            await generator.poem(topic, template)
+    run(generator, scenario)
+    assert list(generator._cache) == ["a", "c"]
+
+
+def test_timeout_falls_back_and_still_caches():
+    generator = PoemGenerator(FakeBackend(0.2), timeout=0.05)
+
+    async def scenario():
+        first = await generator.poem("slow", template)
+        await asyncio.sleep(0.25)  # The generation went on after the caller gave up
+        return first, await generator.poem("slow", template)
+    first, second = run(generator, scenario)
+    assert first == "template" and second != "template"
+    assert generator.fallbacks['timeout'] == 1
+
+
+def test_load_falls_back_at_once():
+    generator = PoemGenerator(FakeBackend(0.05), max_pending=2)
+    poems = run(generator, lambda: asyncio.gather(*(generator.poem(topic, template) for topic in "abc")))
+    assert poems.count("template") == 1 and generator.fallbacks['load'] == 1
+
+
+def test_errors_fall_back():
+    generator = PoemGenerator(FakeBackend(fail=True))
+    assert run(generator, lambda: generator.poem("broken", template)) == "template"
+    assert generator.fallbacks['error'] == 1 and not generator._in_flight and not generator._cache
+
+
+def test_backends_against_the_stub_server():
+    async def scenario(backend_class):
+        api = await FakePoemAPI(latency=0.01, per_prompt=0.0).start()
+        generator = PoemGenerator(backend_class(api.base_url, 'fake'), timeout=2.0)
+        try:
+            poems = await asyncio.gather(*(generator.poem(topic, template) for topic in ("cats", "dogs", "cats")))
+        finally:
+            await generator.close()
+            await api.stop()
+        return poems, api
+
+    poems, api = asyncio.run(scenario(CompletionsBackend))
+    assert "template" not in poems and "cats" in poems[0] and poems[0] == poems[2]
+    assert api.calls['completions'] == 1 and api.prompts == 2  # One batch of the two distinct topics
+
+    poems, api = asyncio.run(scenario(ChatBackend))
+    assert "template" not in poems and "dogs" in poems[1]
+    assert api.calls['chat'] == 2
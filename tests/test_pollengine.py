@@ -0,0 +1,33 @@
+import os
+
+from pollengine import Poll, PollStore
+
+
+def test_save_and_load_round_trip(tmp_path):
+    path = str(tmp_path / 'polls.json')
+    store = PollStore()
+    poll = Poll(1, 2, 3, "Lunch?", ["Pizza", "Sushi"], deadline=1000.0)
+    poll.vote(10, 1)
+    store.add(poll)
+    store.save(path)
+    assert not store.dirty and not os.path.exists(path + '.tmp')
+
+    loaded = PollStore()
+    loaded.load(path)
+    assert loaded.get(1).to_dict() == poll.to_dict()
+
+
+def test_missing_file_loads_nothing(tmp_path):
+    store = PollStore()
+    store.load(str(tmp_path / 'polls.json'))
+    assert store.polls == {}
+
+
+def test_corrupt_file_is_moved_aside(tmp_path):
+    path = str(tmp_path / 'polls.json')
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write('[{"message_id": 1, "chan')  # Truncated mid-write
+    store = PollStore()
+    store.load(path)
+    assert store.polls == {}
+    assert not os.path.exists(path) and os.path.exists(path + '.bad')
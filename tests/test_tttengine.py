@@ -0,0 +1,54 @@
+from functools import lru_cache
+
+from tttengine import BEST_MOVES, FULL, WINS
+
+
+def x_to_move(cells: int) -> bool:
+    return bin(cells & FULL).count('1') == bin(cells >> 9).count('1')
+
+
+@lru_cache(maxsize=None)
+def outcome(cells: int) -> int:
+    """Plain minimax, independent of the engine's solver: 1 win, 0 draw, -1 loss for the player to move."""
+    x, o = cells & FULL, cells >> 9
+    free = FULL & ~(x | o)
+    if WINS[o if x_to_move(cells) else x]:
+        return -1
+    if not free:
+        return 0
+    shift = 0 if x_to_move(cells) else 9
+    return max(-outcome(cells | 1 << (position + shift)) for position in range(9) if free >> position & 1)
+
+
+def test_best_moves_keep_the_best_outcome():
+    # From every reachable unfinished position, each move the AI may pick keeps the best outcome available
+    for cells, moves in BEST_MOVES.items():
+        shift = 0 if x_to_move(cells) else 9
+        for position in moves:
+            assert -outcome(cells | 1 << (position + shift)) == outcome(cells), f"Bad move {position} at {cells:018b}"
+
+
+def play(cells: int, ai_is_x: bool, played: set):
+    if cells in played:
+        return
+    played.add(cells)
+    x, o = cells & FULL, cells >> 9
+    if WINS[x] or WINS[o]:
+        assert bool(WINS[x]) == ai_is_x, f"AI lost at {cells:018b}"
+        return
+    free = FULL & ~(x | o)
+    if not free:
+        return
+    shift = 0 if x_to_move(cells) else 9
+    # The AI may play any of its equally good moves, the opponent anything
+    choices = BEST_MOVES[cells] if x_to_move(cells) == ai_is_x else [p for p in range(9) if free >> p & 1]
+    for position in choices:
+        play(cells | 1 << (position + shift), ai_is_x, played)
+
+
+def test_ai_never_loses_as_x():
+    play(0, True, set())
+
+
+def test_ai_never_loses_as_o():
+    play(0, False, set())
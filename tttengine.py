@@ -0,0 +1,161 @@
+import random
+import time
+from collections import OrderedDict
+
+# Bit i is cell i (0-8, left to right, top to bottom)
+WIN_MASKS = (
+    0b000000111, 0b000111000, 0b111000000,  # Rows
+    0b001001001, 0b010010010, 0b100100100,  # Columns
+    0b100010001, 0b001010100,  # Diagonals
+)
+FULL = 0b111111111
+
+# WINS[bits] is 1 when a player's cells contain a line, so a win check is one lookup
+WINS = bytes(any(bits & mask == mask for mask in WIN_MASKS) for bits in range(FULL + 1))
+
+# Outcomes of Game.move
+INVALID, NOT_YOUR_TURN, CONTINUE, WIN, DRAW = range(5)
+
+# Chance of a random move instead of the best one, per difficulty
+DIFFICULTIES = {'easy': 0.6, 'medium': 0.25, 'hard': 0.0}
+
+
+def _solve() -> dict:
+    """
+    Minimax over every position reachable from the empty board (5478 of them).
+    Maps the packed cells of each unfinished position to the best moves for the player to move.
+    """
+    table = {}
+    values = {}
+
+    def negamax(cells: int) -> int:
+        # Value for the player to move: > 0 wins, sooner wins (and later losses) score higher
+        if cells in values:
+            return values[cells]
+        x, o = cells & FULL, cells >> 9
+        x_to_move = bin(x).count('1') == bin(o).count('1')
+        free = FULL & ~(x | o)
+        if WINS[o if x_to_move else x]:
+            value = -(bin(free).count('1') + 1)  # The previous move won
+        elif not free:
+            value = 0
+        else:
+            shift = 0 if x_to_move else 9
+            scores = {position: -negamax(cells | 1 << (position + shift))
+                      for position in range(9) if free >> position & 1}
+            value = max(scores.values())
+            table[cells] = tuple(position for position, score in scores.items() if score == value)
+        values[cells] = value
+        return value
+
+    negamax(0)
+    return table
+
+
+# Solved once at import, so the bot's move is a dict lookup
+BEST_MOVES = _solve()
+
+
+def ai_move(cells: int, mistake_rate: float = 0.0, rng=random) -> int:
+    """The bot's move for an unfinished position, a random legal one with probability mistake_rate."""
+    if mistake_rate and rng.random() < mistake_rate:
+        free = FULL & ~(cells | cells >> 9)
+        return rng.choice([position for position in range(9) if free >> position & 1])
+    return rng.choice(BEST_MOVES[cells])
+
+
+class Game:
+    """One game: both players' cells packed in one int, whose turn it is, and when it was last played."""
+    __slots__ = ('channel_id', 'players', 'cells', 'turn', 'last_move', 'mistake_rate', 'message_id', 'buttons')
+
+    def __init__(self, channel_id: int, x_player: int, o_player: int, mistake_rate: float = None,
+                 buttons: bool = False):
+        self.channel_id = channel_id
+        self.players = (x_player, o_player)  # User IDs, X moves first
+        self.cells = 0  # X's cells in bits 0-8, O's in bits 9-17
+        self.turn = 0  # Index into players
+        self.last_move = time.monotonic()
+        self.mistake_rate = mistake_rate  # Set when O is the bot, see DIFFICULTIES
+        self.message_id = None  # The board message, edited after every move
+        self.buttons = buttons  # Played with a button grid on the board message instead of !move
+
+    @property
+    def current_player(self) -> int:
+        return self.players[self.turn]
+
+    def is_free(self, position: int) -> bool:
+        return 0 <= position < 9 and not (self.cells | self.cells >> 9) >> position & 1
+
+    def move(self, user_id: int, position: int) -> int:
+        """Plays cell `position` (0-8) for `user_id`, returns one of INVALID/NOT_YOUR_TURN/CONTINUE/WIN/DRAW."""
+        if user_id != self.players[self.turn]:
+            return NOT_YOUR_TURN
+        if not self.is_free(position):
+            return INVALID
+        shift = 9 * self.turn
+        cells = self.cells | 1 << (position + shift)
+        self.cells = cells
+        self.last_move = time.monotonic()
+        if WINS[cells >> shift & FULL]:
+            return WIN
+        if (cells | cells >> 9) & FULL == FULL:
+            return DRAW
+        self.turn ^= 1
+        return CONTINUE
+
+    def marks(self) -> list:
+        """'X', 'O' or ' ' for each cell, for rendering."""
+        x, o = self.cells & FULL, self.cells >> 9
+        return ['X' if x >> i & 1 else 'O' if o >> i & 1 else ' ' for i in range(9)]
+
+
+class SessionManager:
+    """
+    Games in progress, keyed by (channel, player) so a channel can host several games
+    at once as long as nobody is in two of them. Games untouched for `expire_after`
+    seconds are handed back by expire().
+    """
+
+    def __init__(self, expire_after: float = 600.0):
+        self.expire_after = expire_after
+        self.by_player = {}  # (channel id, user id) -> Game
+        self.games = OrderedDict()  # id(Game) -> Game, least recently played first
+
+    def __len__(self):
+        return len(self.games)
+
+    def get(self, channel_id: int, user_id: int):
+        return self.by_player.get((channel_id, user_id))
+
+    def start(self, channel_id: int, x_player: int, o_player: int, mistake_rate: float = None,
+              buttons: bool = False):
+        """Starts a game, or returns None if either player is already in one in this channel."""
+        if (channel_id, x_player) in self.by_player or (channel_id, o_player) in self.by_player:
+            return None
+        game = Game(channel_id, x_player, o_player, mistake_rate, buttons)
+        self.by_player[(channel_id, x_player)] = game
+        self.by_player[(channel_id, o_player)] = game
+        self.games[id(game)] = game
+        return game
+
+    def touch(self, game: Game):
+        # Keeps games ordered by last move, so expire() only looks at the stale end
+        self.games.move_to_end(id(game))
+
+    def end(self, game: Game):
+        self.games.pop(id(game), None)
+        for player in game.players:
+            if self.by_player.get((game.channel_id, player)) is game:
+                del self.by_player[(game.channel_id, player)]
+
+    def expire(self, now: float = None) -> list:
+        """Ends and returns the games nobody has played for expire_after seconds."""
+        now = time.monotonic() if now is None else now
+        expired = []
+        while self.games:
+            game = next(iter(self.games.values()))
+            if now - game.last_move < self.expire_after:
+                break
+            self.end(game)
+            expired.append(game)
+        return expired